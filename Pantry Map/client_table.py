@@ -0,0 +1,38 @@
+"""Pre-sorted, searchable client rows behind the "Show Data Table" view.
+
+Built once per snapshot version (by the startup preload or the first
+session to open the table), so paging through the clients as of any day
+only ever decodes the rows on screen.
+"""
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.paged_table import TableIndex
+from pantry_snapshot import snapshot_for_version
+
+TABLE_COLUMNS = ['name', 'date', 'address_type', 'person_id']
+SEARCH_COLUMNS = ['name', 'address_type', 'person_id']
+
+
+def client_table(snapshot):
+    values = {}
+    for name in TABLE_COLUMNS:
+        column = np.asarray(snapshot[name])
+        if name in snapshot.categories:
+            column = pd.Categorical.from_codes(column, categories=snapshot.categories[name])
+        values[name] = column
+    return TableIndex(values, fetch=lambda rows, columns: snapshot.frame(columns, rows=rows),
+                      searchable=SEARCH_COLUMNS)
+
+
+@lru_cache(maxsize=2)
+def client_table_for_version(version):
+    # Process-wide, so the startup preload and every session share one build
+    return client_table(snapshot_for_version(version))
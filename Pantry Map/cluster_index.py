@@ -0,0 +1,137 @@
+"""Zoom-aware clustering of pantry clients for the "Markers" views.
+
+Every client gets a Morton (Z-order) key of its Web Mercator position on a
+2^26 x 2^26 grid, and the index keeps the clients sorted by that key.  A
+cluster at zoom z is a `CELL_PIXELS` square on screen, i.e. one cell of
+quadtree level z + 2, whose key is the client key shifted right; so one
+index, built once per snapshot, serves every zoom from `MIN_ZOOM` to
+`MAX_ZOOM`.  The clients of a cell are contiguous in key order, so a query
+is a binary search for the viewport's key range, a mask for the date and
+the box, and one `reduceat` per coordinate; the answer has at most one
+entry per visible cell however many clients are in the selected period.
+Past `MAX_ZOOM - 1` every client is returned on its own.
+"""
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.vector_tiles import lnglat_to_world, world_to_lnglat
+from pantry_snapshot import snapshot_for_version
+
+MIN_ZOOM, MAX_ZOOM = 7, 18
+KEY_BITS = 26
+CELL_PIXELS = 64
+# Cells per 256 px tile edge, as a quadtree level offset (256 / 64 = 2 ** 2)
+CELL_LEVEL_OFFSET = 2
+
+
+def _spread_bits(values):
+    """Insert a zero bit above every bit of `values` (the Morton interleave)."""
+    values = np.asarray(values, dtype=np.uint64)
+    result = np.zeros_like(values)
+    for bit in range(KEY_BITS):
+        result |= ((values >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+    return result
+
+
+def _grid(x, y):
+    scale = 1 << KEY_BITS
+    ix = np.clip(np.floor(np.asarray(x) * scale), 0, scale - 1).astype(np.uint64)
+    iy = np.clip(np.floor(np.asarray(y) * scale), 0, scale - 1).astype(np.uint64)
+    return ix, iy
+
+
+def morton_keys(x, y):
+    """Z-order key of world positions in [0, 1)."""
+    ix, iy = _grid(x, y)
+    return _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+
+
+class ClusterIndex:
+    """Quadtree cluster index over the client points of one snapshot."""
+
+    def __init__(self, lng, lat):
+        x, y = lnglat_to_world(lng, lat)
+        keys = morton_keys(x, y)
+        # Snapshot rows in key order, so every quadtree cell is one slice
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.x = x[self.order]
+        self.y = y[self.order]
+        for values in (self.order, self.keys, self.x, self.y):
+            values.flags.writeable = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _key_range(self, x0, y0, x1, y1):
+        """Slice of the index covering the smallest quadtree cell around a box."""
+        low, high = (int(key) for key in morton_keys([x0, x1], [y0, y1]))
+        level_bits = (low ^ high).bit_length()
+        level_bits += level_bits % 2  # whole quadtree levels only
+        first = (low >> level_bits) << level_bits
+        return np.searchsorted(self.keys, [first, first + (1 << level_bits)])
+
+    def select(self, x0, y0, x1, y1, stop=None):
+        """Index positions of the clients in the world box [x0, x1) x [y0, y1), in key order.
+
+        `stop` keeps only the snapshot rows before it.
+        """
+        start, end = self._key_range(x0, y0, min(x1, 1 - 1e-12), min(y1, 1 - 1e-12))
+        x, y = self.x[start:end], self.y[start:end]
+        mask = (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+        if stop is not None:
+            mask &= self.order[start:end] < stop
+        return start + np.flatnonzero(mask)
+
+    def query(self, zoom, bbox=None, stop=None):
+        """Clusters and single clients at `zoom`.
+
+        `bbox` is (west, south, east, north), widened to whole cells so a
+        cluster's count does not depend on where the viewport cuts it;
+        `stop` keeps only the snapshot rows before it (the clients as of a
+        day).  Returns `(clusters, leaves)`: clusters as a dict of lng, lat
+        and count arrays (count > 1), leaves as snapshot row numbers.
+        """
+        zoom = int(np.clip(zoom, MIN_ZOOM, MAX_ZOOM))
+        shift = 2 * (KEY_BITS - min(zoom + CELL_LEVEL_OFFSET, KEY_BITS))
+        if bbox is not None:
+            west, south, east, north = bbox
+            x0, y0 = lnglat_to_world(west, north)
+            x1, y1 = lnglat_to_world(east, south)
+            cell = 2.0 ** -(KEY_BITS - shift // 2)
+            positions = self.select(np.floor(x0 / cell) * cell, np.floor(y0 / cell) * cell,
+                                    np.ceil(x1 / cell) * cell, np.ceil(y1 / cell) * cell, stop)
+        elif stop is not None:
+            positions = np.flatnonzero(self.order < stop)
+        else:
+            positions = np.arange(len(self.keys))
+
+        rows = self.order[positions]
+        if zoom == MAX_ZOOM or rows.size == 0:
+            return {'lng': np.array([]), 'lat': np.array([]), 'count': np.array([], dtype=np.int64)}, np.sort(rows)
+
+        cells = self.keys[positions] >> np.uint64(shift)
+        firsts = np.concatenate([[0], np.flatnonzero(np.diff(cells)) + 1])
+        counts = np.diff(np.append(firsts, cells.size))
+        grouped = counts > 1
+        # Cluster position: the mean of its members in world units
+        x = np.add.reduceat(self.x[positions], firsts)[grouped] / counts[grouped]
+        y = np.add.reduceat(self.y[positions], firsts)[grouped] / counts[grouped]
+        lng, lat = world_to_lnglat(x, y)
+        return {'lng': lng, 'lat': lat, 'count': counts[grouped]}, np.sort(rows[firsts[~grouped]])
+
+
+def cluster_index_from_snapshot(snapshot):
+    return ClusterIndex(snapshot['lng'], snapshot['lat'])
+
+
+@lru_cache(maxsize=2)
+def cluster_index_for_version(version):
+    # Process-wide, so the app, the data API and the tile server share one build
+    return cluster_index_from_snapshot(snapshot_for_version(version))
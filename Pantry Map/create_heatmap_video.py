@@ -1,148 +1,207 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
+"""Render the pantry client heatmap animation straight from the snapshot.
+
+Each frame is rasterized with NumPy (ZIP outlines, cumulative client
+density, date and client count), frames are rendered in parallel by a
+process pool, and the raw RGB frames are piped into ffmpeg, so no browser
+or intermediate image files are involved.  The density is a cumulative
+client histogram on a grid of HEAT_CELL pixel blocks, blurred and scaled
+up per frame, so a frame costs the same however many clients there are:
+
+    python create_heatmap_video.py                        # weekly frames, 30 fps
+    python create_heatmap_video.py --step day --size 1280x720
+    python create_heatmap_video.py --serve                # interactive map on :5000
+
+Set FFMPEG_BINARY if ffmpeg is not on the PATH.
+"""
+import argparse
 import os
-from moviepy.editor import ImageSequenceClip
 import subprocess
-from flask import Flask, jsonify, render_template
-import threading
-import webbrowser
-import json
-import platform
-
-app = Flask(__name__)
-
-# Global variable to store the data
-pantry_data = None
-
-@app.route('/')
-def index():
-    return render_template('pantry_map.html')
-
-@app.route('/data')
-def get_data():
-    return jsonify(pantry_data)
-
-def load_data():
-    global pantry_data
-    with open('processed_pantry_data.json', 'r') as f:
-        pantry_data = json.load(f)
-
-def create_heatmap_video():
-    # Load the data
-    load_data()
-    
-    # Start Flask server in a separate thread
-    server_thread = threading.Thread(target=lambda: app.run(port=5000))
-    server_thread.daemon = True
-    server_thread.start()
-    
-    # Give the server a moment to start up
-    print("Waiting for server to start...")
-    time.sleep(5)  # Increased wait time
-    
-    # Configure Chrome options
-    chrome_options = Options()
-    chrome_options.add_argument('--headless=new')  # Updated headless mode
-    chrome_options.add_argument('--window-size=1920,940')  # Changed to even height
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    
-    # Handle Mac ARM64 (M1/M2) architecture
-    if platform.system() == 'Darwin' and platform.machine() == 'arm64':
-        print("Detected Mac ARM64 architecture")
-        chrome_options.binary_location = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
-        service = Service()
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pantry_snapshot import open_snapshot
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data import raster
+from shared_data.vector_tiles import ERIE_BOUNDS
+from shared_data.zip_topology import zip_geojson_for_zoom
+
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+OUTPUT_PATH = 'heatmap_animation.mp4'
+FRAME_STEPS = ('day', 'week', 'month')
+CHUNK_FRAMES = 8
+HOLD_SECONDS = 2
+# Side of the density grid cells in pixels; the blur is several cells wide,
+# so bilinear scaling back to pixels leaves no visible blocks
+HEAT_CELL = 4
+
+# Density that maps to the top of the gradient, as a share of the final peak;
+# colors follow the square root so single clients stay visible next to Buffalo
+SATURATION = 0.8
+BACKGROUND = (245, 243, 240)
+ZIP_FILL = (255, 255, 255)
+ZIP_OUTLINE = (170, 170, 170)
+
+
+def serve(port=5000):
+    """Run the interactive Flask map (only this mode needs Flask and the data APIs)."""
+    from flask import Flask, render_template
+
+    from data_api import data_api
+    from tile_server import tiles
+
+    app = Flask(__name__)
+    # Vector tiles for the template's "Tiles" view
+    app.register_blueprint(tiles)
+    # /meta and /data?since=&until=&bbox= for the markers and heat map views
+    app.register_blueprint(data_api)
+
+    @app.route('/')
+    def index():
+        return render_template('pantry_map.html')
+
+    app.run(port=port)
+
+
+def frame_dates(first, last, step):
+    """Cutoff day of every frame, ending exactly on `last`."""
+    first, last = np.datetime64(first, 'D'), np.datetime64(last, 'D')
+    if step == 'month':
+        months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1)
+        cutoffs = (months + 1).astype('datetime64[D]') - 1
     else:
-        print("Using standard Chrome setup")
-        service = Service(ChromeDriverManager().install())
-    
-    frames = []  # Initialize frames list outside try block
-    driver = None
-    
-    try:
-        # Initialize the Chrome driver
-        print("Starting Chrome...")
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Set window size explicitly
-        driver.set_window_size(1920, 940)
-        
-        # Open the map page
-        print("Loading map page...")
-        driver.get('http://127.0.0.1:5000')  # Using 127.0.0.1 instead of localhost
-        
-        # Wait for the map to load
-        print("Waiting for map to load...")
-        try:
-            WebDriverWait(driver, 30).until(  # Increased timeout to 30 seconds
-                EC.presence_of_element_located((By.ID, 'map'))
-            )
-            print("Map element found!")
-        except Exception as e:
-            print(f"Error waiting for map: {str(e)}")
-            print("Current page source:")
-            print(driver.page_source)
-            raise
-        
-        # Switch to heatmap view
-        print("Switching to heatmap view...")
-        heatmap_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Heat Map')]")
-        heatmap_button.click()
-        
-        # Create screenshots directory if it doesn't exist
-        if not os.path.exists('screenshots'):
-            os.makedirs('screenshots')
-        
-        # Get the date slider
-        date_slider = driver.find_element(By.ID, 'dateSlider')
-        
-        # Take screenshots at different dates
-        print("Taking screenshots...")
-        for i in range(0, 101, 2):  # Step by 2 for smoother animation
-            print(f"Processing frame {i}%...")
-            # Update slider value
-            driver.execute_script(f"arguments[0].value = {i}; arguments[0].dispatchEvent(new Event('input'));", date_slider)
-            time.sleep(0.5)  # Wait for map to update
-            
-            # Take screenshot
-            screenshot_path = f'screenshots/frame_{i:03d}.png'
-            driver.save_screenshot(screenshot_path)
-            frames.append(screenshot_path)
-        
-        # Create video from screenshots
-        print("Creating video...")
-        clip = ImageSequenceClip(frames, fps=10)
-        clip.write_videofile('heatmap_animation.mp4', 
-                           codec='libx264',
-                           audio=False,
-                           preset='medium',
-                           ffmpeg_params=['-pix_fmt', 'yuv420p', '-vf', 'scale=1920:940'])
-        
-        print("Video created successfully: heatmap_animation.mp4")
-        
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        if driver:
-            print("Current URL:", driver.current_url)
-            print("Page source:", driver.page_source)
-        raise
-    finally:
-        if driver:
-            driver.quit()
-        
-        # Clean up screenshots if any were created
-        if frames:
-            for frame in frames:
-                if os.path.exists(frame):
-                    os.remove(frame)
-            if os.path.exists('screenshots'):
-                os.rmdir('screenshots')
+        cutoffs = np.arange(first, last + 1, 7 if step == 'week' else 1)
+    cutoffs = np.minimum(cutoffs, last)
+    if cutoffs[-1] != last:
+        cutoffs = np.append(cutoffs, last)
+    return cutoffs
+
+
+def render_basemap(viewport):
+    canvas = raster.blank(viewport.width, viewport.height, BACKGROUND)
+    features = raster.geojson_rings(zip_geojson_for_zoom(round(viewport.zoom)), viewport)
+    for rings in features:
+        raster.fill_polygon(canvas, rings, ZIP_FILL)
+    for rings in features:
+        for ring in rings:
+            raster.draw_polyline(canvas, ring, ZIP_OUTLINE)
+    return canvas
+
+
+# Read-only render inputs, set once per worker process
+_state = {}
+
+def _init_worker(state):
+    _state.update(state)
+
+
+def render_frames(start, stop):
+    """Raw RGB bytes of frames `start:stop`.
+
+    The chunk's cumulative histograms (one bincount per frame) are blurred
+    together as one stack, like the monthly grids in `density_grid.py`.
+    """
+    cutoffs = _state['cutoffs'][start:stop]
+    counts = np.searchsorted(_state['days'], cutoffs, side='right')
+    height, width = _state['basemap'].shape[:2]
+    histogram = 0
+    stack = []
+    added = 0
+    for count in counts:
+        histogram = histogram + raster.point_histogram(_state['x'][added:count], _state['y'][added:count],
+                                                       width, height, HEAT_CELL)
+        added = count
+        stack.append(histogram)
+    density = raster.gaussian_blur(np.stack(stack), _state['sigma'])
+
+    scale = _state['label_scale']
+    frames = []
+    for cutoff, count, grid in zip(cutoffs, counts, density):
+        frame = _state['basemap'].copy()
+        heat = raster.upsample(grid, HEAT_CELL, width, height)
+        raster.blend_heat(frame, np.sqrt(heat / _state['peak']), _state['lut'])
+        frame[scale * 2:scale * 17, scale * 2:scale * 44] = 255
+        raster.draw_text(frame, str(cutoff), scale * 3, scale * 3, scale)
+        raster.draw_text(frame, f'{count:,}', scale * 3, scale * 10, scale, color=(200, 30, 30))
+        frames.append(frame.tobytes())
+    return b''.join(frames)
+
+
+def create_heatmap_video(output=OUTPUT_PATH, step='week', fps=30, width=1920, height=940,
+                         radius=12.0, workers=None):
+    if width % 2 or height % 2:
+        raise ValueError("Frame width and height must be even for yuv420p video")
+    snapshot = open_snapshot()
+    if len(snapshot) == 0:
+        raise ValueError("The snapshot has no clients to animate")
+
+    lng = np.asarray(snapshot['lng'], dtype=np.float64)
+    lat = np.asarray(snapshot['lat'], dtype=np.float64)
+    viewport = raster.Viewport(ERIE_BOUNDS, width, height)
+    x, y = viewport.project(lng, lat)
+    sigma = radius * width / 1920 / HEAT_CELL
+
+    final = raster.gaussian_blur(raster.point_histogram(x, y, width, height, HEAT_CELL), sigma)
+    state = {
+        'cutoffs': frame_dates(snapshot.min_date, snapshot.max_date, step),
+        'days': np.asarray(snapshot['date']),
+        'x': x, 'y': y,
+        'sigma': sigma,
+        'peak': max(float(final.max()) * SATURATION, 1e-6),
+        'lut': raster.gradient_lut(),
+        'basemap': render_basemap(viewport),
+        'label_scale': max(height // 160, 2),
+    }
+    frame_count = len(state['cutoffs'])
+    print(f"Rendering {frame_count:,} frames ({step}) at {width}x{height}...")
+
+    command = [
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+        '-an', '-c:v', 'libx264', '-preset', 'medium', '-pix_fmt', 'yuv420p', output,
+    ]
+    workers = workers or os.cpu_count() or 1
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as ffmpeg, \
+            ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(state,)) as pool:
+        # Keep a bounded number of chunks in flight and write them in order
+        pending = deque()
+        last_chunk = b''
+        for start in range(0, frame_count, CHUNK_FRAMES):
+            pending.append(pool.submit(render_frames, start, min(start + CHUNK_FRAMES, frame_count)))
+            if len(pending) >= workers * 2:
+                last_chunk = pending.popleft().result()
+                ffmpeg.stdin.write(last_chunk)
+        while pending:
+            last_chunk = pending.popleft().result()
+            ffmpeg.stdin.write(last_chunk)
+        # Hold the final frame so the end state is readable
+        last_frame = memoryview(last_chunk)[-width * height * 3:]
+        for _ in range(fps * HOLD_SECONDS):
+            ffmpeg.stdin.write(last_frame)
+        ffmpeg.stdin.close()
+    if ffmpeg.returncode:
+        raise RuntimeError(f"ffmpeg exited with status {ffmpeg.returncode}")
+    print(f"Video created successfully: {output}")
+
 
 if __name__ == '__main__':
-    create_heatmap_video() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--step', choices=FRAME_STEPS, default='week', help='time between frames')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--size', default='1920x940', help='WIDTHxHEIGHT, both even')
+    parser.add_argument('--radius', type=float, default=12.0, help='heat radius in pixels at 1920 wide')
+    parser.add_argument('--workers', type=int, default=None, help='render processes (default: all CPUs)')
+    parser.add_argument('--serve', action='store_true', help='serve the interactive map instead')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+    else:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+        create_heatmap_video(args.output, args.step, args.fps, width, height, args.radius, args.workers)
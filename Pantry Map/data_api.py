@@ -0,0 +1,240 @@
+"""Queryable client data for the Flask pantry map (`create_heatmap_video.py --serve`).
+
+    /meta                                   date range and counts of the live snapshot
+    /data?until=2021-06-30                  clients associated on or before a day
+    /data?since=2021-05-31&until=2021-06-30 only the clients added in between
+    /data?bbox=west,south,east,north        ... inside a lng/lat box
+    /data?fields=day,lat,lng                ... with only these fields
+    /clusters?z=12&bbox=...&until=...       clusters and single clients for a map view
+
+Snapshot rows are stored in date order, so a date window is two binary
+searches into the columns.  Responses are columnar JSON (one array per
+field, dates as day numbers), gzip-compressed, and tagged with an ETag so
+an unchanged window answers 304; the compressed bodies are cached per
+snapshot version and query, up to `BODY_CACHE_BYTES` in all.  `/clusters` answers from the quadtree
+index in `cluster_index.py`, so the markers view gets at most one feature
+per visible cell instead of every client.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from flask import Blueprint, Response, abort, jsonify, request
+
+from cluster_index import MAX_ZOOM, MIN_ZOOM, cluster_index_for_version
+from pantry_snapshot import snapshot_for_version
+from tile_server import load_snapshot
+
+COORDINATE_DECIMALS = 5
+GZIP_LEVEL = 6
+# Fields of a client; /data can ask for fewer (the heatmap only needs day, lat and lng)
+CLIENT_FIELDS = ('row', 'day', 'lat', 'lng', 'address_type', 'name', 'person_id')
+# Total size of the cached compressed bodies
+BODY_CACHE_BYTES = 32 * 1024 * 1024
+
+data_api = Blueprint('data_api', __name__)
+
+
+def _day_numbers(dates):
+    return np.asarray(dates).astype('datetime64[D]').astype(np.int64)
+
+
+@lru_cache(maxsize=2)
+def snapshot_meta(version):
+    """Date range and counts of one snapshot version, computed once."""
+    snapshot = snapshot_for_version(version)
+    if len(snapshot) == 0:
+        return {'version': version, 'rows': 0}
+    dates = np.asarray(snapshot['date'])
+    months, month_counts = np.unique(dates.astype('datetime64[M]'), return_counts=True)
+    address_types = np.bincount(snapshot['address_type'], minlength=len(snapshot.categories['address_type']))
+    return {
+        'version': snapshot.version,
+        'rows': len(snapshot),
+        'min_date': str(snapshot.min_date),
+        'max_date': str(snapshot.max_date),
+        'min_day': int(_day_numbers(snapshot.min_date)),
+        'max_day': int(_day_numbers(snapshot.max_date)),
+        'categories': snapshot.categories,
+        'address_type_counts': dict(zip(snapshot.categories['address_type'], address_types.tolist())),
+        'month_counts': {str(month): int(count) for month, count in zip(months, month_counts)},
+    }
+
+
+def _parse_day(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return np.datetime64(value, 'D')
+    except ValueError:
+        abort(400, f"{name} must be a YYYY-MM-DD date")
+
+
+def _parse_bbox():
+    value = request.args.get('bbox')
+    if not value:
+        return None
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except ValueError:
+        abort(400, "bbox must be west,south,east,north")
+    return west, south, east, north
+
+
+def _parse_fields():
+    value = request.args.get('fields')
+    if not value:
+        return CLIENT_FIELDS
+    fields = set(value.split(','))
+    if not fields <= set(CLIENT_FIELDS):
+        abort(400, f"fields must be some of {','.join(CLIENT_FIELDS)}")
+    return tuple(field for field in CLIENT_FIELDS if field in fields)
+
+
+class BodyCache:
+    """Least recently used gzip bodies and ETags, bounded by their total size."""
+
+    def __init__(self, max_bytes=BODY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, encode):
+        """The (gzip body, etag) cached under `key`, from `encode()` on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        entry = encode()
+        with self._lock:
+            if key not in self._entries and len(entry[0]) <= self.max_bytes:
+                self._entries[key] = entry
+                self.size += len(entry[0])
+                while self.size > self.max_bytes:
+                    _, (evicted, _) = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return entry
+
+
+bodies = BodyCache()
+
+
+def _rounded(values):
+    return np.round(np.asarray(values, dtype=np.float64), COORDINATE_DECIMALS).tolist()
+
+
+def _client_fields(snapshot, rows, fields=CLIENT_FIELDS):
+    columns = {
+        'row': lambda: rows.tolist(),
+        'day': lambda: _day_numbers(snapshot['date'][rows]).tolist(),
+        'lat': lambda: _rounded(snapshot['lat'][rows]),
+        'lng': lambda: _rounded(snapshot['lng'][rows]),
+        'address_type': lambda: snapshot['address_type'][rows].tolist(),
+        'name': lambda: snapshot['name'][rows].tolist(),
+        'person_id': lambda: snapshot['person_id'][rows].tolist(),
+    }
+    return {field: columns[field]() for field in fields}
+
+
+def _encode(payload, key):
+    """(gzip bytes, etag) of a response payload."""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return gzip.compress(body, GZIP_LEVEL), etag
+
+
+def encode_rows(version, start, stop, bbox, fields=CLIENT_FIELDS):
+    """Encoded `fields` of the snapshot rows `start:stop` inside `bbox`."""
+    key = f'{version}:{start}:{stop}:{bbox}:{",".join(fields)}'
+
+    def encode():
+        snapshot = snapshot_for_version(version)
+        lat = np.asarray(snapshot['lat'][start:stop], dtype=np.float64)
+        lng = np.asarray(snapshot['lng'][start:stop], dtype=np.float64)
+        rows = np.arange(start, stop)
+        if bbox:
+            west, south, east, north = bbox
+            rows = rows[(lng >= west) & (lng <= east) & (lat >= south) & (lat <= north)]
+        payload = {'version': version, 'start': start, 'stop': stop, 'count': int(rows.size)}
+        payload.update(_client_fields(snapshot, rows, fields))
+        return _encode(payload, key)
+    return bodies.get(key, encode)
+
+
+def encode_clusters(version, zoom, bbox, stop):
+    """Encoded clusters (lng, lat, count) and single clients of one map view."""
+    key = f'clusters:{version}:{zoom}:{bbox}:{stop}'
+
+    def encode():
+        snapshot = snapshot_for_version(version)
+        clusters, leaves = cluster_index_for_version(version).query(zoom, bbox, stop)
+        payload = {
+            'version': version,
+            'zoom': zoom,
+            'clusters': {
+                'lng': _rounded(clusters['lng']),
+                'lat': _rounded(clusters['lat']),
+                'count': clusters['count'].tolist(),
+            },
+            'points': _client_fields(snapshot, leaves),
+        }
+        return _encode(payload, key)
+    return bodies.get(key, encode)
+
+
+def _compressed_response(encoded):
+    compressed, etag = encoded
+    use_gzip = 'gzip' in request.accept_encodings
+    if use_gzip:
+        etag += '-gz'  # each encoding is its own representation
+
+    response = Response(mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+    if use_gzip:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        # Browsers all accept gzip; anything else gets the body inflated on the fly
+        response.set_data(gzip.decompress(compressed))
+    return response
+
+
+@data_api.route('/meta')
+def meta():
+    snapshot = load_snapshot()
+    return jsonify(snapshot_meta(snapshot.version))
+
+
+@data_api.route('/data')
+def data():
+    snapshot = load_snapshot()
+    since, until, bbox, fields = _parse_day('since'), _parse_day('until'), _parse_bbox(), _parse_fields()
+    # Dates are normalized to row offsets, so every date in a gap shares one cache entry and ETag
+    start = snapshot.rows_as_of(since) if since is not None else 0
+    stop = snapshot.rows_as_of(until) if until is not None else len(snapshot)
+    return _compressed_response(encode_rows(snapshot.version, start, max(start, stop), bbox, fields))
+
+
+@data_api.route('/clusters')
+def clusters():
+    snapshot = load_snapshot()
+    zoom = request.args.get('z', type=int)
+    if zoom is None or not MIN_ZOOM <= zoom <= MAX_ZOOM:
+        abort(400, f"z must be a zoom level from {MIN_ZOOM} to {MAX_ZOOM}")
+    until, bbox = _parse_day('until'), _parse_bbox()
+    stop = snapshot.rows_as_of(until) if until is not None else len(snapshot)
+    if bbox:
+        # Round to about 1 m so tiny pans share cache entries
+        bbox = tuple(round(value, COORDINATE_DECIMALS) for value in bbox)
+    return _compressed_response(encode_clusters(snapshot.version, zoom, bbox, stop))
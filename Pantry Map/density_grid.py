@@ -0,0 +1,106 @@
+"""Kernel density grids of pantry clients for the "Heatmap" map mode.
+
+Clients are binned into a fixed Web Mercator grid over the Erie County map
+bounds, smoothed with a separable Gaussian and accumulated per month, so
+the density "as of" any day is one stored month plus the few clients of
+the current month.  The result is drawn as a single PNG image layer whose
+size does not depend on how many clients there are.
+"""
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data import raster
+from shared_data.vector_tiles import ERIE_BOUNDS, lnglat_to_world
+from pantry_snapshot import snapshot_for_version
+
+GRID_WIDTH = 256
+# Smoothing radius in grid cells (about 1.3 km)
+SIGMA_CELLS = 1.5
+# Density that maps to the top of the gradient, as a share of the final peak
+SATURATION = 0.8
+
+
+class DensityGrid:
+    """Cumulative monthly density grids for date-sorted client points."""
+
+    def __init__(self, lng, lat, dates, bounds=ERIE_BOUNDS, width=GRID_WIDTH, sigma=SIGMA_CELLS):
+        self.bounds = bounds
+        self.sigma = sigma
+        x0, y0 = lnglat_to_world(bounds['west'], bounds['north'])
+        x1, y1 = lnglat_to_world(bounds['east'], bounds['south'])
+        self.width = width
+        self.height = max(int(round(width * (y1 - y0) / (x1 - x0))), 1)
+
+        # Grid cell of every client; clients outside the bounds are dropped
+        x, y = lnglat_to_world(lng, lat)
+        columns = np.floor((x - x0) / (x1 - x0) * self.width).astype(np.int64)
+        rows = np.floor((y - y0) / (y1 - y0) * self.height).astype(np.int64)
+        inside = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+        self.cells = np.where(inside, rows * self.width + columns, -1)
+        self.days = np.asarray(dates).astype('datetime64[D]')
+
+        # months[i] holds every client associated before the end of that month
+        months = self.days.astype('datetime64[M]')
+        self.first_month = months[0] if len(months) else np.datetime64('today', 'M')
+        month_index = (months - self.first_month).astype(np.int64)
+        month_count = int(month_index[-1]) + 1 if len(months) else 1
+        counts = np.zeros((month_count, self.height * self.width), dtype=np.float32)
+        np.add.at(counts, (month_index[inside], self.cells[inside]), 1)
+        counts = np.cumsum(counts, axis=0).reshape(month_count, self.height, self.width)
+        self.cumulative = raster.gaussian_blur(counts, sigma)
+        self.cumulative.flags.writeable = False
+
+        self.peak = max(float(self.cumulative[-1].max()) * SATURATION, 1e-6)
+        self.lut = raster.gradient_lut()
+
+    def _histogram(self, start, stop):
+        cells = self.cells[start:stop]
+        counts = np.bincount(cells[cells >= 0], minlength=self.height * self.width)
+        return counts.reshape(self.height, self.width).astype(np.float32)
+
+    def as_of(self, cutoff):
+        """Smoothed client density on `cutoff` (inclusive)."""
+        cutoff = np.datetime64(cutoff, 'D')
+        month = int((cutoff.astype('datetime64[M]') - self.first_month).astype(np.int64))
+        if month < 0:
+            return np.zeros((self.height, self.width), dtype=np.float32)
+        if month >= len(self.cumulative):
+            return self.cumulative[-1]
+        month_start = np.datetime64(cutoff.astype('datetime64[M]'), 'D')
+        start, stop = np.searchsorted(self.days, [month_start, cutoff + 1])
+        grid = self.cumulative[month - 1] if month > 0 else 0
+        if stop > start:
+            grid = grid + raster.gaussian_blur(self._histogram(start, stop), self.sigma)
+        elif month == 0:
+            grid = np.zeros((self.height, self.width), dtype=np.float32)
+        return grid
+
+    def image(self, cutoff):
+        """RGBA heat image (north up) for `cutoff`."""
+        return raster.heat_rgba(np.sqrt(self.as_of(cutoff) / self.peak), self.lut)
+
+    def image_url(self, cutoff):
+        return raster.png_data_url(self.image(cutoff))
+
+    @property
+    def coordinates(self):
+        """Image corners for a mapbox image layer (NW, NE, SE, SW)."""
+        b = self.bounds
+        return [[b['west'], b['north']], [b['east'], b['north']],
+                [b['east'], b['south']], [b['west'], b['south']]]
+
+
+def density_from_snapshot(snapshot, **kwargs):
+    return DensityGrid(snapshot['lng'], snapshot['lat'], snapshot['date'], **kwargs)
+
+
+@lru_cache(maxsize=2)
+def density_for_version(version):
+    # Process-wide, so the startup preload and every session share one build
+    return density_from_snapshot(snapshot_for_version(version))
@@ -0,0 +1,299 @@
+"""Incremental geocoder for PetPoint exports.
+
+Normalizes the `Street Address`/`City`/`Postal Code` columns of
+`PantryMap.csv`, looks every address up in an indexed SQLite cache and only
+sends the addresses it has never seen to the geocoding backend.  Requests
+run concurrently behind a shared rate limit.
+
+    python geocode_pantry.py                          # Nominatim via geopy
+    python geocode_pantry.py --backend arcgis --rate 5
+    python geocode_pantry.py --backend lookup:stand_in.json   # offline stand-in
+
+The first run imports the legacy `geocoded_pantry_data.json` cache.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from pantry_snapshot import normalize_postal_code
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'PantryMap.csv')
+CACHE_PATH = os.path.join(BASE_DIR, 'geocode_cache.sqlite')
+LEGACY_JSON_PATH = os.path.join(BASE_DIR, 'geocoded_pantry_data.json')
+
+USER_AGENT = 'spca-pet-pantry-map'
+DEFAULT_STATE = 'NY'
+DEFAULT_COUNTRY = 'USA'
+
+_STATE_NAMES = {'NEW YORK': 'NY'}
+_COUNTRY_NAMES = {'UNITED STATES': 'USA', 'UNITED STATES OF AMERICA': 'USA', 'US': 'USA'}
+
+
+def _clean(value):
+    if value is None or pd.isna(value):
+        return ''
+    value = re.sub(r'[.,#]', ' ', str(value).upper())
+    return re.sub(r'\s+', ' ', value).strip()
+
+
+def normalize_address(street, city, postal_code, state=None, country=None):
+    """Canonical cache key, e.g. '80 GIERLACH STREET, BUFFALO, NY 14212, USA'.
+
+    Unit numbers are left out: they do not change the coordinates and make
+    geocoders miss.  Returns '' when there is no street to geocode.
+    """
+    street = _clean(street)
+    if not street:
+        return ''
+    state = _clean(state)
+    state = _STATE_NAMES.get(state, state) or DEFAULT_STATE
+    country = _clean(country)
+    country = _COUNTRY_NAMES.get(country, country) or DEFAULT_COUNTRY
+    locality = ' '.join(part for part in (state, normalize_postal_code(postal_code)) if part)
+    return ', '.join(part for part in (street, _clean(city), locality, country) if part)
+
+
+def legacy_key(row):
+    """Key format used by geocoded_pantry_data.json (postal code read as float)."""
+    columns = ['Street Address', 'Unit Number', 'City', 'Province', 'Country', 'Postal Code']
+    parts = [row.get(column) for column in columns]
+    if isinstance(parts[-1], str) and parts[-1].isdigit():
+        parts[-1] = float(parts[-1])  # exports read with dtype=str
+    return ' '.join(str(part) for part in parts if part is not None and not pd.isna(part))
+
+
+def address_frame(csv_df):
+    """Add a normalized `address` column to a PetPoint export."""
+    df = csv_df.copy()
+    df['address'] = [
+        normalize_address(street, city, postal, state, country)
+        for street, city, postal, state, country in zip(
+            df['Street Address'], df['City'], df['Postal Code'],
+            df.get('Province', pd.Series(index=df.index, dtype=object)),
+            df.get('Country', pd.Series(index=df.index, dtype=object)),
+        )
+    ]
+    return df
+
+
+class GeocodeCache:
+    """SQLite store of address -> (lat, lng); one row per normalized address."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address TEXT PRIMARY KEY,
+                lat REAL,
+                lng REAL,
+                status TEXT NOT NULL,
+                backend TEXT,
+                updated_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM geocodes').fetchone()[0]
+
+    def lookup(self, addresses, include_failures=False):
+        """Dict of cached `address -> (lat, lng)`, or None for known failures."""
+        found = {}
+        addresses = list(dict.fromkeys(a for a in addresses if a))
+        for start in range(0, len(addresses), 500):
+            chunk = addresses[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT address, lat, lng, status FROM geocodes WHERE address IN ({placeholders})', chunk
+            )
+            for address, lat, lng, status in rows:
+                if status == 'ok':
+                    found[address] = (lat, lng)
+                elif include_failures:
+                    found[address] = None
+        return found
+
+    def missing(self, addresses, retry_failed=False):
+        """Addresses that have never been geocoded (or failed, with `retry_failed`)."""
+        known = self.lookup(addresses, include_failures=not retry_failed)
+        return [a for a in dict.fromkeys(addresses) if a and a not in known]
+
+    def store(self, results, backend_name):
+        """Upsert `{address: (lat, lng) or None}` in one transaction."""
+        now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        rows = [
+            (address, *(coords if coords else (None, None)), 'ok' if coords else 'not_found', backend_name, now)
+            for address, coords in results.items()
+        ]
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO geocodes (address, lat, lng, status, backend, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(address) DO UPDATE SET
+                    lat=excluded.lat, lng=excluded.lng, status=excluded.status,
+                    backend=excluded.backend, updated_at=excluded.updated_at
+            ''', rows)
+
+    def import_legacy_json(self, csv_df, json_path=LEGACY_JSON_PATH):
+        """Seed the cache from geocoded_pantry_data.json using the export's rows."""
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, 'r') as f:
+            legacy = json.load(f)
+        df = address_frame(csv_df)
+        results = {}
+        for _, row in df.iterrows():
+            coords = legacy.get(legacy_key(row))
+            if row['address'] and coords:
+                results[row['address']] = (coords['lat'], coords['lng'])
+        self.store(results, 'legacy-json')
+        return len(results)
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing at most `rate` calls per second overall."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class GeopyBackend:
+    """Any geopy geocoder by service name ('nominatim', 'arcgis', ...)."""
+
+    def __init__(self, service='nominatim', timeout=10, **kwargs):
+        from geopy.geocoders import get_geocoder_for_service
+        self.name = service
+        geocoder_class = get_geocoder_for_service(service)
+        if service == 'nominatim':
+            kwargs.setdefault('user_agent', USER_AGENT)
+        self.geocoder = geocoder_class(timeout=timeout, **kwargs)
+
+    def geocode(self, address):
+        location = self.geocoder.geocode(address)
+        if location is None:
+            return None
+        return (location.latitude, location.longitude)
+
+
+class LookupBackend:
+    """Offline stand-in geocoder answering from a JSON file of
+    `{address: [lat, lng]}` or `{address: {"lat": .., "lng": ..}}`."""
+
+    def __init__(self, path):
+        self.name = f'lookup:{os.path.basename(path)}'
+        with open(path, 'r') as f:
+            table = json.load(f)
+        self.table = {}
+        for address, coords in table.items():
+            if isinstance(coords, dict):
+                coords = (coords['lat'], coords['lng'])
+            self.table[address] = tuple(coords)
+
+    def geocode(self, address):
+        return self.table.get(address)
+
+
+def make_backend(spec):
+    """'lookup:<path>' for the offline stand-in, otherwise a geopy service name."""
+    if spec.startswith('lookup:'):
+        return LookupBackend(spec.split(':', 1)[1])
+    return GeopyBackend(spec)
+
+
+def geocode_addresses(addresses, backend, workers=4, rate=1.0, progress=None):
+    """Geocode `addresses` concurrently; returns `{address: (lat, lng) or None}`.
+
+    Backend errors are reported through `progress` and left out of the result
+    so the address is retried on the next run.
+    """
+    limiter = RateLimiter(rate)
+    results = {}
+
+    def task(address):
+        limiter.acquire()
+        return backend.geocode(address)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task, address): address for address in addresses}
+        for done, future in enumerate(as_completed(futures), 1):
+            address = futures[future]
+            try:
+                results[address] = future.result()
+            except Exception as e:
+                if progress:
+                    progress(f"Error geocoding {address!r}: {e}")
+            if progress and done % 25 == 0:
+                progress(f"Geocoded {done:,}/{len(futures):,} addresses")
+    return results
+
+
+def update_cache(csv_df, cache, backend, workers=4, rate=1.0, retry_failed=False, batch_size=100, progress=print):
+    """Geocode only the export's addresses missing from `cache`.
+
+    Results are committed every `batch_size` addresses so an interrupted run
+    keeps its progress.  Returns the number of newly geocoded addresses.
+    """
+    if len(cache) == 0:
+        imported = cache.import_legacy_json(csv_df)
+        if imported and progress:
+            progress(f"Imported {imported:,} addresses from {os.path.basename(LEGACY_JSON_PATH)}")
+
+    addresses = address_frame(csv_df)['address']
+    missing = cache.missing(addresses, retry_failed=retry_failed)
+    if progress:
+        progress(f"{len(set(addresses) - {''}):,} unique addresses, {len(missing):,} not yet geocoded")
+
+    found = 0
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        results = geocode_addresses(batch, backend, workers=workers, rate=rate, progress=progress)
+        cache.store(results, backend.name)
+        found += sum(1 for coords in results.values() if coords)
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--csv', default=CSV_PATH, help='PetPoint export to geocode')
+    parser.add_argument('--cache', default=CACHE_PATH, help='SQLite geocode cache')
+    parser.add_argument('--backend', default='nominatim',
+                        help="geopy service name, or 'lookup:<file.json>' for an offline stand-in")
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests')
+    parser.add_argument('--rate', type=float, default=1.0, help='maximum requests per second')
+    parser.add_argument('--retry-failed', action='store_true', help='retry addresses that previously found nothing')
+    args = parser.parse_args()
+
+    with GeocodeCache(args.cache) as cache:
+        found = update_cache(pd.read_csv(args.csv), cache, make_backend(args.backend),
+                             workers=args.workers, rate=args.rate, retry_failed=args.retry_failed)
+        print(f"Geocoded {found:,} new addresses; cache holds {len(cache):,}")
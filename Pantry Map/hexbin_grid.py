@@ -0,0 +1,139 @@
+"""Hexagonal bins of pantry clients for the "Hexbin" map mode.
+
+Clients are binned into flat hexagonal grids at a few fixed sizes (a
+pyramid from county scale down to neighbourhoods), and the counts of every
+occupied hexagon are accumulated per month, so the counts "as of" any day
+are one stored month plus the few clients of the current month.  The map
+draws one polygon per occupied hexagon: a number bounded by the map area
+and the hexagon size, not by how many clients there are, and no client
+position or name leaves the server.
+"""
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.vector_tiles import ERIE_BOUNDS, lnglat_to_world, world_to_lnglat
+from pantry_snapshot import snapshot_for_version
+
+# Hexagon sizes (center to corner) in km, coarse to fine
+HEX_SIZES_KM = (8.0, 4.0, 2.0, 1.0)
+DEFAULT_HEX_SIZE_KM = 2.0
+EARTH_CIRCUMFERENCE_KM = 40075.016686
+SQRT3 = np.sqrt(3.0)
+# Corners of a pointy-top hexagon around its center, in units of its size
+_CORNERS = np.radians(np.arange(6) * 60.0 - 30.0)
+
+
+def _hex_round(q, r):
+    """Nearest hexagon (axial coordinates) to fractional axial positions."""
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+class HexLevel:
+    """Cumulative monthly client counts per occupied hexagon of one size."""
+
+    def __init__(self, size_km, x_km, y_km, month_index, month_count, km_per_world):
+        self.size_km = size_km
+        valid = np.isfinite(x_km) & np.isfinite(y_km)
+        x_km, y_km = x_km[valid], y_km[valid]
+        q, r = _hex_round((SQRT3 / 3 * x_km - y_km / 3) / size_km, (2 / 3 * y_km) / size_km)
+        # One key per hexagon; only hexagons that ever had a client are kept
+        occupied, cells = np.unique((q << 32) + (r & 0xFFFFFFFF), return_inverse=True)
+        self.cells = np.full(len(valid), -1, dtype=np.int32)
+        self.cells[valid] = cells
+        self.q, self.r = occupied >> 32, (occupied & 0xFFFFFFFF).astype(np.int32).astype(np.int64)
+
+        flat = month_index[valid] * len(occupied) + cells
+        counts = np.bincount(flat, minlength=month_count * len(occupied)).reshape(month_count, len(occupied))
+        self.cumulative = np.cumsum(counts, axis=0).astype(np.int32)
+        self.cumulative.flags.writeable = False
+        self.features = self._features(km_per_world)
+
+    def _features(self, km_per_world):
+        # Corner positions in km, then back to degrees, five decimals (~1 m)
+        center_x = self.size_km * (SQRT3 * self.q + SQRT3 / 2 * self.r)
+        center_y = self.size_km * 1.5 * self.r
+        corner_x = center_x[:, None] + self.size_km * np.cos(_CORNERS)
+        corner_y = center_y[:, None] + self.size_km * np.sin(_CORNERS)
+        lng, lat = world_to_lnglat(corner_x / km_per_world, corner_y / km_per_world)
+        lng, lat = np.round(lng, 5), np.round(lat, 5)
+        return [
+            {
+                'type': 'Feature',
+                'id': int(i),
+                'geometry': {'type': 'Polygon',
+                             'coordinates': [[[x, y] for x, y in zip(lng[i].tolist() + lng[i, :1].tolist(),
+                                                                     lat[i].tolist() + lat[i, :1].tolist())]]},
+            }
+            for i in range(len(self.q))
+        ]
+
+    def __len__(self):
+        return len(self.q)
+
+
+class HexbinPyramid:
+    """Hexagon counts at every size in `sizes` for date-sorted client points."""
+
+    def __init__(self, lng, lat, dates, sizes=HEX_SIZES_KM, bounds=ERIE_BOUNDS):
+        # Web Mercator scaled to km at the middle of the map, where hexagons look regular
+        middle = np.radians((bounds['south'] + bounds['north']) / 2)
+        km_per_world = EARTH_CIRCUMFERENCE_KM * np.cos(middle)
+        x, y = lnglat_to_world(lng, lat)
+        inside = ((np.asarray(lng) >= bounds['west']) & (np.asarray(lng) <= bounds['east'])
+                  & (np.asarray(lat) >= bounds['south']) & (np.asarray(lat) <= bounds['north']))
+        x_km = np.where(inside, x * km_per_world, np.nan)
+        y_km = np.where(inside, y * km_per_world, np.nan)
+
+        self.days = np.asarray(dates).astype('datetime64[D]')
+        months = self.days.astype('datetime64[M]')
+        self.first_month = months[0] if len(months) else np.datetime64('today', 'M')
+        month_index = (months - self.first_month).astype(np.int64)
+        month_count = int(month_index[-1]) + 1 if len(months) else 1
+        self.levels = {size: HexLevel(size, x_km, y_km, month_index, month_count, km_per_world) for size in sizes}
+
+    @property
+    def sizes(self):
+        return list(self.levels)
+
+    def as_of(self, size, cutoff):
+        """Clients per occupied hexagon of `size` on `cutoff` (inclusive)."""
+        level = self.levels[size]
+        cutoff = np.datetime64(cutoff, 'D')
+        month = int((cutoff.astype('datetime64[M]') - self.first_month).astype(np.int64))
+        if month < 0:
+            return np.zeros(len(level), dtype=np.int32)
+        if month >= len(level.cumulative):
+            return level.cumulative[-1]
+        month_start = np.datetime64(cutoff.astype('datetime64[M]'), 'D')
+        start, stop = np.searchsorted(self.days, [month_start, cutoff + 1])
+        counts = level.cumulative[month - 1] if month > 0 else np.zeros(len(level), dtype=np.int32)
+        cells = level.cells[start:stop]
+        return counts + np.bincount(cells[cells >= 0], minlength=len(level)).astype(np.int32)
+
+    def geojson(self, size, cells):
+        """FeatureCollection of the hexagons `cells` of `size`; feature ids are cell numbers."""
+        features = self.levels[size].features
+        return {'type': 'FeatureCollection', 'features': [features[i] for i in cells]}
+
+
+def hexbins_from_snapshot(snapshot, **kwargs):
+    return HexbinPyramid(snapshot['lng'], snapshot['lat'], snapshot['date'], **kwargs)
+
+
+@lru_cache(maxsize=2)
+def hexbins_for_version(version):
+    # Process-wide, so the startup preload and every session share one build
+    return hexbins_from_snapshot(snapshot_for_version(version))
@@ -0,0 +1,212 @@
+"""Incremental ingest of PetPoint exports into a new snapshot version.
+
+Every export row is fingerprinted (see `pantry_snapshot.FINGERPRINT_COLUMNS`)
+and compared with the live snapshot by `Person ID`:
+
+* unchanged rows are carried over without parsing or geocoding,
+* inserted and changed rows are parsed and geocoded from the SQLite cache;
+  a row whose address has no coordinates yet stays pending (a changed
+  client keeps its previous row) and is tried again on the next ingest,
+* clients missing from the export are removed.
+
+Only the year partitions touched by the delta are rewritten; the rest are
+reused by id, and the running app picks up the new version on its next
+rerun, reopening just the changed partitions.  The version's rollup (see
+`pantry_rollup.py`) is written alongside it.
+
+    python ingest_pantry.py --bootstrap              # first version from the JSON
+    python ingest_pantry.py                          # ingest PantryMap.csv
+    python ingest_pantry.py --csv new_export.csv --geocode nominatim
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from geocode_pantry import CACHE_PATH, GeocodeCache, address_frame, make_backend, update_cache
+from pantry_rollup import write_rollup
+from pantry_snapshot import (
+    CSV_PATH,
+    JSON_PATH,
+    SNAPSHOT_DIR,
+    build_columns,
+    current_version,
+    export_json,
+    normalize_person_id,
+    normalize_postal_code,
+    open_snapshot,
+    read_export,
+    row_fingerprints,
+    write_snapshot,
+)
+
+
+def _parse_dates(values):
+    dates = pd.to_datetime(values, format='%m/%d/%y', errors='coerce')
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry], format='mixed', errors='coerce')
+    return dates
+
+
+def diff_export(export, previous):
+    """Classify export rows against the previous snapshot.
+
+    Returns `(delta_mask, removed_rows)`: a mask of export rows that are new
+    or changed, and the previous snapshot rows whose client is no longer in
+    the export.
+    """
+    if previous is None or len(previous) == 0:
+        return np.ones(len(export), dtype=bool), np.array([], dtype=np.int64)
+
+    previous_ids = pd.Index(np.asarray(previous['person_id']))
+    positions = previous_ids.get_indexer(export['person_id'])
+    is_new = positions == -1
+    is_changed = ~is_new & (previous['fingerprint'][np.where(is_new, 0, positions)] != export['fingerprint'].to_numpy())
+
+    removed = pd.Index(export['person_id']).get_indexer(previous_ids) == -1
+    return is_new | is_changed, np.flatnonzero(removed)
+
+
+def parse_delta(delta, cache):
+    """Turn new/changed export rows into snapshot rows (geocoded from `cache`)."""
+    delta = address_frame(delta)
+    coords = cache.lookup(delta['address'])
+    rows = pd.DataFrame({
+        'lat': [coords.get(a, (np.nan, np.nan))[0] for a in delta['address']],
+        'lng': [coords.get(a, (np.nan, np.nan))[1] for a in delta['address']],
+        'name': (delta['Name Last'].fillna('') + ', ' + delta['Name First'].fillna('')).str.strip(', '),
+        'address_type': delta['Address Type'],
+        'date': _parse_dates(delta['Association Creation Date']),
+        'person_id': delta['person_id'],
+        'postal_code': delta['Postal Code'].map(normalize_postal_code),
+        'fingerprint': delta['fingerprint'],
+    })
+    return rows[rows['lat'].notna() & rows['lng'].notna() & rows['date'].notna()]
+
+
+def ingest(csv_path=CSV_PATH, path=SNAPSHOT_DIR, cache_path=CACHE_PATH, backend=None,
+           workers=4, rate=1.0, retry_failed=False, progress=print):
+    """Apply an export to the live snapshot; returns `(version, summary)`."""
+    export = read_export(csv_path)
+    export['person_id'] = export['Person ID'].map(normalize_person_id)
+    export['fingerprint'] = row_fingerprints(export)
+    export = export[export['person_id'] != ''].drop_duplicates('person_id', keep='last').reset_index(drop=True)
+
+    version = current_version(path)
+    previous = open_snapshot(version, path) if version else None
+    delta_mask, removed = diff_export(export, previous)
+    delta = export[delta_mask]
+
+    with GeocodeCache(cache_path) as cache:
+        if len(cache) == 0:
+            cache.import_legacy_json(export)
+        if backend is not None and len(delta):
+            update_cache(delta, cache, backend, workers=workers, rate=rate, retry_failed=retry_failed,
+                         progress=progress)
+        new_rows = parse_delta(delta, cache)
+
+    # A changed client's previous row is only replaced once its new row is ready
+    replaced = np.array([], dtype=np.int64)
+    if previous is not None and len(previous):
+        replaced = pd.Index(np.asarray(previous['person_id'])).get_indexer(new_rows['person_id'])
+        replaced = replaced[replaced >= 0]
+    dropped = np.union1d(removed, replaced)
+
+    summary = {
+        'export_rows': len(export),
+        'unchanged': len(export) - int(delta_mask.sum()),
+        'inserted_or_changed': len(new_rows),
+        'not_geocoded': len(delta) - len(new_rows),
+        'removed': int(len(removed)),
+    }
+    if new_rows.empty and len(dropped) == 0:
+        return version, dict(summary, partitions_written=0, partitions_reused=len(previous.manifest['partitions']) if previous else 0)
+
+    # Year partitions touched by the delta, before and after the change
+    affected = {str(year) for year in new_rows['date'].dt.year.unique()}
+    address_types = []
+    frames = [new_rows]
+    reuse = {}
+    if previous is not None:
+        address_types = list(previous.categories['address_type'])
+        previous_years = previous['date'].astype('datetime64[Y]').astype(int) + 1970
+        affected |= {str(year) for year in np.unique(previous_years[dropped])}
+        reuse = {p['key']: p for p in previous.manifest['partitions'] if p['key'] not in affected}
+
+        carried = np.isin(previous_years.astype(str), sorted(affected))
+        carried[dropped] = False
+        # Carried-over clients keep their ZCTA; build_columns only locates the new rows
+        keep = previous.frame(['lat', 'lng', 'name', 'address_type', 'date', 'person_id', 'postal_code',
+                               'fingerprint', 'zcta', 'zip_mismatch'])
+        keep = keep[carried]
+        keep['address_type'] = keep['address_type'].astype(str)
+        frames.insert(0, keep)
+
+    # An emptied year partition leaves nothing to concatenate but the (empty) new rows
+    rows = pd.concat([frame for frame in frames if len(frame)] or [new_rows], ignore_index=True)
+    columns = build_columns(rows, address_types)
+    new_version = write_snapshot(columns, address_types, path, reuse=reuse,
+                                 sources={'export': os.path.basename(csv_path)})
+    # Month x ZIP x address type rollup behind the app's metrics and trend charts
+    write_rollup(open_snapshot(new_version, path), path)
+    summary.update(partitions_written=len(affected), partitions_reused=len(reuse))
+    return new_version, summary
+
+
+def bootstrap_from_json(json_path=JSON_PATH, csv_path=CSV_PATH, path=SNAPSHOT_DIR):
+    """Create the first version from processed_pantry_data.json and the export."""
+    with open(json_path, 'r') as f:
+        df = pd.DataFrame(json.load(f), columns=['lat', 'lng', 'name', 'address_type', 'date', 'person_id'])
+    df['person_id'] = df['person_id'].map(normalize_person_id)
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+
+    if os.path.exists(csv_path):
+        export = read_export(csv_path)
+        export = pd.DataFrame({
+            'person_id': export['Person ID'].map(normalize_person_id),
+            'postal_code': export['Postal Code'].map(normalize_postal_code),
+            'fingerprint': row_fingerprints(export),
+        }).drop_duplicates('person_id', keep='last')
+        df = df.merge(export, on='person_id', how='left')
+    df['postal_code'] = df.get('postal_code', pd.Series(index=df.index, dtype=object)).fillna('')
+    # Clients missing from the export get fingerprint 0, so the next ingest refreshes them
+    df['fingerprint'] = df.get('fingerprint', pd.Series(index=df.index, dtype=float)).fillna(0)
+
+    address_types = []
+    columns = build_columns(df, address_types)
+    version = write_snapshot(columns, address_types, path, sources={'bootstrap': os.path.basename(json_path)})
+    write_rollup(open_snapshot(version, path), path)
+    return version
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--csv', default=CSV_PATH, help='PetPoint export to ingest')
+    parser.add_argument('--cache', default=CACHE_PATH, help='SQLite geocode cache')
+    parser.add_argument('--geocode', metavar='BACKEND',
+                        help="geocode addresses missing from the cache first (geopy service or 'lookup:<file.json>')")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1.0)
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='ask the geocoder again for pending addresses it found nothing for before')
+    parser.add_argument('--bootstrap', action='store_true',
+                        help='create the first snapshot version from processed_pantry_data.json instead')
+    parser.add_argument('--export-json', action='store_true',
+                        help='also rewrite processed_pantry_data.json, which new snapshot directories are bootstrapped from')
+    args = parser.parse_args()
+
+    if args.bootstrap:
+        if current_version() is not None:
+            parser.error(f"{SNAPSHOT_DIR} already has a version; ingest an export instead")
+        version = bootstrap_from_json(csv_path=args.csv)
+        print(f"Snapshot {version}: {len(open_snapshot(version)):,} clients from {os.path.basename(JSON_PATH)}")
+    else:
+        backend = make_backend(args.geocode) if args.geocode else None
+        version, summary = ingest(args.csv, cache_path=args.cache, backend=backend, workers=args.workers,
+                                  rate=args.rate, retry_failed=args.retry_failed)
+        print(f"Snapshot {version}: " + ', '.join(f"{key.replace('_', ' ')} {value:,}" for key, value in summary.items()))
+    if args.export_json:
+        export_json(open_snapshot(version))
@@ -1,15 +1,37 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import json
+import numpy as np
+import plotly.graph_objects as go
 import os
-from datetime import datetime, timedelta
-import plotly.io as pio
-import geopandas as gpd
+from datetime import datetime
+import sys
+from pantry_snapshot import current_version, format_petpoint_link, snapshot_for_version
+from density_grid import density_for_version
+from hexbin_grid import DEFAULT_HEX_SIZE_KM, HEX_SIZES_KM, hexbins_for_version
+from pantry_rollup import GROWTH_MONTHS, rollup_for_version
+from client_table import client_table_for_version
+from cluster_index import MAX_ZOOM, MIN_ZOOM, cluster_index_for_version
 
-# At the top of your file, add this to get the project root directory
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 SHARED_DATA_PATH = os.path.join(PROJECT_ROOT, 'shared_data')
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.geodata import zip_layer
+from shared_data.vector_tiles import lnglat_to_world, world_to_lnglat
+from shared_data.zip_topology import zip_geojson_for_zoom
+from shared_data import perf
+from shared_data.paged_table import paged_table
+import startup
+from startup import MAP_ZOOM
+
+# Vector tile server (`python tile_server.py`) for the tiled markers/heatmap, as
+# the browser reaches it (not necessarily the host the app runs on); unset
+# turns the option off
+TILE_SERVER_URL = os.environ.get('PANTRY_TILE_SERVER_URL')
+# Map size in pixels (wide layout, chart height) the markers view queries its
+# clusters for; half a view more on every side is included, so a short pan in
+# the browser still finds markers
+MARKER_VIEW_SIZE = (1400, 650)
 
 # Page config
 st.set_page_config(
@@ -17,6 +39,9 @@ st.set_page_config(
     page_icon="🐾",
     layout="wide"
 )
+perf.start_rerun('pantry')
+# Warms the ZIP geometry and density grids in the background (once per process)
+startup.start()
 
 # Custom CSS
 st.markdown("""
@@ -79,55 +104,83 @@ if not check_password():
     st.stop()
 
 # Load data
-@st.cache_data
+@perf.cached(st.cache_resource(max_entries=2))
+def load_snapshot(version):
+    # The same object the density, hexagon, rollup and table builders read
+    return snapshot_for_version(version)
+
 def load_data():
-    data_path = os.path.join(os.path.dirname(__file__), 'processed_pantry_data.json')
-    if os.path.exists(data_path):
-        with open(data_path, 'r') as f:
-            return json.load(f)
-    return []
-
-@st.cache_data
-def load_geojson():
-    geojson_path = os.path.join(SHARED_DATA_PATH, 'erie_survey_zips.geojson')
-    if os.path.exists(geojson_path):
-        return gpd.read_file(geojson_path)
-    return None
+    # CURRENT is re-read on every rerun so a new ingest shows up without a restart
+    version = current_version()
+    return load_snapshot(version) if version is not None else None
 
-# Main app
-st.title("Pet Pantry Client Map")
+@perf.cached(st.cache_resource(max_entries=2))
+def load_density(version):
+    # Monthly cumulative density grids, built once per snapshot version (or by the preload)
+    return density_for_version(version)
 
-# Load data
-data = load_data()
-if not data:
-    st.error("No data found. Please ensure processed_pantry_data.json exists.")
-    st.stop()
+@perf.cached(st.cache_data(max_entries=64))
+def density_image(version, selected_date):
+    return load_density(version).image_url(selected_date)
 
-# Convert to DataFrame
-df = pd.DataFrame(data)
+@perf.cached(st.cache_resource(max_entries=2))
+def load_hexbins(version):
+    # Monthly cumulative hexagon counts at every size, built once per snapshot version (or by the preload)
+    return hexbins_for_version(version)
 
-# Load original CSV for ZIP codes
-csv_df = pd.read_csv('PantryMap.csv')
+@perf.cached(st.cache_resource(max_entries=2))
+def load_rollup(version):
+    # Month x ZIP x address type counts written at ingest, behind the metrics and trends
+    return rollup_for_version(version)
 
-# Convert date strings to datetime
-df['date'] = pd.to_datetime(df['date'])
+@perf.cached(st.cache_resource(max_entries=2))
+def load_clusters(version):
+    # Quadtree cluster index for zooms 7-18, built once per snapshot version
+    return cluster_index_for_version(version)
 
-# Add PetPoint link column
-base_url = "https://sms.petpoint.com/sms3/enhanced/person/"
-def format_petpoint_link(pid):
-    digits = ''.join(filter(str.isdigit, str(pid)))
-    digits = digits.lstrip('0')
-    return base_url + digits
+@perf.cached(st.cache_resource(max_entries=2))
+def load_client_table(version):
+    # Sort orders and search index for the data table, built once per snapshot version
+    return client_table_for_version(version)
 
-df['petpoint_link'] = df['person_id'].apply(format_petpoint_link)
+@perf.cached(st.cache_resource(max_entries=2))
+def monthly_zip_counts(version):
+    # Cumulative clients per ZIP (in ZIP layer order) at the end of every month,
+    # shared read-only by every session
+    snapshot = load_snapshot(version)
+    layer = zip_layer()
+    months = snapshot['date'].astype('datetime64[M]')
+    month_index = (months - months[0]).astype(np.int64)
+    month_count = int(month_index[-1]) + 1
+    order = np.argsort(layer.zip_codes)
+    found = np.clip(np.searchsorted(layer.zip_codes[order], snapshot['zcta']), 0, len(order) - 1)
+    known = layer.zip_codes[order][found] == snapshot['zcta']
+    flat = month_index[known] * len(layer) + order[found][known]
+    counts = np.bincount(flat, minlength=month_count * len(layer)).reshape(month_count, len(layer))
+    labels = tuple(np.arange(months[0], months[0] + month_count).astype(str).tolist())
+    monthly = np.cumsum(counts, axis=0).astype(np.int32)
+    monthly.flags.writeable = False
+    return labels, monthly
+
+# Main app
+st.title("Pet Pantry Client Map")
+
+# Load data
+perf.stage('load_data')
+snapshot = load_data()
+if snapshot is None or len(snapshot) == 0:
+    st.error("No client snapshot found. Run `python ingest_pantry.py --bootstrap` (from processed_pantry_data.json) "
+             "or `python ingest_pantry.py` (from the PetPoint export) first.")
+    st.stop()
 
 # Create controls in a single row
+perf.stage('controls')
 col1, col2 = st.columns([3, 1])
 
 with col1:
     # Create year selector
-    min_date = df['date'].min().date()
-    max_date = df['date'].max().date()
+    min_date = snapshot.min_date.item()
+    max_date = snapshot.max_date.item()
     years = range(min_date.year, max_date.year + 1)
     year_options = list(years)
     
@@ -155,26 +208,44 @@ with col2:
     # Add visualization type selector
     map_type = st.radio(
         "Map Type",
-        ["Markers", "Heatmap", "Choropleth"],
+        ["Markers", "Heatmap", "Hexbin", "Choropleth", "Timeline"],
         horizontal=True
     )
 
-# Filter data for selected date
-filtered_df = df[df['date'].dt.date <= selected_date]
+# Filter data for selected date. The snapshot is sorted by date, so the
+# clients as of any day are the first `client_count` rows of every column.
+perf.stage('date_mask')
+client_count = snapshot.rows_as_of(selected_date)
+
+# Plotly does not report its viewport back to Streamlit, so the view is picked
+# in the sidebar: every map opens at it, the ZIP outlines use the
+# simplification level for its zoom and the markers are clustered for it
+layer = zip_layer()
+center_zip = st.sidebar.selectbox("Center map on", ["Erie County"] + layer.zip_codes.tolist())
+zoom = st.sidebar.slider(
+    "Map zoom", MIN_ZOOM, MAX_ZOOM, MAP_ZOOM,
+    help="Zoom level the map opens at; ZIP outlines are simplified and markers clustered for it"
+)
+if center_zip == "Erie County":
+    center = {"lat": 42.8864, "lon": -78.8784}
+else:
+    position = layer.positions[center_zip]
+    center = {"lat": float(layer.interior_lat[position]), "lon": float(layer.interior_lon[position])}
+perf.stage('figure')
 
 # Create map based on selected type
 if map_type == "Choropleth":
-    geojson_path = os.path.join(SHARED_DATA_PATH, 'erie_survey_zips.geojson')
-    with open(geojson_path, 'r') as f:
-        geojson_data = json.load(f)
-    
-    # Filter CSV data by date
-    csv_df['Association Creation Date'] = pd.to_datetime(csv_df['Association Creation Date'])
-    filtered_csv = csv_df[csv_df['Association Creation Date'].dt.date <= selected_date]
+    # Only the choropleth needs plotly.express
+    import plotly.express as px
+
+    # Simplified, quantized ZIP polygons for the opening zoom level
+    geojson_data = zip_geojson_for_zoom(zoom)
     
-    # Count clients per zip code from the filtered CSV data
-    zip_counts = filtered_csv['Postal Code'].value_counts().reset_index()
-    zip_counts.columns = ['ZCTA5CE10', 'count']
+    # Count clients per ZCTA their geocoded point falls in (assigned at ingest)
+    with perf.span('value_counts'):
+        zcta = snapshot['zcta'][:client_count]
+        zip_codes, counts = np.unique(zcta[zcta != ''], return_counts=True)
+        zip_counts = zip_layer().counts_frame(pd.Series(counts, index=zip_codes))
     
     # Create the choropleth map
     fig = px.choropleth_mapbox(
@@ -185,8 +256,8 @@ if map_type == "Choropleth":
         color='count',
         color_continuous_scale="YlOrRd",
         mapbox_style="carto-positron",
-        zoom=7,
-        center={"lat": 42.8864, "lon": -78.8784},
+        zoom=zoom,
+        center=center,
         opacity=0.7,
         title=f"Pet Pantry Clients by ZIP Code as of {selected_date.strftime('%B %d, %Y')}"
     )
@@ -201,43 +272,213 @@ if map_type == "Choropleth":
         margin={"r":0,"t":30,"l":0,"b":0}
     )
     
+    perf.stage('chart')
+    perf.record_bytes('figure', lambda: len(fig.to_json()))
+    st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
+    mismatches = int(np.count_nonzero(snapshot['zip_mismatch'][:client_count]))
+    if mismatches:
+        st.caption(f"{mismatches:,} clients were geocoded outside the ZIP code of their PetPoint postal code.")
+
+elif map_type == "Hexbin":
+    # Clients per hexagon from the monthly pyramid: only occupied hexagons are
+    # drawn, and no client position or name is sent to the browser
+    hex_size = float(st.sidebar.select_slider(
+        "Hexagon size (km)", options=[f"{km:g}" for km in HEX_SIZES_KM], value=f"{DEFAULT_HEX_SIZE_KM:g}",
+        help="Distance from a hexagon's center to its corners"
+    ))
+    hexbins = load_hexbins(snapshot.version)
+    with perf.span('value_counts'):
+        hex_counts = hexbins.as_of(hex_size, selected_date)
+        cells = np.flatnonzero(hex_counts)
+
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=hexbins.geojson(hex_size, cells),
+        locations=cells,
+        z=hex_counts[cells],
+        colorscale="YlOrRd",
+        marker_opacity=0.7,
+        marker_line_width=0.5,
+        colorbar_title="count",
+        hovertemplate="%{z:,} clients<extra></extra>"
+    ))
+    fig.update_layout(
+        title=f"Pet Pantry Clients per {hex_size:g} km Hexagon as of {selected_date.strftime('%B %d, %Y')}",
+        mapbox_style="carto-positron",
+        mapbox_zoom=zoom,
+        mapbox_center=center,
+        mapbox_bounds={
+            "west": -80.5,
+            "east": -77.5,
+            "south": 41.8,
+            "north": 43.4
+        },
+        margin={"r":0,"t":30,"l":0,"b":0},
+        height=650
+    )
+
+    perf.stage('chart')
+    perf.record_bytes('figure', lambda: len(fig.to_json()))
+    st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
+    outside = client_count - int(hex_counts.sum())
+    if outside:
+        st.caption(f"{outside:,} clients outside the map area are not counted.")
+
+elif map_type == "Timeline":
+    # Every month's counts ship once as animation frames that only replace the
+    # colors of the same ZIP polygons; scrubbing and playback stay in the browser
+    with perf.span('value_counts'):
+        months, monthly = monthly_zip_counts(snapshot.version)
+    start = min(int(np.searchsorted(months, selected_date.strftime('%Y-%m'))), len(months) - 1)
+    title = "Pet Pantry Clients by ZIP Code as of {}"
+    month_names = [datetime.strptime(month, '%Y-%m').strftime('%B %Y') for month in months]
+
+    fig = go.Figure(
+        data=[go.Choroplethmapbox(
+            geojson=zip_geojson_for_zoom(zoom),
+            locations=zip_layer().zip_codes,
+            featureidkey="properties.ZCTA5CE10",
+            z=monthly[start],
+            zmin=0,
+            zmax=max(int(monthly[-1].max()), 1),
+            colorscale="YlOrRd",
+            marker_opacity=0.7,
+            colorbar_title="count"
+        )],
+        frames=[
+            go.Frame(data=[go.Choroplethmapbox(z=counts)], name=month, layout=dict(title_text=title.format(name)))
+            for month, name, counts in zip(months, month_names, monthly)
+        ]
+    )
+    fig.update_layout(
+        title=title.format(month_names[start]),
+        mapbox_style="carto-positron",
+        mapbox_zoom=zoom,
+        mapbox_center=center,
+        mapbox_bounds={
+            "west": -80.5,
+            "east": -77.5,
+            "south": 41.8,
+            "north": 43.4
+        },
+        margin={"r":0,"t":30,"l":0,"b":0},
+        height=650,
+        updatemenus=[dict(
+            type="buttons",
+            direction="left",
+            x=0, y=0, xanchor="left", yanchor="top",
+            pad={"t": 50},
+            buttons=[
+                dict(label="Play", method="animate",
+                     args=[None, dict(frame=dict(duration=150, redraw=True), transition=dict(duration=0), fromcurrent=True)]),
+                dict(label="Pause", method="animate",
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), transition=dict(duration=0), mode="immediate")])
+            ]
+        )],
+        sliders=[dict(
+            active=start,
+            x=0.12, len=0.88, y=0, yanchor="top",
+            pad={"t": 30},
+            currentvalue=dict(visible=False),
+            # One step per month, labelled only at each new year
+            steps=[
+                dict(method="animate", label=month[:4] if month.endswith('-01') else "",
+                     args=[[month], dict(frame=dict(duration=0, redraw=True), transition=dict(duration=0), mode="immediate")])
+                for month in months
+            ]
+        )]
+    )
+
+    perf.stage('chart')
+    perf.record_bytes('figure', lambda: len(fig.to_json()))
     st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
 
 else:
-    # Create scatter map for markers or heatmap
-    if map_type == "Heatmap":
-        # Create a heatmap using scatter_mapbox with size and opacity
-        fig = px.scatter_mapbox(
-            filtered_df,
-            lat="lat",
-            lon="lng",
-            color_discrete_sequence=["#FF5733"],
-            zoom=9,
+    use_tiles = bool(TILE_SERVER_URL) and st.sidebar.checkbox(
+        "Load map data from tile server",
+        help=f"Fetch only the vector tiles in view from {TILE_SERVER_URL} instead of embedding "
+             "every client in the page. Tiles show clients merged into cells of about 200 m, "
+             "without hover details."
+    )
+
+    if use_tiles:
+        # Empty trace; the points and ZIP outlines come from the tile server
+        fig = go.Figure(go.Scattermapbox(lat=[], lon=[], mode="markers"))
+        fig.update_layout(
             height=650,
-            hover_data=["name", "address_type", "petpoint_link"],
-            size_max=15,
-            opacity=0.7
+            mapbox_zoom=zoom,
+            mapbox_center=center,
+            mapbox_layers=[
+                dict(
+                    sourcetype="vector",
+                    source=[f"{TILE_SERVER_URL}/tiles/zips/{{z}}/{{x}}/{{y}}.pbf"],
+                    sourcelayer="zips",
+                    type="line",
+                    color="#333",
+                    line=dict(width=1),
+                    opacity=0.4
+                ),
+                dict(
+                    sourcetype="vector",
+                    source=[f"{TILE_SERVER_URL}/tiles/clients/{{z}}/{{x}}/{{y}}.pbf?until={selected_date.isoformat()}"],
+                    sourcelayer="clients",
+                    type="circle",
+                    color="#FF5733",
+                    circle=dict(radius=10 if map_type == "Heatmap" else 4),
+                    opacity=0.6 if map_type == "Heatmap" else 0.9
+                ),
+            ]
         )
-        
-        # Add heatmap effect
-        fig.update_traces(
-            marker=dict(
-                size=20,
-                opacity=0.6,
-                sizemode='diameter',
-                sizeref=2,
-                sizemin=4
-            )
+    elif map_type == "Heatmap":
+        # One precomputed density image instead of a marker per client
+        density = load_density(snapshot.version)
+        fig = go.Figure(go.Scattermapbox(lat=[], lon=[], mode="markers"))
+        fig.update_layout(
+            height=650,
+            mapbox_zoom=zoom,
+            mapbox_center=center,
+            mapbox_layers=[
+                dict(
+                    sourcetype="image",
+                    source=density_image(snapshot.version, selected_date),
+                    coordinates=density.coordinates
+                ),
+            ]
         )
     else:  # Markers
-        fig = px.scatter_mapbox(
-            filtered_df,
-            lat="lat",
-            lon="lng",
-            color_discrete_sequence=["#FF5733"],
-            zoom=9,
+        # The clusters are queried for the view's zoom and the box around it, as
+        # /clusters does for the Flask map, with one marker per cluster cell in view
+        x, y = lnglat_to_world(center["lon"], center["lat"])
+        half_width, half_height = (size / (256 * 2 ** zoom) for size in MARKER_VIEW_SIZE)
+        west, north = world_to_lnglat(x - half_width, y - half_height)
+        east, south = world_to_lnglat(x + half_width, y + half_height)
+        clusters, leaves = load_clusters(snapshot.version).query(
+            zoom, (float(west), float(south), float(east), float(north)), stop=client_count
+        )
+        leaves_df = snapshot.frame(['lat', 'lng', 'name', 'address_type', 'person_id'], rows=leaves)
+        leaves_df['petpoint_link'] = leaves_df['person_id'].map(format_petpoint_link)
+        fig = go.Figure()
+        fig.add_trace(go.Scattermapbox(
+            lat=clusters['lat'],
+            lon=clusters['lng'],
+            mode="markers",
+            marker=dict(size=np.clip(8 + 3 * np.sqrt(clusters['count']), 10, 40), color="#FF5733", opacity=0.6),
+            customdata=clusters['count'],
+            hovertemplate="%{customdata:,} clients<extra></extra>",
+            name="clusters"
+        ))
+        fig.add_trace(go.Scattermapbox(
+            lat=leaves_df['lat'],
+            lon=leaves_df['lng'],
+            mode="markers",
+            marker=dict(size=9, color="#FF5733"),
+            customdata=leaves_df[['name', 'address_type', 'petpoint_link']].astype(str).to_numpy(),
+            name="clients"
+        ))
+        fig.update_layout(
             height=650,
-            hover_data=["name", "address_type", "petpoint_link"]
+            showlegend=False,
+            mapbox_zoom=zoom,
+            mapbox_center=center
         )
     
     fig.update_layout(
@@ -258,20 +499,90 @@ else:
         Address Type: %{customdata[1]}<br>
         <a href="%{customdata[2]}" target="_blank">View in PetPoint</a>
         <extra></extra>
-        """
+        """,
+        selector=dict(name="clients")
     )
     
+    perf.stage('chart')
+    perf.record_bytes('figure', lambda: len(fig.to_json()))
     st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
 
-# Add year display
-st.markdown(f'<div class="year-display">{selected_date.year}</div>', unsafe_allow_html=True)
+# Add year display (the timeline shows its own month in the title)
+if map_type != "Timeline":
+    st.markdown(f'<div class="year-display">{selected_date.year}</div>', unsafe_allow_html=True)
 
-# Statistics
+# Statistics, answered from the rollup instead of the client rows
+perf.stage('statistics')
+rollup = load_rollup(snapshot.version)
 st.sidebar.header("Statistics")
-st.sidebar.metric("Total Clients", len(filtered_df))
-st.sidebar.metric("Unique Locations", filtered_df['name'].nunique())
+st.sidebar.metric("Total Clients", rollup.clients_as_of(selected_date))
+st.sidebar.metric("Unique Locations", rollup.names_as_of(selected_date))
+
+# Trends, per month through the selected date
+if st.sidebar.checkbox("Show Trends"):
+    perf.stage('trends')
+    growth_tab, zips_tab, mix_tab = st.tabs(["Monthly Growth", "Top-Growing ZIPs", "Home vs Temporary"])
+
+    with growth_tab:
+        growth = rollup.monthly_growth(selected_date)
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=growth['month'], y=growth['new'], name="New clients", marker_color="#FF5733"))
+        fig.add_trace(go.Scatter(x=growth['month'], y=growth['cumulative'], name="Total clients",
+                                 yaxis="y2", line=dict(color="#333")))
+        fig.update_layout(
+            height=350,
+            margin={"r":0,"t":30,"l":0,"b":0},
+            yaxis=dict(title="New clients per month"),
+            yaxis2=dict(title="Total clients", overlaying="y", side="right", rangemode="tozero"),
+            legend=dict(orientation="h", y=1.1)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    with zips_tab:
+        top_zips = rollup.top_growing_zips(selected_date)
+        if top_zips.empty:
+            st.info(f"No new clients in the {GROWTH_MONTHS} months up to {selected_date.strftime('%B %Y')}.")
+        else:
+            growth_labels = [f"+{growth:.0%}" if growth == growth else "new" for growth in top_zips['growth']]
+            fig = go.Figure(go.Bar(
+                x=top_zips['new'],
+                y=top_zips['zcta'],
+                orientation='h',
+                marker_color="#FF5733",
+                text=growth_labels,
+                customdata=top_zips['before'],
+                hovertemplate="%{y}: %{x:,} new clients, %{customdata:,} before<extra></extra>"
+            ))
+            fig.update_layout(
+                height=350,
+                margin={"r":0,"t":30,"l":0,"b":0},
+                title=f"New clients in the {GROWTH_MONTHS} months up to {selected_date.strftime('%B %Y')}",
+                yaxis=dict(type='category', autorange='reversed')
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+    with mix_tab:
+        mix = rollup.address_type_mix(selected_date)
+        fig = go.Figure([
+            go.Scatter(x=mix.index, y=mix[address_type], name=address_type, mode='lines',
+                       stackgroup='mix', groupnorm='percent')
+            for address_type in mix.columns
+        ])
+        fig.update_layout(
+            height=350,
+            margin={"r":0,"t":30,"l":0,"b":0},
+            title=f"Address types of new clients over the previous {GROWTH_MONTHS} months",
+            yaxis=dict(title="% of new clients", range=[0, 100])
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
 # Data table
 if st.sidebar.checkbox("Show Data Table"):
-    st.dataframe(filtered_df[['name', 'date', 'address_type', 'person_id']].sort_values('date', ascending=False)) 
+    perf.stage('data_table')
+    # Newest first; only the page on screen is decoded and sent
+    table_df = paged_table(load_client_table(snapshot.version), 'clients', stop=client_count,
+                           sort='date', descending=True)
+    perf.record_bytes('data_table', lambda: table_df.memory_usage(deep=True).sum())
+
+perf.finish_rerun()
     
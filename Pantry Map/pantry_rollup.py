@@ -0,0 +1,173 @@
+"""Month x ZIP x address type rollup of the pantry clients.
+
+Every snapshot version gets a small rollup next to it
+(`pantry_snapshot/rollups/v0003.npz`), written by `ingest_pantry.py` or,
+for versions published without one, on first open:
+
+* new clients per month x ZCTA (the polygon the point falls in, '' outside
+  the ZIP layer) x address type, and its running total;
+* clients and distinct names (a name counts on the day it first appears)
+  through every day with an association.
+
+The sidebar metrics and the trend charts are answered from these arrays,
+a few thousand numbers however many years of clients there are.  Charts
+are per whole month, through the month of the selected day.
+"""
+import logging
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from pantry_snapshot import SNAPSHOT_DIR, read_manifest, snapshot_for_version
+
+ROLLUP_FORMAT = 1
+OUTSIDE_ZIPS = ''
+GROWTH_MONTHS = 12
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PantryRollup:
+    """New and cumulative clients by month x ZCTA x address type, plus daily totals."""
+
+    def __init__(self, rows, months, zctas, address_types, new, days, clients_through, names_through):
+        self.rows = int(rows)
+        self.months = np.asarray(months, dtype='datetime64[M]')
+        self.zctas = np.asarray(zctas, dtype='<U5')
+        self.address_types = [str(value) for value in address_types]
+        self.new = np.asarray(new, dtype=np.int32)
+        self.cumulative = np.cumsum(self.new, axis=0, dtype=np.int32)
+        self.days = np.asarray(days, dtype='datetime64[D]')
+        self.clients_through = np.asarray(clients_through, dtype=np.int64)
+        self.names_through = np.asarray(names_through, dtype=np.int64)
+        for values in (self.new, self.cumulative, self.days, self.clients_through, self.names_through):
+            values.flags.writeable = False
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """One pass over the snapshot columns (rows are sorted by date)."""
+        dates = np.asarray(snapshot['date'])
+        address_types = list(snapshot.categories['address_type'])
+        month_of_row = dates.astype('datetime64[M]')
+        first_month = month_of_row[0] if len(dates) else np.datetime64('today', 'M')
+        month_index = (month_of_row - first_month).astype(np.int64)
+        month_count = int(month_index[-1]) + 1 if len(dates) else 0
+        zctas, zcta_index = np.unique(np.asarray(snapshot['zcta']), return_inverse=True)
+
+        shape = (month_count, len(zctas), len(address_types))
+        flat = np.ravel_multi_index((month_index, zcta_index, np.asarray(snapshot['address_type'], dtype=np.int64)),
+                                    shape) if len(dates) else np.array([], dtype=np.int64)
+        new = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+        # Running totals at the end of every distinct day
+        days, day_ends = np.unique(dates[::-1], return_index=True)
+        day_ends = len(dates) - day_ends
+        first_names = ~pd.Series(np.asarray(snapshot['name'])).duplicated().to_numpy()
+        names_through = np.cumsum(first_names)[day_ends - 1] if len(dates) else np.array([], dtype=np.int64)
+        return cls(len(dates), np.arange(first_month, first_month + month_count), zctas, address_types, new,
+                   days, day_ends, names_through)
+
+    def save(self, path):
+        """Write to `path` (.npz), atomically."""
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez_compressed(tmp_path, format=ROLLUP_FORMAT, rows=self.rows, months=self.months, zctas=self.zctas,
+                 address_types=np.array(self.address_types, dtype=str), new=self.new, days=self.days,
+                 clients_through=self.clients_through, names_through=self.names_through)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format']) != ROLLUP_FORMAT:
+                raise ValueError(f"Unsupported rollup format in {path}: {int(data['format'])}")
+            return cls(int(data['rows']), data['months'], data['zctas'], data['address_types'].tolist(), data['new'],
+                       data['days'], data['clients_through'], data['names_through'])
+
+    def _through_day(self, totals, cutoff):
+        day = int(np.searchsorted(self.days, np.datetime64(cutoff, 'D'), side='right')) - 1
+        return int(totals[day]) if day >= 0 else 0
+
+    def clients_as_of(self, cutoff):
+        """Clients associated on or before `cutoff`."""
+        return self._through_day(self.clients_through, cutoff)
+
+    def names_as_of(self, cutoff):
+        """Distinct client names associated on or before `cutoff`."""
+        return self._through_day(self.names_through, cutoff)
+
+    def _months_through(self, cutoff):
+        """Number of rollup months up to and including the month of `cutoff`."""
+        return int(np.searchsorted(self.months, np.datetime64(cutoff, 'M'), side='right'))
+
+    def monthly_growth(self, cutoff):
+        """New and cumulative clients per month through the month of `cutoff`."""
+        stop = self._months_through(cutoff)
+        new = self.new[:stop].sum(axis=(1, 2))
+        return pd.DataFrame({'month': self.months[:stop].astype('datetime64[ns]'), 'new': new,
+                             'cumulative': np.cumsum(new)})
+
+    def top_growing_zips(self, cutoff, months=GROWTH_MONTHS, limit=10):
+        """ZCTAs with the most new clients in the `months` months through `cutoff`.
+
+        `growth` is those new clients relative to the ZCTA's clients before
+        the window (NaN for a ZCTA with none).
+        """
+        stop = self._months_through(cutoff)
+        if stop == 0:
+            return pd.DataFrame(columns=['zcta', 'new', 'before', 'growth'])
+        start = max(stop - months, 0)
+        through = self.cumulative[stop - 1].sum(axis=1)
+        before = self.cumulative[start - 1].sum(axis=1) if start > 0 else np.zeros_like(through)
+        frame = pd.DataFrame({'zcta': self.zctas, 'new': through - before, 'before': before})
+        frame = frame[(frame['zcta'] != OUTSIDE_ZIPS) & (frame['new'] > 0)]
+        frame['growth'] = frame['new'] / frame['before'].where(frame['before'] > 0)
+        return frame.sort_values(['new', 'zcta'], ascending=[False, True]).head(limit).reset_index(drop=True)
+
+    def address_type_mix(self, cutoff, months=GROWTH_MONTHS):
+        """New clients per address type over the trailing `months` months, for every month through `cutoff`."""
+        stop = self._months_through(cutoff)
+        by_type = self.cumulative[:stop].sum(axis=1)
+        trailing = by_type - np.vstack([np.zeros((min(months, stop), by_type.shape[1]), dtype=by_type.dtype),
+                                        by_type[:max(stop - months, 0)]])
+        return pd.DataFrame(trailing, columns=self.address_types,
+                            index=pd.Index(self.months[:stop].astype('datetime64[ns]'), name='month'))
+
+
+def rollup_path(version, path=SNAPSHOT_DIR):
+    return os.path.join(path, 'rollups', f'{version}.npz')
+
+
+def write_rollup(snapshot, path=SNAPSHOT_DIR):
+    """Build and store the rollup of `snapshot`; returns it."""
+    rollup = PantryRollup.from_snapshot(snapshot)
+    os.makedirs(os.path.join(path, 'rollups'), exist_ok=True)
+    rollup.save(rollup_path(snapshot.version, path))
+    return rollup
+
+
+def load_rollup(version, path=SNAPSHOT_DIR):
+    """The stored rollup of `version`, built (and stored if possible) when missing or stale."""
+    try:
+        rollup = PantryRollup.load(rollup_path(version, path))
+        if rollup.rows == read_manifest(version, path)['rows']:
+            return rollup
+    except (OSError, ValueError, KeyError):
+        pass
+    snapshot = snapshot_for_version(version, path)
+    try:
+        return write_rollup(snapshot, path)
+    except OSError:
+        _LOGGER.warning("Could not store the rollup of %s; keeping it in memory", version, exc_info=True)
+        return PantryRollup.from_snapshot(snapshot)
+
+
+@lru_cache(maxsize=2)
+def rollup_for_version(version):
+    # Process-wide, so the startup preload and every session share one load
+    return load_rollup(version)
@@ -0,0 +1,410 @@
+"""Versioned, columnar snapshots of the pantry client data.
+
+`processed_pantry_data.json` is a list of dicts, so every read re-parses the
+keys of every row.  Snapshots store the clients as typed `.npy` columns that
+are opened with `numpy.load(mmap_mode='r')` instead, so the app never parses
+JSON or CSV on a rerun.
+
+Layout (everything is append-only; a new export writes a new version)::
+
+    pantry_snapshot/
+        CURRENT                     name of the live version, e.g. "v0003"
+        manifests/v0003.json        ordered partitions + categories
+        partitions/<id>/<col>.npy   one partition per association year
+
+Partition ids are content hashes, so versions share every partition whose
+clients did not change and the app only has to open the changed ones.
+The partitions of a version are not concatenated: each column is a
+`PartitionedColumn` over the memory maps.  `ingest_pantry.py` creates
+new versions from PetPoint exports, and `ingest_pantry.py --bootstrap` the
+first one from `processed_pantry_data.json`; opening a snapshot never writes.
+
+Every client also carries the ZCTA polygon its geocoded point falls in
+(`zcta`, from an STRtree over the shared ZIP layer) and `zip_mismatch`,
+set when that polygon disagrees with the PetPoint postal code.
+"""
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.geodata import zip_layer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JSON_PATH = os.path.join(BASE_DIR, 'processed_pantry_data.json')
+CSV_PATH = os.path.join(BASE_DIR, 'PantryMap.csv')
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'pantry_snapshot')
+
+PETPOINT_BASE_URL = "https://sms.petpoint.com/sms3/enhanced/person/"
+SNAPSHOT_FORMAT = 4
+
+# Export columns whose changes make a client row "changed"
+FINGERPRINT_COLUMNS = [
+    'Person ID', 'Association Creation Date', 'Street Address', 'Unit Number',
+    'City', 'Postal Code', 'Name Last', 'Name First', 'Address Type',
+]
+COLUMN_ORDER = ['lat', 'lng', 'date', 'address_type', 'name', 'person_id',
+                'postal_code', 'fingerprint', 'zcta', 'zip_mismatch']
+
+
+def format_petpoint_link(pid):
+    digits = ''.join(filter(str.isdigit, str(pid)))
+    digits = digits.lstrip('0')
+    return PETPOINT_BASE_URL + digits
+
+
+def normalize_person_id(pid):
+    """PetPoint IDs appear as 'P0000646257' in the CSV and '646257' in the JSON."""
+    return ''.join(filter(str.isdigit, str(pid))).lstrip('0')
+
+
+def normalize_postal_code(code):
+    """Zero-padded 5 digit ZIP, or '' when missing."""
+    if pd.isna(code):
+        return ''
+    digits = ''.join(filter(str.isdigit, str(code).split('.')[0]))
+    return digits[:5].zfill(5) if digits else ''
+
+
+def read_export(csv_path=CSV_PATH):
+    """Read a PetPoint export with every column as text (no float ZIP codes)."""
+    return pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig')
+
+
+def row_fingerprints(export_df):
+    """64-bit hash per export row over `FINGERPRINT_COLUMNS`."""
+    columns = export_df.reindex(columns=FINGERPRINT_COLUMNS).fillna('').astype(str)
+    return pd.util.hash_pandas_object(columns, index=False).to_numpy(dtype=np.uint64)
+
+
+def _string_column(values):
+    # Fixed-width unicode keeps the column mmap-able (object arrays are not)
+    values = ['' if pd.isna(v) else str(v) for v in values]
+    width = max((len(v) for v in values), default=1) or 1
+    return np.array(values, dtype=f'<U{width}')
+
+
+def assign_zcta(lng, lat, postal_codes):
+    """ZCTA containing each point ('' outside the layer) and a mismatch flag.
+
+    Points are deduplicated before the vectorized STRtree query, since many
+    clients share an address.  A client is a mismatch when its postal code
+    and its point name different ZCTAs; a postal code outside the layer with
+    a point outside it agrees.
+    """
+    layer = zip_layer()
+    # Hash-based dedup of (lng, lat) pairs, packed as complex numbers
+    inverse, unique = pd.factorize(np.asarray(lng, dtype=np.float64) + 1j * np.asarray(lat, dtype=np.float64))
+    zcta = layer.locate(unique.real, unique.imag)[inverse]
+    postal_codes = np.asarray(postal_codes, dtype='<U5')
+    mismatch = (postal_codes != '') & (postal_codes != zcta) & ((zcta != '') | np.isin(postal_codes, layer.zip_codes))
+    return zcta, mismatch
+
+
+def build_columns(df, address_types):
+    """Turn a frame of client rows into typed, date-sorted snapshot columns.
+
+    `df` needs lat, lng, name, address_type, date, person_id, postal_code and
+    fingerprint.  Rows that already have `zcta`/`zip_mismatch` (carried over
+    from a previous version) keep them; only the others are located.
+    `address_types` is the snapshot's category list; unseen types are
+    appended to it so existing codes never change.
+    """
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    zcta = np.full(len(df), '', dtype='<U5')
+    mismatch = np.zeros(len(df), dtype=bool)
+    todo = df['zcta'].isna().to_numpy() if 'zcta' in df else np.ones(len(df), dtype=bool)
+    if 'zcta' in df:
+        zcta[~todo] = df['zcta'][~todo]
+        mismatch[~todo] = df['zip_mismatch'][~todo].astype(bool)
+    if todo.any():
+        zcta[todo], mismatch[todo] = assign_zcta(
+            df['lng'].to_numpy()[todo], df['lat'].to_numpy()[todo], df['postal_code'].fillna('').to_numpy()[todo])
+    for value in df['address_type'].fillna('Unknown').unique():
+        if value not in address_types:
+            address_types.append(value)
+    codes = {value: code for code, value in enumerate(address_types)}
+    return {
+        'lat': df['lat'].to_numpy(dtype=np.float32),
+        'lng': df['lng'].to_numpy(dtype=np.float32),
+        'date': pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]'),
+        'address_type': df['address_type'].fillna('Unknown').map(codes).to_numpy(dtype=np.int8),
+        'name': _string_column(df['name']),
+        'person_id': _string_column(df['person_id']),
+        'postal_code': _string_column(df['postal_code']),
+        'fingerprint': df['fingerprint'].to_numpy(dtype=np.uint64),
+        'zcta': zcta,
+        'zip_mismatch': mismatch,
+    }
+
+
+def split_partitions(columns):
+    """Split date-sorted columns into `{year: columns}`."""
+    years = columns['date'].astype('datetime64[Y]')
+    partitions = {}
+    for year in np.unique(years):
+        start, stop = np.searchsorted(years, [year, year + 1])
+        partitions[str(year)] = {name: values[start:stop] for name, values in columns.items()}
+    return partitions
+
+
+def write_partition(columns, path=SNAPSHOT_DIR):
+    """Write one partition; returns its content-hash id (no-op if it exists)."""
+    digest = hashlib.sha1(str(SNAPSHOT_FORMAT).encode())
+    for name in COLUMN_ORDER:
+        digest.update(name.encode())
+        digest.update(str(columns[name].dtype).encode())
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    partition_id = digest.hexdigest()[:16]
+
+    partition_dir = os.path.join(path, 'partitions', partition_id)
+    if os.path.exists(partition_dir):
+        return partition_id
+    tmp_dir = f'{partition_dir}.{os.getpid()}.tmp'
+    os.makedirs(tmp_dir)
+    for name in COLUMN_ORDER:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), columns[name], allow_pickle=False)
+    os.replace(tmp_dir, partition_dir)
+    return partition_id
+
+
+def read_partition(partition_id, path=SNAPSHOT_DIR):
+    partition_dir = os.path.join(path, 'partitions', partition_id)
+    return {
+        name: np.load(os.path.join(partition_dir, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+        for name in COLUMN_ORDER
+    }
+
+
+def current_version(path=SNAPSHOT_DIR):
+    """Name of the live version, or None before the first snapshot."""
+    try:
+        with open(os.path.join(path, 'CURRENT'), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(version, path=SNAPSHOT_DIR):
+    with open(os.path.join(path, 'manifests', f'{version}.json'), 'r') as f:
+        return json.load(f)
+
+
+def write_version(partitions, address_types, path=SNAPSHOT_DIR, sources=None):
+    """Publish a new version made of `partitions` (list of {key, id, rows}).
+
+    The manifest is written first and CURRENT is swapped atomically, so a
+    running app sees either the old or the new version, never a mix.
+    """
+    previous = current_version(path)
+    number = int(previous[1:]) + 1 if previous else 1
+    version = f'v{number:04d}'
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'previous': previous,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rows': sum(p['rows'] for p in partitions),
+        'partitions': sorted(partitions, key=lambda p: p['key']),
+        'categories': {'address_type': address_types},
+        'sources': sources or {},
+    }
+    os.makedirs(os.path.join(path, 'manifests'), exist_ok=True)
+    with open(os.path.join(path, 'manifests', f'{version}.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path = os.path.join(path, f'CURRENT.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(path, 'CURRENT'))
+    return version
+
+
+def write_snapshot(columns, address_types, path=SNAPSHOT_DIR, sources=None, reuse=None):
+    """Partition `columns` by year and publish them as a new version.
+
+    `reuse` maps partition keys to existing partition entries that should be
+    carried over unchanged instead of being rewritten.
+    """
+    partitions = dict(reuse or {})
+    for key, part in split_partitions(columns).items():
+        partitions[key] = {'key': key, 'id': write_partition(part, path), 'rows': int(len(part['date']))}
+    return write_version(list(partitions.values()), address_types, path, sources)
+
+
+class PartitionedColumn(NDArrayOperatorsMixin):
+    """One snapshot column spread over the year partitions, never concatenated.
+
+    Slices are views: a plain array when they fall in one partition, another
+    `PartitionedColumn` otherwise.  Row numbers and masks gather just the
+    selected rows; arithmetic, ufuncs and `np.asarray` get the whole column
+    as one array, built for that call only.
+    """
+
+    ndim = 1
+
+    def __init__(self, parts):
+        self.parts = parts
+        # Row number of the first row of every partition, and the total
+        self.offsets = np.cumsum([0] + [len(part) for part in parts])
+        self.dtype = parts[0].dtype
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @property
+    def shape(self):
+        return (len(self),)
+
+    def __array__(self, dtype=None, copy=None):
+        values = np.concatenate(self.parts)
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [np.asarray(value) if isinstance(value, PartitionedColumn) else value for value in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def astype(self, dtype):
+        return np.concatenate([part.astype(dtype) for part in self.parts])
+
+    def searchsorted(self, value, side='left'):
+        """`np.searchsorted` for a column sorted across partitions (the dates)."""
+        return sum(int(np.searchsorted(part, value, side=side)) for part in self.parts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return np.asarray(self)[key]
+            parts = [part[max(start - offset, 0):stop - offset]
+                     for part, offset in zip(self.parts, self.offsets)
+                     if offset < stop and start < offset + len(part)]
+            if len(parts) > 1:
+                return PartitionedColumn(parts)
+            return parts[0] if parts else self.parts[0][:0]
+        if np.ndim(key) == 0:
+            row = int(key) + len(self) if key < 0 else int(key)
+            if not 0 <= row < len(self):
+                raise IndexError(f"row {key} is out of bounds for {len(self)} rows")
+            index = int(np.searchsorted(self.offsets, row, side='right')) - 1
+            return self.parts[index][row - self.offsets[index]]
+        rows = np.asarray(key)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = np.where(rows < 0, rows + len(self), rows)
+        which = np.searchsorted(self.offsets, rows, side='right') - 1
+        values = np.empty(rows.shape, dtype=self.dtype)
+        for index in np.unique(which):
+            selected = which == index
+            values[selected] = self.parts[index][rows[selected] - self.offsets[index]]
+        return values
+
+
+class PantrySnapshot:
+    """Read-only view of one snapshot version.
+
+    A single-partition snapshot is used straight from the memory maps; with
+    several partitions every column is a `PartitionedColumn` over them, so
+    no version costs more memory than its partitions' mappings, which are
+    shared across versions when opened through `snapshot_for_version`.
+    """
+
+    def __init__(self, manifest, partitions):
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.categories = manifest['categories']
+        partitions = [p for p in partitions if len(p['date'])] or partitions[:1]
+        if len(partitions) == 1:
+            self.columns = dict(partitions[0])
+        else:
+            self.columns = {name: PartitionedColumn([p[name] for p in partitions]) for name in COLUMN_ORDER}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def min_date(self):
+        return self.columns['date'][0]
+
+    @property
+    def max_date(self):
+        return self.columns['date'][-1]
+
+    def rows_as_of(self, cutoff):
+        """Number of clients associated on or before `cutoff` (any date-like).
+
+        Rows are stored in date order, so this is a binary search and the
+        matching clients are always the prefix `[:rows_as_of(cutoff)]`.
+        """
+        cutoff = np.datetime64(pd.Timestamp(cutoff).date(), 'D')
+        return int(self.columns['date'].searchsorted(cutoff, side='right'))
+
+    def frame(self, columns=None, start=0, stop=None, rows=None):
+        """Materialize rows `start:stop` (or the row numbers `rows`) as a DataFrame.
+
+        Numeric columns of a range are passed through without copying;
+        categorical columns are decoded from their codes.
+        """
+        columns = columns or [name for name in COLUMN_ORDER if name != 'fingerprint']
+        data = {}
+        for name in columns:
+            values = np.asarray(self.columns[name][start:stop] if rows is None else self.columns[name][rows])
+            if name in self.categories:
+                values = pd.Categorical.from_codes(values, categories=self.categories[name])
+            data[name] = values
+        return pd.DataFrame(data, copy=False)
+
+
+def open_snapshot(version=None, path=SNAPSHOT_DIR, partition_loader=None):
+    """Open `version` (default: the live one).
+
+    `partition_loader(partition_id)` lets callers cache partitions across
+    versions; it defaults to reading them from disk.  Raises
+    FileNotFoundError before the first version is written.
+    """
+    version = version or current_version(path)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot in {path}; run ingest_pantry.py --bootstrap first")
+    manifest = read_manifest(version, path)
+    loader = partition_loader or (lambda partition_id: read_partition(partition_id, path))
+    return PantrySnapshot(manifest, [loader(p['id']) for p in manifest['partitions']])
+
+
+@lru_cache(maxsize=64)
+def _shared_partition(partition_id, path):
+    # Partitions never change, so one memory map serves every version that lists it
+    return read_partition(partition_id, path)
+
+
+@lru_cache(maxsize=2)
+def snapshot_for_version(version, path=SNAPSHOT_DIR):
+    """`version`, opened once per process (the live and the previous one).
+
+    Every per-version structure (density grids, hexagons, rollup, table
+    index, tiles) is built from this one object and must treat it as
+    read-only.
+    """
+    return open_snapshot(version, path, partition_loader=lambda partition_id: _shared_partition(partition_id, path))
+
+
+def export_json(snapshot, json_path=JSON_PATH):
+    """Write the snapshot back out in the processed_pantry_data.json format."""
+    df = snapshot.frame(['lat', 'lng', 'name', 'address_type', 'date', 'person_id'])
+    df['lat'] = df['lat'].astype(float).round(6)
+    df['lng'] = df['lng'].astype(float).round(6)
+    df['address_type'] = df['address_type'].astype(str)
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    with open(json_path, 'w') as f:
+        json.dump(df.to_dict(orient='records'), f)
+
@@ -0,0 +1,62 @@
+"""Warm-up tasks for the pantry map; see `shared_data/preload.py`."""
+import importlib
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data import preload
+from shared_data.geodata import zip_layer
+from shared_data.zip_topology import zip_geojson_for_zoom
+
+# Default zoom of the sidebar's map view; the preload warms the simplified ZIP
+# geometry for it, other zooms load their level when first picked
+MAP_ZOOM = 9
+
+
+def _current_density():
+    from density_grid import density_for_version
+    from pantry_snapshot import current_version
+    version = current_version()
+    if version is not None:
+        density_for_version(version)
+
+
+def _current_hexbins():
+    from hexbin_grid import hexbins_for_version
+    from pantry_snapshot import current_version
+    version = current_version()
+    if version is not None:
+        hexbins_for_version(version)
+
+
+def _current_rollup():
+    from pantry_rollup import rollup_for_version
+    from pantry_snapshot import current_version
+    version = current_version()
+    if version is not None:
+        rollup_for_version(version)
+
+
+def _current_client_table():
+    from client_table import client_table_for_version
+    from pantry_snapshot import current_version
+    version = current_version()
+    if version is not None:
+        client_table_for_version(version)
+
+
+TASKS = [
+    ('rollup', _current_rollup),
+    ('zip_layer', zip_layer),
+    ('zip_geojson', lambda: zip_geojson_for_zoom(MAP_ZOOM)),
+    ('density', _current_density),
+    ('hexbins', _current_hexbins),
+    ('client_table', _current_client_table),
+    ('plotly.express', lambda: importlib.import_module('plotly.express')),
+]
+
+
+def start():
+    return preload.start('pantry', TASKS)
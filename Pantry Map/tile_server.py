@@ -0,0 +1,206 @@
+"""Local Mapbox Vector Tile server for pantry clients and ZIP polygons.
+
+Serves `/tiles/clients/{z}/{x}/{y}.pbf` (client points from the snapshot)
+and `/tiles/zips/{z}/{x}/{y}.pbf` (the simplified ZCTA polygons).  Tiles are
+cut on first request and cached on disk under `tile_cache/`, keyed by the
+data version, so the maps only download the tiles in their viewport and the
+whole thing works offline once the cache is seeded.  Client tiles for an
+earlier day (`?until=YYYY-MM-DD`) are cut from the cluster index and kept
+in a bounded in-memory cache only, so the disk cache holds one set of tiles
+per version however many days are browsed:
+
+    python tile_server.py --seed      # pre-cut every Erie tile for zooms 7-12
+    python tile_server.py             # serve on http://127.0.0.1:5001
+    python tile_server.py --allow-origin https://maps.example.org
+
+The tile server has no password check, so client tiles never carry names,
+PetPoint IDs or exact positions: clients are merged into cells of 16 px at
+zoom `POINT_CELL_ZOOM` (about 200 m) or coarser, each drawn at its cell's
+center with a count and the earliest association day.  Browsers on other
+origins (the Streamlit apps) may only read the tiles when their origin is
+listed with `--allow-origin` or in `TILE_SERVER_ALLOWED_ORIGINS`.
+"""
+import argparse
+import hashlib
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+from flask import Blueprint, Flask, Response, abort, request
+
+from cluster_index import KEY_BITS, cluster_index_for_version
+from pantry_snapshot import current_version, snapshot_for_version
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data import vector_tiles
+from shared_data.zip_topology import level_for_zoom, level_path, zip_geojson_for_zoom
+
+TILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tile_cache')
+DEFAULT_PORT = 5001
+MIN_ZOOM, MAX_ZOOM = 7, 18
+SEED_MAX_ZOOM = 12
+
+# Client points are merged into one feature per 16x16 px cell, and deeper
+# zooms keep the cells of this one
+POINT_CELL_ZOOM = 13
+# Cells per tile edge, as a quadtree level offset (256 / 16 = 2 ** 4)
+CELL_LEVEL_OFFSET = 4
+# Origins (scheme://host:port) whose pages may fetch tiles cross-origin
+ALLOWED_ORIGINS = {origin.strip() for origin in os.environ.get('TILE_SERVER_ALLOWED_ORIGINS', '').split(',')
+                   if origin.strip()}
+
+LAYERS = ('clients', 'zips')
+# Part of the cache key, so tiles cut by an older release are not served
+TILE_FORMAT = 2
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+tiles = Blueprint('tiles', __name__)
+
+
+def load_snapshot():
+    return snapshot_for_version(current_version())
+
+
+def _file_version(path):
+    stat = os.stat(path)
+    return f'{stat.st_size}-{int(stat.st_mtime)}'
+
+
+def data_version(layer, z):
+    """Short hash that changes whenever the data behind `layer` changes."""
+    if layer == 'clients':
+        source = current_version() or ''
+    else:
+        zip_geojson_for_zoom(z)  # builds the level file if it is missing
+        source = _file_version(level_path(level_for_zoom(z)))
+    return hashlib.sha1(f'{TILE_FORMAT}:{source}'.encode()).hexdigest()[:10]
+
+
+def client_layer(version, z, x, y, stop=None):
+    """Client cells whose center is inside tile z/x/y, counting only snapshot rows before `stop`."""
+    snapshot = snapshot_for_version(version)
+    index = cluster_index_for_version(version)
+    layer = vector_tiles.Layer('clients')
+    level = min(z, POINT_CELL_ZOOM) + CELL_LEVEL_OFFSET
+    # Past zoom 17 a cell is wider than the tile: select its whole cell
+    box_level = min(z, level)
+    scale = 2 ** (z - box_level)
+    x0, y0 = (x // scale) / 2 ** box_level, (y // scale) / 2 ** box_level
+    positions = index.select(x0, y0, x0 + 2.0 ** -box_level, y0 + 2.0 ** -box_level, stop)
+    if positions.size == 0:
+        return layer
+
+    # The clients of a cell are contiguous in key order
+    cells = index.keys[positions] >> np.uint64(2 * (KEY_BITS - level))
+    firsts = np.concatenate([[0], np.flatnonzero(np.diff(cells)) + 1])
+    counts = np.diff(np.append(firsts, cells.size))
+    # Rows are in date order, so the smallest row of each cell is its earliest client
+    earliest = np.minimum.reduceat(index.order[positions], firsts)
+    center_x = (np.floor(index.x[positions[firsts]] * 2 ** level) + 0.5) / 2 ** level
+    center_y = (np.floor(index.y[positions[firsts]] * 2 ** level) + 0.5) / 2 ** level
+    inside = (np.floor(center_x * 2 ** z) == x) & (np.floor(center_y * 2 ** z) == y)
+    px, py = vector_tiles.to_tile_coords(z, x, y, center_x[inside], center_y[inside])
+    days = np.asarray(snapshot['date'][earliest[inside]]).astype('datetime64[D]').astype(np.int64)
+    for i, count in enumerate(counts[inside]):
+        layer.add_point(px[i], py[i], {'day': int(days[i]), 'count': int(count)})
+    return layer
+
+
+def zip_layer(z, x, y):
+    return vector_tiles.polygon_layer('zips', zip_geojson_for_zoom(z), z, x, y, properties=('ZCTA5CE10',))
+
+
+def render_tile(layer, z, x, y):
+    if layer == 'clients':
+        return vector_tiles.encode_tile([client_layer(current_version(), z, x, y)])
+    return vector_tiles.encode_tile([zip_layer(z, x, y)])
+
+
+def tile_path(layer, z, x, y):
+    return os.path.join(TILE_CACHE_DIR, layer, data_version(layer, z), str(z), str(x), f'{y}.pbf')
+
+
+def get_tile(layer, z, x, y):
+    """Tile bytes from the disk cache, cutting and storing them on a miss."""
+    path = tile_path(layer, z, x, y)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    data = render_tile(layer, z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return data
+
+
+@lru_cache(maxsize=4096)
+def client_tile_until(version, z, x, y, stop):
+    """Client tile bytes for the first `stop` snapshot rows, cached in memory only."""
+    return vector_tiles.encode_tile([client_layer(version, z, x, y, stop)])
+
+
+@tiles.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.pbf')
+def serve_tile(layer, z, x, y):
+    if layer not in LAYERS or not MIN_ZOOM <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        abort(404)
+    until = request.args.get('until') if layer == 'clients' else None
+    stop = None
+    if until:
+        try:
+            until = np.datetime64(until, 'D')
+        except ValueError:
+            abort(400)
+        # Every day from the newest client on shows all of them: share the unfiltered (seeded) tiles
+        snapshot = load_snapshot()
+        if len(snapshot) and until < snapshot.max_date:
+            stop = snapshot.rows_as_of(until)
+    if stop is None:
+        data = get_tile(layer, z, x, y)
+    else:
+        data = client_tile_until(current_version(), z, x, y, stop)
+    response = Response(data, mimetype=MVT_MIMETYPE)
+    origin = request.headers.get('Origin')
+    if origin in ALLOWED_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+    response.headers['Vary'] = 'Origin'
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+def seed_cache(min_zoom=MIN_ZOOM, max_zoom=SEED_MAX_ZOOM, layers=LAYERS):
+    """Cut every tile over Erie County so the server can run offline."""
+    count = 0
+    for z in range(min_zoom, max_zoom + 1):
+        for x, y in vector_tiles.tiles_for_bounds(z):
+            for layer in layers:
+                get_tile(layer, z, x, y)
+                count += 1
+        print(f"Zoom {z}: {count:,} tiles cached")
+    return count
+
+
+def create_app():
+    app = Flask(__name__)
+    app.register_blueprint(tiles)
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seed', action='store_true', help='pre-cut tiles into the disk cache and exit')
+    parser.add_argument('--max-zoom', type=int, default=SEED_MAX_ZOOM, help='highest zoom to seed')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--allow-origin', action='append', default=[], metavar='ORIGIN',
+                        help='let pages on ORIGIN (e.g. http://localhost:8501) fetch tiles; repeatable')
+    args = parser.parse_args()
+    ALLOWED_ORIGINS.update(args.allow_origin)
+
+    if args.seed:
+        seed_cache(max_zoom=args.max_zoom)
+    else:
+        create_app().run(port=args.port)
@@ -0,0 +1,46 @@
+"""Ingest the combined survey CSV into the typed Parquet file the map reads.
+
+Checks that the required columns are there, drops rows without a year,
+zero-pads the ZIP codes, normalizes and orders the income brackets and
+stores every answer column as a category (see `survey_cube.normalize_survey`).
+The map runs this itself when the CSV is newer than the Parquet file.  The
+Parquet file is always `survey_cube.SURVEY_PATH`, the one the map reads
+(next to `SURVEY_CSV` when that is set).
+
+    python ingest_survey.py
+    python ingest_survey.py --csv combined_survey_results.csv
+"""
+import argparse
+
+import pandas as pd
+
+from survey_cube import (
+    CSV_PATH,
+    FILTER_COLUMNS,
+    INCOME_ORDER,
+    RAW_ZIP_COLUMN,
+    SURVEY_PATH,
+    YEAR_COLUMN,
+    ZIP_COLUMN,
+    ingest_survey,
+)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--csv', default=CSV_PATH, help='combined survey results to ingest')
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.csv, dtype={RAW_ZIP_COLUMN: str})
+    typed = ingest_survey(args.csv, SURVEY_PATH, raw=raw)
+    print(f"Wrote {len(typed):,} of {len(raw):,} rows to {SURVEY_PATH} "
+          f"({raw.memory_usage(deep=True).sum() / 1e3:,.0f} kB as read -> "
+          f"{typed.memory_usage(deep=True).sum() / 1e3:,.0f} kB typed)")
+    if len(typed) < len(raw):
+        print(f"  {len(raw) - len(typed):,} rows without a year were dropped")
+    kept = pd.to_numeric(raw[YEAR_COLUMN], errors='coerce').notna()
+    unreadable = int(raw.loc[kept, RAW_ZIP_COLUMN].fillna('').str.strip().ne('').sum() - typed[ZIP_COLUMN].notna().sum())
+    if unreadable:
+        print(f"  {unreadable:,} ZIP codes could not be read and are treated as missing")
+    extra = [label for label in typed[FILTER_COLUMNS['income']].cat.categories if label not in INCOME_ORDER]
+    if extra:
+        print(f"  income answers outside the known brackets: {', '.join(extra)}")
@@ -0,0 +1,110 @@
+"""In-memory PNG export of the vaccine map (no browser).
+
+Draws the same view as the interactive map (Erie County at zoom 10, the
+simplified ZCTA polygons) with the choropleth fill and legend or the heat
+layer, using the NumPy rasterizer in `shared_data/raster.py`.  The ZCTA
+pixel index is built once per process, so an export is a color lookup, a
+few heat stamps and a PNG encode.
+"""
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from zip_map_component import YLORRD, color_bins
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data import raster
+from shared_data.zip_topology import zip_geojson_for_zoom
+
+EXPORT_WIDTH, EXPORT_HEIGHT = 1000, 650
+CENTER = (42.9, -78.8)
+ZOOM = 10
+HEAT_SIGMA = 10.0
+
+BACKGROUND = (242, 239, 233)
+LAND = (255, 255, 255)
+OUTLINE = (51, 51, 51)
+FILL_OPACITY = 0.7
+
+
+def _rgb(hex_color):
+    return tuple(int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+@lru_cache(maxsize=4)
+def _base(width=EXPORT_WIDTH, height=EXPORT_HEIGHT):
+    """(viewport, ZCTA codes, per-pixel ZCTA index (-1 outside), outline image)."""
+    viewport = raster.Viewport.centered(*CENTER, ZOOM, width, height)
+    geojson = zip_geojson_for_zoom(ZOOM)
+    zip_codes = [feature['properties']['ZCTA5CE10'] for feature in geojson['features']]
+    index = np.full((height, width), -1, dtype=np.int16)
+    outline = np.zeros((height, width, 3), dtype=np.uint8)
+    features = raster.geojson_rings(geojson, viewport)
+    for i, rings in enumerate(features):
+        index[raster.polygon_mask(rings, width, height)] = i
+        for ring in rings:
+            raster.draw_polyline(outline, ring, (255, 255, 255))
+    index.flags.writeable = False
+    outline_mask = outline[:, :, 0] > 0
+    outline_mask.flags.writeable = False
+    return viewport, zip_codes, index, outline_mask
+
+
+def warm_up():
+    """Build the ZCTA pixel index ahead of the first export."""
+    _base()
+
+
+def _background(index):
+    canvas = raster.blank(index.shape[1], index.shape[0], BACKGROUND)
+    canvas[index >= 0] = LAND
+    return canvas
+
+
+def _draw_legend(canvas, bins, colors):
+    """Color ramp with its min and max counts in the top-right corner."""
+    swatch, scale = 28, 2
+    width = swatch * len(colors)
+    left, top = canvas.shape[1] - width - 20, 15
+    canvas[top - 5:top + 35, left - 8:left + width + 8] = 255
+    for i, color in enumerate(colors):
+        canvas[top:top + 12, left + i * swatch:left + (i + 1) * swatch] = _rgb(color)
+    raster.draw_text(canvas, str(int(round(bins[0]))), left, top + 18, scale)
+    last = str(int(round(bins[-1])))
+    raster.draw_text(canvas, last, left + width - len(last) * 4 * scale, top + 18, scale)
+
+
+def render_choropleth(zip_counts):
+    """PNG bytes of the choropleth for a `{zip: count}` mapping or Series."""
+    viewport, zip_codes, index, outline = _base()
+    counts = np.array([zip_counts.get(zip_code, 0) for zip_code in zip_codes], dtype=np.float64)
+    bins = color_bins(counts.max() if len(counts) else 0)
+    colors = np.array([_rgb(color) for color in YLORRD], dtype=np.float64)
+    # Same binning as the interactive legend: the highest edge a count reaches
+    classes = np.clip(np.searchsorted(bins, counts, side='right') - 1, 0, len(YLORRD) - 1)
+
+    canvas = _background(index)
+    inside = index >= 0
+    fill = colors[classes][index[inside]]
+    canvas[inside] = (canvas[inside] * (1 - FILL_OPACITY) + fill * FILL_OPACITY).astype(np.uint8)
+    canvas[outline] = OUTLINE
+    _draw_legend(canvas, bins, YLORRD)
+    return raster.encode_png(canvas)
+
+
+def render_heat(points):
+    """PNG bytes of the heat layer for `[lat, lon, weight]` points."""
+    viewport, _, index, outline = _base()
+    canvas = _background(index)
+    canvas[outline] = OUTLINE
+    if points:
+        lat, lon, weight = np.asarray(points, dtype=np.float64).T
+        x, y = viewport.project(lon, lat)
+        density = np.zeros(index.shape, dtype=np.float32)
+        raster.add_stamps(density, x, y, raster.gaussian_kernel(HEAT_SIGMA), weight)
+        raster.blend_heat(canvas, np.sqrt(density / max(float(density.max()), 1e-6)), raster.gradient_lut())
+    return raster.encode_png(canvas)
@@ -0,0 +1,53 @@
+"""Warm-up tasks for the vaccine map; see `shared_data/preload.py`."""
+import importlib
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data import preload
+from shared_data.geodata import zip_layer
+from shared_data.zip_topology import zip_geojson_string_for_zoom
+from survey_cube import CSV_PATH, SURVEY_PATH, load_survey
+
+# Zoom the maps open at; picks the simplified ZIP geometry of the folium map
+# (the component switches levels as the browser zooms)
+MAP_ZOOM = 10
+
+
+def _survey():
+    if os.path.exists(CSV_PATH) or os.path.exists(SURVEY_PATH):
+        load_survey(CSV_PATH, SURVEY_PATH)
+
+
+def _survey_table():
+    from survey_table import load_survey_table
+    if os.path.exists(CSV_PATH) or os.path.exists(SURVEY_PATH):
+        load_survey_table(CSV_PATH, SURVEY_PATH)
+
+
+def _component_geometry():
+    from zip_map_component import geometry_files
+    geometry_files()
+
+
+def _export_index():
+    import map_export
+    map_export.warm_up()
+
+
+TASKS = [
+    ('survey', _survey),
+    ('survey_table', _survey_table),
+    ('zip_layer', zip_layer),
+    ('zip_geojson', lambda: zip_geojson_string_for_zoom(MAP_ZOOM)),
+    ('component_geometry', _component_geometry),
+    # Only needed for the folium map and the PNG export, so they go last
+    ('folium', lambda: importlib.import_module('streamlit_folium')),
+    ('export_index', _export_index),
+]
+
+
+def start():
+    return preload.start('vaccine', TASKS)
@@ -0,0 +1,195 @@
+"""Pre-aggregated attendee counts for the vaccine survey filters.
+
+The survey is reduced once to an integer count cube indexed by
+(year, event) x employment x assistance x income x microchip x ZIP, where
+every answer dimension has an extra slot for unanswered questions and the
+ZIP dimension has one for attendees without a ZIP code.  Any combination
+of sidebar filters, including "All", is then a sum over a few slices of
+the cube, independent of how many survey rows there are.
+
+The survey CSV is first ingested (`python ingest_survey.py`, or
+automatically when the CSV is newer) into a typed Parquet file: integer
+years, zero-padded ZIP codes, the income answers normalized and ordered,
+and every answer column categorical, so loading it does no string work.
+"""
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = os.environ.get('SURVEY_CSV', os.path.join(os.path.dirname(__file__), 'combined_survey_results.csv'))
+SURVEY_PATH = os.path.splitext(CSV_PATH)[0] + '.parquet'
+
+ALL = "All"
+YEAR_COLUMN = 'Year'
+EVENT_COLUMN = 'Sheet Name'
+RAW_ZIP_COLUMN = 'What is your zip code?'
+ZIP_COLUMN = 'zip_code'
+FILTER_COLUMNS = {
+    'employment': "What is your employment status?",
+    'gov': "Do you receive government assistance?",
+    'income': "What is your annual household Income?",
+    'microchip': "Are your pets microchipped?",
+}
+REQUIRED_COLUMNS = [YEAR_COLUMN, EVENT_COLUMN, RAW_ZIP_COLUMN] + list(FILTER_COLUMNS.values())
+INCOME_ORDER = [
+    "$0-$30,000",
+    "$31,000-$60,000",
+    "$61,000-$90,000",
+    "$91,000-$120,000",
+    "$120,000+",
+]
+
+
+def _income_label(answer):
+    # "120,000 +" -> "$120,000+", "61,000-$90,000" -> "$61,000-$90,000"
+    label = str(answer).replace(' ', '')
+    return label if label.startswith('$') else f"${label}"
+
+
+def _category(values, label=str.strip):
+    """Categorical answers; cleaned once per distinct answer, blanks become missing."""
+    cleaned = {answer: label(str(answer)) or None for answer in values.dropna().unique()}
+    return values.map(cleaned).astype('category')
+
+
+def _zip_codes(values):
+    """Zero-padded 5-digit ZIP codes; anything else becomes missing."""
+    # Excel exports turn some ZIPs into floats ("14215.0") and drop leading zeros
+    text = values.astype('string').str.strip().str.replace(r'\.0*$', '', regex=True)
+    digits = text.str.extract(r'^(\d{3,5})(?:-\d{4})?$', expand=False)
+    return digits.str.zfill(5).astype(object).astype('category')
+
+
+def normalize_survey(df):
+    """Typed copy of the raw survey; rows without a year are dropped."""
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Survey is missing columns: {', '.join(missing)}")
+    years = pd.to_numeric(df[YEAR_COLUMN], errors='coerce')
+    df = df[years.notna()].reset_index(drop=True)
+
+    typed = {}
+    for column in df.columns:
+        if column == YEAR_COLUMN:
+            typed[column] = years.dropna().astype(np.int16).to_numpy()
+        elif column == RAW_ZIP_COLUMN:
+            typed[ZIP_COLUMN] = _zip_codes(df[column])
+        elif column == FILTER_COLUMNS['income']:
+            income = _category(df[column], _income_label)
+            extra = sorted(set(income.cat.categories) - set(INCOME_ORDER))
+            typed[column] = income.cat.set_categories(INCOME_ORDER + extra, ordered=True)
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            typed[column] = df[column]
+        else:
+            typed[column] = _category(df[column])
+    return pd.DataFrame(typed)
+
+
+def ingest_survey(csv_path=CSV_PATH, survey_path=SURVEY_PATH, raw=None):
+    """Normalize the survey CSV into the typed Parquet file; returns the typed frame.
+
+    `raw` is the CSV as already read by the caller, if it has it.
+    """
+    if raw is None:
+        raw = pd.read_csv(csv_path, dtype={RAW_ZIP_COLUMN: str})
+    typed = normalize_survey(raw)
+    # Written next to the target and renamed, so readers never see half a file
+    tmp_path = f"{survey_path}.tmp"
+    typed.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, survey_path)
+    return typed
+
+
+_ingest_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def read_survey(survey_path, modified):
+    """The ingested survey at `survey_path`, read once per `modified` time (shared; do not modify)."""
+    return pd.read_parquet(survey_path)
+
+
+def load_survey(csv_path=CSV_PATH, survey_path=SURVEY_PATH):
+    """The typed survey, re-ingested first if the CSV is newer (shared; do not modify)."""
+    # The startup preload and the first session may both get here
+    with _ingest_lock:
+        if os.path.exists(csv_path) and (not os.path.exists(survey_path)
+                                         or os.path.getmtime(csv_path) > os.path.getmtime(survey_path)):
+            ingest_survey(csv_path, survey_path)
+    return read_survey(survey_path, os.path.getmtime(survey_path))
+
+
+def _codes(values):
+    """Category codes with missing values in an extra last slot."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Keeps the stored category order (income brackets low to high)
+        values = values.cat.remove_unused_categories()
+        codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, categories = pd.factorize(values)
+    codes = np.where(codes < 0, len(categories), codes)
+    return codes, list(categories)
+
+
+class SurveyCube:
+    def __init__(self, df):
+        df = df[df[YEAR_COLUMN].notna()]
+
+        # (year, event) pairs share one axis; events are only offered per year
+        groups = df.groupby([YEAR_COLUMN, EVENT_COLUMN], dropna=False, sort=True, observed=True)
+        year_event_codes = groups.ngroup().to_numpy()
+        keys = groups.size().index
+        self.year_event_years = np.array([year for year, _ in keys])
+        self.year_event_events = np.array([event if pd.notna(event) else None for _, event in keys], dtype=object)
+
+        codes = [year_event_codes]
+        shape = [len(keys)]
+        self.categories = {}
+        for name, column in FILTER_COLUMNS.items():
+            column_codes, self.categories[name] = _codes(df[column])
+            codes.append(column_codes)
+            shape.append(len(self.categories[name]) + 1)
+        zip_codes, self.zip_codes = _codes(df[ZIP_COLUMN])
+        codes.append(zip_codes)
+        shape.append(len(self.zip_codes) + 1)
+
+        flat = np.ravel_multi_index(codes, shape) if len(df) else np.array([], dtype=np.int64)
+        self.counts = np.bincount(flat, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+        self.counts.flags.writeable = False
+
+    @property
+    def years(self):
+        return sorted(set(self.year_event_years.tolist()))
+
+    def events(self, year):
+        """Named events held in `year`."""
+        return sorted(event for event in self.year_event_events[self.year_event_years == year] if event is not None)
+
+    def options(self, name):
+        """Answers given for filter `name` (unanswered excluded)."""
+        return list(self.categories[name])
+
+    def select(self, year, event=ALL, **filters):
+        """Attendees per ZIP for a filter combination.
+
+        `filters` are keyword arguments named after `FILTER_COLUMNS`; "All"
+        (or leaving one out) keeps every answer, including unanswered.
+        Returns `(zip_counts, missing_zip)`: a Series of non-zero counts by
+        ZIP code and the number of matching attendees without a ZIP.
+        """
+        matches = self.year_event_years == year
+        if event != ALL:
+            matches &= self.year_event_events == event
+        cube = self.counts[matches]
+        for axis, name in enumerate(FILTER_COLUMNS, start=1):
+            value = filters.get(name, ALL)
+            if value != ALL:
+                categories = self.categories[name]
+                index = [categories.index(value)] if value in categories else []
+                cube = cube.take(index, axis=axis)
+        per_zip = cube.reshape(-1, cube.shape[-1]).sum(axis=0)
+        zip_counts = pd.Series(per_zip[:-1], index=self.zip_codes)
+        return zip_counts[zip_counts > 0], int(per_zip[-1])
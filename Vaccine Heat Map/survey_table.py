@@ -0,0 +1,65 @@
+"""Pre-sorted, searchable survey rows behind the "Show Raw Data" view.
+
+Built once per ingested survey (by the startup preload or the first
+session to open the table); the sidebar filters become a row mask and only
+the page on screen is copied out of the shared frame.
+"""
+import os
+import sys
+from functools import lru_cache
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.paged_table import TableIndex
+from survey_cube import (
+    ALL,
+    CSV_PATH,
+    EVENT_COLUMN,
+    FILTER_COLUMNS,
+    SURVEY_PATH,
+    YEAR_COLUMN,
+    ZIP_COLUMN,
+    load_survey,
+    read_survey,
+)
+
+# Short names for the columns the table opens with; the rest keep their question text
+LABELS = {
+    EVENT_COLUMN: "Event",
+    ZIP_COLUMN: "ZIP Code",
+    FILTER_COLUMNS['employment']: "Employment Status",
+    FILTER_COLUMNS['gov']: "Government Assistance",
+    FILTER_COLUMNS['income']: "Annual Household Income",
+    FILTER_COLUMNS['microchip']: "Microchipped",
+}
+TABLE_COLUMNS = [YEAR_COLUMN] + list(LABELS)
+SEARCH_COLUMNS = [EVENT_COLUMN, ZIP_COLUMN] + list(FILTER_COLUMNS.values())
+
+
+def survey_table(df):
+    return TableIndex({column: df[column] for column in TABLE_COLUMNS},
+                      fetch=lambda rows, columns: df.iloc[rows][columns],
+                      columns=list(df.columns), searchable=SEARCH_COLUMNS, labels=LABELS)
+
+
+@lru_cache(maxsize=1)
+def _survey_table(survey_path, modified):
+    return survey_table(read_survey(survey_path, modified))
+
+
+def load_survey_table(csv_path=CSV_PATH, survey_path=SURVEY_PATH):
+    """`(survey, table)`: the typed survey from `load_survey` and its table (shared; do not modify)."""
+    survey = load_survey(csv_path, survey_path)
+    return survey, _survey_table(survey_path, os.path.getmtime(survey_path))
+
+
+def filter_mask(df, year, event=ALL, **filters):
+    """Row mask of the survey rows matching the sidebar filters (see `SurveyCube.select`)."""
+    mask = df[YEAR_COLUMN].to_numpy() == year
+    if event != ALL:
+        mask &= (df[EVENT_COLUMN] == event).to_numpy()
+    for name, value in filters.items():
+        if value != ALL:
+            mask &= (df[FILTER_COLUMNS[name]] == value).to_numpy()
+    return mask
@@ -1,14 +1,23 @@
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import folium_static
-from folium.plugins import HeatMap
-import geopandas as gpd
-import numpy as np
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-import time
+import json
 import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.geodata import SOURCE_PATH as GEOJSON_PATH, zip_layer
+from shared_data.zip_topology import zip_geojson_string_for_zoom
+from shared_data import perf
+from shared_data.paged_table import paged_table
+from survey_cube import CSV_PATH, SURVEY_PATH, SurveyCube, load_survey
+from survey_table import TABLE_COLUMNS, filter_mask, load_survey_table
+from zip_map_component import zip_map
+import startup
+from startup import MAP_ZOOM
+
+# Optional vector tile server ("Pantry Map/tile_server.py") for the ZIP outlines
+TILE_SERVER_URL = os.environ.get('ZIP_TILE_SERVER_URL')
 
 # Set page config must be the first Streamlit command
 st.set_page_config(
@@ -16,6 +25,9 @@ st.set_page_config(
     page_icon="🐾",
     layout="wide"
 )
+perf.start_rerun('vaccine')
+# Warms the survey, ZIP geometry and export index in the background (once per process)
+startup.start()
 
 # Custom CSS for bubble-style filters
 st.markdown("""
@@ -86,13 +98,13 @@ st.markdown("""
 st.title("SPCA Vaccine Clinic Heat Map")
 st.markdown("This map shows the distribution of vaccine clinic attendees across all zip codes in the survey. Use the filters to explore the data.")
 
-# Read the data
-@st.cache_data
+# Read the data; one frame shared read-only by every session instead of a copy per call
+@perf.cached(st.cache_resource)
 def load_data():
     try:
         # Try to load the correct file
-        csv_path = os.path.join(os.path.dirname(__file__), 'combined_survey_results.csv')
-        if not os.path.exists(csv_path):
+        csv_path = CSV_PATH
+        if not os.path.exists(csv_path) and not os.path.exists(SURVEY_PATH):
             st.error(f"""
                 Could not find the survey data file at: {csv_path}
                 
@@ -103,120 +115,161 @@ def load_data():
                 """)
             st.stop()
             
-        df = pd.read_csv(csv_path)
-        
-        # Clean up zip codes
-        df['zip_code'] = df['What is your zip code?'].astype(str).str[:5]
-        df['zip_code'] = df['zip_code'].replace('nan', np.nan)
-        return df
+        # Typed columns from the ingested Parquet file, re-ingested if the CSV is newer
+        return load_survey(csv_path, SURVEY_PATH)
         
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         st.stop()
 
 def load_geojson():
-    try:
-        # Use the same relative path structure as the pantry map
-        geojson_path = os.path.join('..', 'shared_data', 'erie_survey_zips.geojson')
-        
-        if not os.path.exists(geojson_path):
-            st.error(f"""
-                Could not find the GeoJSON file at: {geojson_path}
-                
-                Make sure you're running the script from the 'Vaccine Heat Map' directory.
-                The file should be at: SPCA-Maps/shared_data/erie_survey_zips.geojson
-                """)
-            st.stop()
+    # The ZCTA layer is parsed once per process and shared read-only by every session
+    if not os.path.exists(GEOJSON_PATH):
+        st.error(f"""
+            Could not find the GeoJSON file at: {GEOJSON_PATH}
             
-        return gpd.read_file(geojson_path)
-        
-    except Exception as e:
-        st.error(f"Error loading GeoJSON: {str(e)}")
-        st.write("Current working directory:", os.getcwd())  # Debug info
+            The file should be at: SPCA-Maps/shared_data/erie_survey_zips.geojson
+            """)
         st.stop()
+    return zip_layer()
+
+@perf.cached(st.cache_resource)
+def load_table():
+    # The survey with its sort orders and search index, built once per process
+    load_data()
+    return load_survey_table(CSV_PATH, SURVEY_PATH)
+
+@perf.cached(st.cache_resource(max_entries=64))
+def raw_data_mask(year, event, filter_items):
+    # Row mask of one filter state, built once per process and shared read-only
+    survey, _ = load_table()
+    mask = filter_mask(survey, year, event, **dict(filter_items))
+    mask.flags.writeable = False
+    return mask
+
+@perf.cached(st.cache_resource)
+def load_cube():
+    # Attendee counts per filter combination and ZIP, built once per process
+    return SurveyCube(load_data())
 
-df = load_data()
+perf.stage('load_data')
+cube = load_cube()
 geo = load_geojson()
 
 # Create a sidebar for filters
+perf.stage('controls')
 st.sidebar.header("Filters")
 
 # Year (single select)
-years = sorted(df['Year'].dropna().unique())
+years = cube.years
 year = st.sidebar.selectbox("Select Year", years, index=len(years)-1)
 
 # Event filter (dropdown)
-year_events = sorted(df[df['Year'] == year]['Sheet Name'].dropna().unique())
+year_events = cube.events(year)
 event = st.sidebar.selectbox("Select Event", ["All"] + year_events)
 
 # Helper function to create radio filter with 'All' option
 def create_radio_filter(label, options):
-    all_options = ["All"] + sorted(options)
+    # Options come in their stored order: sorted answers, income brackets low to high
+    all_options = ["All"] + list(options)
     selected = st.sidebar.radio(label, all_options, horizontal=True)
     return selected
 
 # Employment Status
-employment_options = df["What is your employment status?"].dropna().unique()
+employment_options = cube.options('employment')
 employment = create_radio_filter("Employment Status", employment_options)
 
 # Government Assistance
-gov_options = df["Do you receive government assistance?"].dropna().unique()
+gov_options = cube.options('gov')
 gov = create_radio_filter("Government Assistance", gov_options)
 
 # Annual Household Income
-income_order = [
-    "$0-$30,000",
-    "$31,000-$60,000",
-    "$61,000-$90,000",
-    "$91,000-$120,000",
-    "$120,000+"
-]
-# Clean up income values in the dataframe
-df["What is your annual household Income?"] = df["What is your annual household Income?"].str.replace("120,000 +", "$120,000+")
-df["What is your annual household Income?"] = df["What is your annual household Income?"].apply(
-    lambda x: f"${x}" if pd.notnull(x) and not str(x).startswith("$") else x
-)
-income_options = [i for i in income_order if i in df["What is your annual household Income?"].unique()]
-if not income_options:
-    income_options = sorted(df["What is your annual household Income?"].dropna().unique())
+income_options = cube.options('income')
 selected_income = create_radio_filter("Annual Household Income", income_options)
 
 # Microchipped
-microchip_options = df["Are your pets microchipped?"].dropna().unique()
+microchip_options = cube.options('microchip')
 microchip = create_radio_filter("Microchipped", microchip_options)
 
-# Get year data first
-year_data = df[df['Year'] == year]
+# Counts for the whole year and for the filtered selection, summed from the cube
+perf.stage('select')
+year_zip_counts, total_missing = cube.select(year)
+year_total = int(year_zip_counts.sum()) + total_missing
 
-# Calculate missing ZIP codes for the year
-total_with_zip = len(year_data[year_data['zip_code'].notna()])
-total_missing = len(year_data) - total_with_zip
+filters = dict(employment=employment, gov=gov, income=selected_income, microchip=microchip)
+filtered_zip_counts, filtered_missing = cube.select(year, event, **filters)
+filtered_total = int(filtered_zip_counts.sum()) + filtered_missing
 
-# Filter the data
-filtered = year_data.copy()  # Start with all data for the year
+# Map type toggle
+map_type = st.sidebar.radio("Map Type", ["Choropleth (by ZIP)", "Heat Map (points)"])
+update_in_place = st.sidebar.checkbox(
+    "Update map in place", value=True,
+    help="Load the base map and ZIP outlines once and only send new counts when filters change"
+)
 
-# Apply event filter if not "All"
-if event != "All":
-    filtered = filtered[filtered["Sheet Name"] == event]
+# One point per ZIP at its census interior point, weighted by attendees
+perf.stage('heat_data')
+positions = [geo.positions.get(zip_code) for zip_code in filtered_zip_counts.index]
+heat_data = [
+    [geo.interior_lat[i], geo.interior_lon[i], int(count)]
+    for i, count in zip(positions, filtered_zip_counts) if i is not None
+]
 
-# Only apply other filters if they're not set to "All"
-if employment != "All":
-    filtered = filtered[filtered["What is your employment status?"] == employment]
-if gov != "All":
-    filtered = filtered[filtered["Do you receive government assistance?"] == gov]
-if selected_income != "All":
-    filtered = filtered[filtered["What is your annual household Income?"] == selected_income]
-if microchip != "All":
-    filtered = filtered[filtered["Are your pets microchipped?"] == microchip]
+@perf.cached(st.cache_data(max_entries=64))
+def export_png(map_type, year, event, filter_items):
+    # Rendered in memory and cached per filter state, so concurrent exports never collide
+    from map_export import render_choropleth, render_heat
+    zip_counts, _ = load_cube().select(year, event, **dict(filter_items))
+    if map_type == "Choropleth (by ZIP)":
+        return render_choropleth(zip_counts)
+    return render_heat([
+        [geo.interior_lat[geo.positions[zip_code]], geo.interior_lon[geo.positions[zip_code]], int(count)]
+        for zip_code, count in zip_counts.items() if zip_code in geo.positions
+    ])
 
-# Calculate filtered missing ZIP codes
-filtered_with_zip = len(filtered[filtered['zip_code'].notna()])
-filtered_missing = len(filtered) - filtered_with_zip
+def build_folium_map():
+    # folium is only imported when the map is rebuilt instead of updated in place
+    import folium
+    from folium.plugins import HeatMap, VectorGridProtobuf
 
-# Map type toggle
-map_type = st.sidebar.radio("Map Type", ["Choropleth (by ZIP)", "Heat Map (points)"])
+    # Create a map centered on Erie County
+    m = folium.Map(location=[42.9, -78.8], zoom_start=MAP_ZOOM, tiles='CartoDB positron')
+    # Simplified ZIP polygons (serialized once per process) instead of the full-precision layer
+    zip_geojson = zip_geojson_string_for_zoom(MAP_ZOOM)
+
+    if map_type == "Choropleth (by ZIP)":
+        # Count per zip, joined onto the shared layer without copying its geometry
+        counts = geo.counts_frame(filtered_zip_counts)
+        # The choropleth draws the ZIP boundaries itself, so the geometry is only embedded once
+        folium.Choropleth(
+            geo_data=zip_geojson,
+            name='choropleth',
+            data=counts,
+            columns=['ZCTA5CE10', 'count'],
+            key_on='feature.properties.ZCTA5CE10',
+            fill_color='YlOrRd',
+            fill_opacity=0.7,
+            line_color='#333',
+            line_weight=1,
+            line_opacity=1,
+            legend_name='Clients Served (Filtered)'
+        ).add_to(m)
+    else:
+        if heat_data:
+            HeatMap(heat_data, radius=18, blur=15, min_opacity=0.3).add_to(m)
+        # Add boundaries, streamed as vector tiles when a tile server is configured
+        if TILE_SERVER_URL:
+            VectorGridProtobuf(
+                f"{TILE_SERVER_URL}/tiles/zips/{{z}}/{{x}}/{{y}}.pbf",
+                "ZIP Boundaries",
+                {"vectorTileLayerStyles": {"zips": {"fill": False, "color": "#333", "weight": 1}}}
+            ).add_to(m)
+        else:
+            folium.GeoJson(zip_geojson, name="ZIP Boundaries", style_function=lambda x: {"fillOpacity": 0, "color": "#333", "weight": 1}).add_to(m)
+    return m
 
 # Create two columns for stats and map
+perf.stage('map')
 col1, col2 = st.columns([1, 4])
 
 # Stats in the left column
@@ -224,87 +277,49 @@ with col1:
     st.markdown(f"""
         <div class="stats-panel">
             <h3>Statistics</h3>
-            <p>Total Clients: {len(year_data):,}</p>
-            <p>Filtered Results: {len(filtered):,}</p>
+            <p>Total Clients: {year_total:,}</p>
+            <p>Filtered Results: {filtered_total:,}</p>
             <p class="note">* {total_missing:,} total clients ({filtered_missing:,} filtered) did not provide ZIP codes</p>
         </div>
     """, unsafe_allow_html=True)
 
 # Map in the right column
 with col2:
-    # Create a map centered on Erie County
-    m = folium.Map(location=[42.9, -78.8], zoom_start=10, tiles='CartoDB positron')
-
-    if map_type == "Choropleth (by ZIP)":
-        # Count per zip
-        zip_counts = filtered['zip_code'].value_counts().to_dict()
-        geo['count'] = geo['ZCTA5CE10'].map(zip_counts).fillna(0)
-        folium.Choropleth(
-            geo_data=geo,
-            name='choropleth',
-            data=geo,
-            columns=['ZCTA5CE10', 'count'],
-            key_on='feature.properties.ZCTA5CE10',
-            fill_color='YlOrRd',
-            fill_opacity=0.7,
-            line_opacity=0.2,
-            legend_name='Clients Served (Filtered)'
-        ).add_to(m)
-        # Add boundaries
-        folium.GeoJson(geo, name="ZIP Boundaries", style_function=lambda x: {"fillOpacity": 0, "color": "#333", "weight": 1}).add_to(m)
+    if update_in_place:
+        # The component keeps its tiles and ZIP layer; reruns only send counts and the color scale
+        perf.record_bytes('component', lambda: len(filtered_zip_counts.to_json()) + len(json.dumps(heat_data)))
+        zip_map(
+            filtered_zip_counts,
+            mode='choropleth' if map_type == "Choropleth (by ZIP)" else 'heat',
+            heat=heat_data,
+            legend_name='Clients Served (Filtered)',
+            zoom=MAP_ZOOM,
+            key='zip_map'
+        )
     else:
-        # Heat map of points
-        heat_data = filtered[['zip_code']].dropna()
-        merged = pd.merge(heat_data, geo[['ZCTA5CE10', 'geometry']], left_on='zip_code', right_on='ZCTA5CE10', how='left')
-        merged = merged.dropna(subset=['geometry'])
-        if not merged.empty:
-            gdf = gpd.GeoDataFrame(merged, geometry='geometry')
-            gdf = gdf.set_crs(geo.crs)
-            gdf['centroid'] = gdf.geometry.centroid
-            points = [[pt.y, pt.x] for pt in gdf['centroid']]
-            if points:
-                HeatMap(points, radius=18, blur=15, min_opacity=0.3).add_to(m)
-        # Add boundaries
-        folium.GeoJson(geo, name="ZIP Boundaries", style_function=lambda x: {"fillOpacity": 0, "color": "#333", "weight": 1}).add_to(m)
-
-    folium_static(m, width=1000, height=650)
+        with perf.span('build_folium_map'):
+            m = build_folium_map()
+        perf.record_bytes('folium_html', lambda: len(m.get_root().render()))
+        from streamlit_folium import folium_static
+        folium_static(m, width=1000, height=650)
 
     # Add export button
     if st.button("Export Map as PNG"):
-        # Save the map as HTML
-        m.save('temp_map.html')
-        
-        # Set up Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        
-        # Initialize the driver
-        driver = webdriver.Chrome(options=chrome_options)
-        
-        # Load the HTML file
-        driver.get('file://' + os.path.abspath('temp_map.html'))
-        
-        # Wait for the map to load
-        time.sleep(2)
-        
-        # Take screenshot
-        driver.save_screenshot('vaccine_map.png')
-        driver.quit()
-        
-        # Clean up
-        os.remove('temp_map.html')
-        
-        # Provide download link
-        with open('vaccine_map.png', 'rb') as file:
-            st.download_button(
-                label="Download Map",
-                data=file,
-                file_name="vaccine_map.png",
-                mime="image/png"
-            )
+        perf.stage('export')
+        st.download_button(
+            label="Download Map",
+            data=export_png(map_type, year, event, tuple(filters.items())),
+            file_name="vaccine_map.png",
+            mime="image/png"
+        )
 
 # Display raw data
 if st.checkbox("Show Raw Data"):
-    st.dataframe(filtered.reset_index(drop=True)) 
\ No newline at end of file
+    perf.stage('raw_data')
+    # The filters become a row mask (cached per filter state); only the page on screen is copied out of the survey
+    _, table = load_table()
+    table_df = paged_table(table, 'survey', mask=raw_data_mask(year, event, tuple(filters.items())), columns=TABLE_COLUMNS)
+    perf.record_bytes('raw_data', lambda: table_df.memory_usage(deep=True).sum())
+
+perf.finish_rerun()
+ 
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""Leaflet ZIP map that keeps its base map between reruns.
+
+The component's page (tiles, Leaflet, ZIP geometry) is loaded once per
+session: every simplification level of the geometry is a static file next
+to `frontend/index.html`, and the page fetches (and the browser caches) the
+level matching the map's current zoom, switching as the user zooms.  Each rerun only sends the `{ZCTA: count}`
+mapping, the color scale and, in heat mode, one weighted point per ZIP,
+and the page restyles the existing layer in place.
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+import streamlit.components.v1 as components
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.zip_topology import LEVEL_ZOOMS, level_for_zoom, level_path, zip_geojson_string_for_zoom
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend')
+
+# folium.Choropleth's 'YlOrRd' with its default six bins
+YLORRD = ['#ffffb2', '#fed976', '#feb24c', '#fd8d3c', '#f03b20', '#bd0026']
+
+_component = components.declare_component('zip_map', path=FRONTEND_DIR)
+# The startup preload and the first session may write the same file
+_write_lock = threading.Lock()
+
+
+def geometry_file(zoom):
+    """Write the simplified ZIP layer for `zoom` into the frontend folder if stale."""
+    level = level_for_zoom(zoom)
+    name = f'zips.z{level}.geojson'
+    path = os.path.join(FRONTEND_DIR, name)
+    source = level_path(level)
+    with _write_lock:
+        if not os.path.exists(path) or (os.path.exists(source) and os.path.getmtime(path) < os.path.getmtime(source)):
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(zip_geojson_string_for_zoom(zoom))
+            os.replace(tmp_path, path)
+    return name
+
+
+def geometry_files():
+    """`[[level zoom, file name], ...]` for every simplification level, finest last."""
+    return [[level, geometry_file(level)] for level in LEVEL_ZOOMS]
+
+
+def color_bins(max_count, colors=YLORRD):
+    """Equal-width bin edges from 0 to `max_count`, like folium.Choropleth."""
+    return np.linspace(0, max(max_count, 1), len(colors) + 1).tolist()
+
+
+def zip_map(counts, mode='choropleth', heat=None, legend_name='', zoom=10, center=(42.9, -78.8),
+            height=650, key=None):
+    """Render or restyle the map.
+
+    `counts` maps ZCTA codes to counts (a dict or Series); `heat` is a list
+    of `[lat, lon, weight]` points drawn in 'heat' mode.
+    """
+    counts = {str(zip_code): int(count) for zip_code, count in counts.items() if count}
+    return _component(
+        geometries=geometry_files(),
+        counts=counts,
+        mode=mode,
+        heat=heat or [],
+        bins=color_bins(max(counts.values(), default=0)),
+        colors=YLORRD,
+        legend=legend_name,
+        zoom=zoom,
+        center=list(center),
+        height=height,
+        key=key,
+        default=None,
+    )
@@ -0,0 +1,70 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python benchmarks/compare.py benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+Steps are matched on (suite, step, rows).  A step regresses when it is
+slower than the baseline by more than `--threshold` (and by more than
+`--min-seconds`, so sub-millisecond noise is ignored), or when its payload
+grew by more than the threshold.  Exits with status 1 on any regression.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path):
+    with open(path, 'r') as f:
+        report = json.load(f)
+    return report, {(r['suite'], r['step'], r['rows']): r for r in report['results']}
+
+
+def _change(before, after):
+    return (after - before) / before if before else 0.0
+
+
+def compare(baseline, candidate, threshold=0.2, min_seconds=0.005):
+    """Rows of (key, before, after, time change, bytes change, regressed)."""
+    rows = []
+    for key in (key for key in baseline if key in candidate):  # in the baseline's run order
+        before, after = baseline[key], candidate[key]
+        time_change = _change(before['seconds'], after['seconds'])
+        slower = time_change > threshold and after['seconds'] - before['seconds'] > min_seconds
+        bytes_change = None
+        larger = False
+        if 'bytes' in before and 'bytes' in after:
+            bytes_change = _change(before['bytes'], after['bytes'])
+            larger = bytes_change > threshold
+        rows.append((key, before, after, time_change, bytes_change, slower or larger))
+    return rows
+
+
+def print_table(rows):
+    print(f"{'suite':8} {'step':26} {'rows':>10} {'before ms':>11} {'after ms':>11} {'time':>8} {'bytes':>8}")
+    for (suite, step, count), before, after, time_change, bytes_change, regressed in rows:
+        size = f"{bytes_change:+.0%}" if bytes_change is not None else ''
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{suite:8} {step:26} {count:>10,} {before['seconds'] * 1000:>11.1f} "
+              f"{after['seconds'] * 1000:>11.1f} {time_change:>+8.0%} {size:>8}{flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown or growth')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    baseline_report, baseline = _load(args.baseline)
+    candidate_report, candidate = _load(args.candidate)
+    print(f"baseline  {baseline_report['environment'].get('commit')}  {baseline_report['environment']['created']}")
+    print(f"candidate {candidate_report['environment'].get('commit')}  {candidate_report['environment']['created']}")
+    rows = compare(baseline, candidate, args.threshold, args.min_seconds)
+    print_table(rows)
+    missing = [key for key in baseline if key not in candidate]
+    if missing:
+        print(f"{len(missing)} baseline steps missing from the candidate: " +
+              ', '.join(f'{suite}/{step}/{count}' for suite, step, count in missing))
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s) at {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,131 @@
+"""Seeded synthetic data in the schemas the dashboards read.
+
+* `pantry_clients(n)` -> (records for `processed_pantry_data.json`, rows
+  for `PantryMap.csv`), sharing Person IDs like the real export.
+* `survey_rows(n)` -> a frame in the `combined_survey_results.csv` schema.
+
+Points are drawn inside the Erie ZCTAs of `shared_data/erie_survey_zips.geojson`,
+with ZIPs weighted so a few city ZIPs hold most clients, as in the real
+data.  The same seed always gives the same rows.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import shapely
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from shared_data.geodata import zip_layer
+
+FIRST_DAY = np.datetime64('2010-01-01')
+LAST_DAY = np.datetime64('2025-06-30')
+ADDRESS_TYPES = ['Home', 'Previous', 'Temporary', 'Other']
+ADDRESS_TYPE_WEIGHTS = [0.95, 0.02, 0.02, 0.01]
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS',
+              'KOWALSKI', 'NOWAK', 'MURPHY', 'OBRIEN', 'RUSSO', 'WRIGHT', 'LOPEZ', 'HILL']
+FIRST_NAMES = ['MARY', 'JOHN', 'LINDA', 'JAMES', 'SUSAN', 'ROBERT', 'KAREN', 'MICHAEL',
+               'LISA', 'DAVID', 'NANCY', 'JOSEPH', 'BETTY', 'THOMAS', 'DONNA', 'GARY']
+STREETS = ['Main Street', 'Elmwood Avenue', 'Delaware Avenue', 'Broadway', 'Niagara Street',
+           'Seneca Street', 'Abbott Road', 'Transit Road', 'Union Road', 'Genesee Street']
+
+EVENTS = ['Clinic A', 'Clinic B', 'Clinic C', 'Clinic D']
+SURVEY_YEARS = [2022, 2023, 2024]
+SURVEY_ANSWERS = {
+    "What is your employment status?": ['Employed', 'Unemployed', 'Retired', 'Disabled'],
+    "Do you receive government assistance?": ['Yes', 'No'],
+    # Raw spellings, before the app's income clean-up
+    "What is your annual household Income?": ['0-$30,000', '$31,000-$60,000', '61,000-$90,000',
+                                              '$91,000-$120,000', '120,000 +'],
+    "Are your pets microchipped?": ['Yes', 'No', 'Not sure'],
+}
+# Share of survey rows leaving a question (or the ZIP) blank
+BLANK_SHARE = 0.2
+
+
+def _zip_weights(rng, count):
+    # Heavy-tailed ZIP popularity: a handful of ZIPs get most of the clients
+    weights = rng.pareto(1.2, count) + 0.05
+    return weights / weights.sum()
+
+
+def points_in_zips(n, seed=0):
+    """`n` (lng, lat, zip) points inside the Erie ZCTAs."""
+    rng = np.random.default_rng(seed)
+    layer = zip_layer()
+    zips = rng.choice(len(layer), size=n, p=_zip_weights(rng, len(layer)))
+    lng = np.empty(n)
+    lat = np.empty(n)
+    bounds = shapely.bounds(layer.geometries)
+    # Rejection sampling per ZIP, vectorized over all of its points
+    for i in np.unique(zips):
+        todo = np.flatnonzero(zips == i)
+        west, south, east, north = bounds[i]
+        while todo.size:
+            x = rng.uniform(west, east, todo.size)
+            y = rng.uniform(south, north, todo.size)
+            inside = shapely.intersects_xy(layer.geometries[i], x, y)
+            lng[todo[inside]], lat[todo[inside]] = x[inside], y[inside]
+            todo = todo[~inside]
+    return lng, lat, layer.zip_codes[zips]
+
+
+def pantry_clients(n, seed=0):
+    """(processed JSON records frame, PetPoint export frame) for `n` clients."""
+    rng = np.random.default_rng(seed)
+    lng, lat, zips = points_in_zips(n, seed)
+    person_ids = 600000 + rng.permutation(n * 2)[:n]
+    # Growth over time: later years get more clients
+    offsets = (rng.power(2.0, n) * (LAST_DAY - FIRST_DAY).astype(np.int64)).astype(np.int64)
+    dates = FIRST_DAY + offsets.astype('timedelta64[D]')
+    last = rng.choice(LAST_NAMES, n)
+    first = rng.choice(FIRST_NAMES, n)
+    address_types = rng.choice(ADDRESS_TYPES, n, p=ADDRESS_TYPE_WEIGHTS)
+
+    records = pd.DataFrame({
+        'lat': lat.round(6),
+        'lng': lng.round(6),
+        'name': np.char.add(np.char.add(last, ', '), first),
+        'address_type': address_types,
+        'date': dates.astype(str),
+        'person_id': person_ids.astype(str),
+    })
+    export_dates = pd.DatetimeIndex(dates)
+    export = pd.DataFrame({
+        'Person ID': np.char.add('P', np.char.zfill(person_ids.astype(str), 10)),
+        'Name Last': last,
+        'Name First': first,
+        'Association Creation Date': (export_dates.month.astype(str) + '/' + export_dates.day.astype(str)
+                                      + '/' + (export_dates.year % 100).astype(str).str.zfill(2)),
+        'Address Type': address_types,
+        'Street Address': np.char.add(np.char.add(rng.integers(1, 9999, n).astype(str), ' '),
+                                      rng.choice(STREETS, n)),
+        'Unit Number': '',
+        'City': 'Buffalo',
+        'City Alias': 'Buffalo',
+        'Province': 'New York',
+        'Country': 'United States',
+        'Postal Code': zips,
+    })
+    return records, export
+
+
+def survey_rows(n, seed=0):
+    """`n` survey responses in the combined_survey_results.csv schema."""
+    rng = np.random.default_rng(seed)
+    _, _, zips = points_in_zips(n, seed)
+    # Excel exports turn some ZIPs into floats ("14215.0")
+    zip_values = np.where(rng.random(n) < 0.3, np.char.add(zips.astype(str), '.0'), zips).astype(object)
+    zip_values[rng.random(n) < BLANK_SHARE / 4] = np.nan
+    df = pd.DataFrame({
+        'Sheet Name': rng.choice(EVENTS, n),
+        'Year': rng.choice(SURVEY_YEARS, n),
+        'What is your zip code?': zip_values,
+    })
+    for column, answers in SURVEY_ANSWERS.items():
+        values = rng.choice(answers, n).astype(object)
+        values[rng.random(n) < BLANK_SHARE] = np.nan
+        df[column] = values
+    return df
@@ -0,0 +1,295 @@
+"""Concurrent-session load test of a dashboard on a local Streamlit server.
+
+    python benchmarks/load_test.py --app pantry --sessions 1 5 10 20
+    python benchmarks/load_test.py --app vaccine --synthetic-survey 20000 --preload
+
+Starts `streamlit run` (or `shared_data/serve.py` with `--preload`) on a
+free port with a generated password, then simulates browser sessions over
+the same websocket protocol the frontend uses.  Each session asks for the
+first run (logging in when the app asks for a password) and then plays
+`--actions` random widget changes from the app's scenario in `MOVES` (year,
+map type, filters, data table...) with a short think time, fetching the
+cached messages the server refers to like a browser does.
+
+A rerun's latency runs from sending the widget states to the server's
+"script finished".  For every number of concurrent sessions the report
+gives p50/p95 rerun latency, scripts that raised, and the server's resident
+memory while all of those sessions are connected; the last column is the
+memory added per session over the single-session run, which should shrink
+as sessions are added when the data is shared between them.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.httpclient import AsyncHTTPClient
+from tornado.websocket import websocket_connect
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+APPS = {
+    'pantry': os.path.join(PROJECT_ROOT, 'Pantry Map', 'pantry_map.py'),
+    'vaccine': os.path.join(PROJECT_ROOT, 'Vaccine Heat Map', 'vaccine_heat_map.py'),
+}
+# Widgets a simulated user changes, by label
+MOVES = {
+    'pantry': ['Select Year', 'Map Type', 'Marker detail', 'Hexagon size (km)', 'Show Trends', 'Show Data Table',
+               'Sort by', 'Descending'],
+    'vaccine': ['Select Year', 'Select Event', 'Employment Status', 'Government Assistance',
+                'Annual Household Income', 'Microchipped', 'Map Type', 'Update map in place', 'Show Raw Data',
+                'Sort by', 'Descending'],
+}
+WIDGET_TYPES = ('selectbox', 'radio', 'checkbox', 'slider', 'text_input')
+PASSWORD_LABEL = 'Password'
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Resident memory of a process in MB (Linux /proc, else psutil if installed)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 2 ** 20
+    except ImportError:
+        return float('nan')
+
+
+class Widget:
+    def __init__(self, kind, proto, value):
+        self.kind = kind
+        self.id = proto.id
+        self.options = list(getattr(proto, 'options', []))
+        self.proto = proto
+        self.value = value
+
+    @classmethod
+    def from_element(cls, kind, proto, previous):
+        if previous is not None and previous.id == proto.id:
+            return cls(kind, proto, previous.value)
+        return cls(kind, proto, list(proto.default) if kind == 'slider' else proto.default)
+
+    def fill(self, state):
+        state.id = self.id
+        if self.kind in ('selectbox', 'radio'):
+            state.int_value = self.value
+        elif self.kind == 'checkbox':
+            state.bool_value = self.value
+        elif self.kind == 'slider':
+            state.double_array_value.data.extend(self.value)
+        else:
+            state.string_value = self.value
+
+    def change(self, rng):
+        """Pick a different value, as a user would."""
+        if self.kind in ('selectbox', 'radio') and len(self.options) > 1:
+            choices = [i for i in range(len(self.options)) if i != self.value]
+            self.value = int(rng.choice(choices))
+        elif self.kind == 'checkbox':
+            self.value = not self.value
+        elif self.kind == 'slider':
+            self.value = [float(rng.integers(int(self.proto.min), int(self.proto.max) + 1))]
+
+
+class Session:
+    """One simulated browser tab."""
+
+    def __init__(self, base_url, password, rng):
+        self.base_url = base_url
+        self.password = password
+        self.rng = rng
+        self.widgets = {}
+        self.latencies = []
+        self.errors = 0
+        self.http = AsyncHTTPClient()
+
+    async def connect(self):
+        ws_url = self.base_url.replace('http', 'ws', 1) + '/_stcore/stream'
+        self.ws = await websocket_connect(ws_url, subprotocols=['streamlit'], max_message_size=512 * 2 ** 20)
+
+    async def _message(self, data):
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+        if msg.WhichOneof('type') == 'ref_hash':
+            # Large messages the server already cached are fetched over HTTP
+            response = await self.http.fetch(f'{self.base_url}/_stcore/message?hash={msg.ref_hash}')
+            msg = ForwardMsg()
+            msg.ParseFromString(response.body)
+        return msg
+
+    async def rerun(self):
+        back = BackMsg()
+        back.rerun_script.query_string = ''
+        for widget in self.widgets.values():
+            widget.fill(back.rerun_script.widget_states.widgets.add())
+        started = time.perf_counter()
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+
+        seen = {}
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                raise ConnectionError('server closed the session')
+            msg = await self._message(data)
+            kind = msg.WhichOneof('type')
+            if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type in WIDGET_TYPES:
+                    proto = getattr(element, element_type)
+                    seen[proto.label] = Widget.from_element(element_type, proto, self.widgets.get(proto.label))
+                elif element_type == 'exception':
+                    self.errors += 1
+            elif kind == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        self.latencies.append(time.perf_counter() - started)
+        self.widgets = seen
+
+    async def play(self, moves, actions, think):
+        await self.rerun()
+        if PASSWORD_LABEL in self.widgets:
+            self.widgets[PASSWORD_LABEL].value = self.password
+            await self.rerun()
+        for _ in range(actions):
+            await asyncio.sleep(self.rng.uniform(0, think))
+            labels = [label for label in moves if label in self.widgets]
+            if not labels:
+                break
+            self.widgets[labels[self.rng.integers(len(labels))]].change(self.rng)
+            await self.rerun()
+
+    def close(self):
+        self.ws.close()
+
+
+async def run_level(base_url, password, moves, sessions, actions, think, seed, pid):
+    rngs = [np.random.default_rng([seed, sessions, i]) for i in range(sessions)]
+    tabs = [Session(base_url, password, rng) for rng in rngs]
+    await asyncio.gather(*(tab.connect() for tab in tabs))
+    await asyncio.gather(*(tab.play(moves, actions, think) for tab in tabs))
+    # Sampled while every session is still connected
+    rss = rss_mb(pid)
+    for tab in tabs:
+        tab.close()
+    latencies = np.concatenate([tab.latencies for tab in tabs])
+    return {
+        'sessions': sessions,
+        'reruns': int(latencies.size),
+        'errors': sum(tab.errors for tab in tabs),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'rss_mb': rss,
+    }
+
+
+def start_server(app, port, workdir, preload, env):
+    command = [sys.executable]
+    command += [os.path.join(PROJECT_ROOT, 'shared_data', 'serve.py'), app] if preload else ['-m', 'streamlit', 'run', app]
+    command += ['--server.headless', 'true', '--server.port', str(port), '--server.fileWatcherType', 'none',
+                '--browser.gatherUsageStats', 'false']
+    # Streamlit reads .streamlit/secrets.toml from the working directory
+    return subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+async def wait_healthy(base_url, server, timeout=120):
+    client = AsyncHTTPClient()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(server.stderr.read().decode(errors='replace').strip() or 'server exited')
+        try:
+            await client.fetch(f'{base_url}/_stcore/health')
+            return
+        except Exception:
+            await asyncio.sleep(0.5)
+    raise TimeoutError('server did not start')
+
+
+async def main(args):
+    app = APPS[args.app]
+    env = dict(os.environ)
+    if args.synthetic_survey:
+        sys.path.insert(0, BENCHMARK_DIR)
+        from generators import survey_rows
+        survey_path = os.path.join(tempfile.mkdtemp(), 'combined_survey_results.csv')
+        survey_rows(args.synthetic_survey, args.seed).to_csv(survey_path, index=False)
+        env['SURVEY_CSV'] = survey_path
+
+    if args.app == 'pantry':
+        # Bootstrapping the first snapshot is a one-off, not part of a session
+        sys.path.insert(0, os.path.dirname(app))
+        from ingest_pantry import bootstrap_from_json
+        from pantry_snapshot import current_version
+        if current_version() is None:
+            bootstrap_from_json()
+
+    password = secrets.token_urlsafe(12)
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, '.streamlit'))
+    with open(os.path.join(workdir, '.streamlit', 'secrets.toml'), 'w') as f:
+        f.write(f'password = "{password}"\n')
+
+    port = args.port or _free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = start_server(app, port, workdir, args.preload, env)
+    results = []
+    try:
+        await wait_healthy(base_url, server)
+        idle = rss_mb(server.pid)
+        print(f"{args.app}: server up, {idle:.0f} MB idle")
+        print(f"{'sessions':>8} {'reruns':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'MB/session':>10}")
+        for sessions in args.sessions:
+            result = await run_level(base_url, password, MOVES[args.app], sessions, args.actions, args.think,
+                                     args.seed, server.pid)
+            if results:
+                base = results[0]
+                extra = (result['rss_mb'] - base['rss_mb']) / max(sessions - base['sessions'], 1)
+                result['mb_per_added_session'] = extra
+            results.append(result)
+            per_session = f"{result['mb_per_added_session']:>10.1f}" if 'mb_per_added_session' in result else ''
+            print(f"{sessions:>8} {result['reruns']:>7} {result['errors']:>6} {result['p50_ms']:>8.0f} "
+                  f"{result['p95_ms']:>8.0f} {result['rss_mb']:>8.0f} {per_session}", flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'app': args.app, 'idle_rss_mb': idle, 'preload': args.preload, 'results': results}, f, indent=1)
+    return sum(result['errors'] for result in results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--app', choices=sorted(APPS), required=True)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 5, 10, 20],
+                        help='numbers of concurrent sessions to simulate, one run each')
+    parser.add_argument('--actions', type=int, default=10, help='widget changes per session')
+    parser.add_argument('--think', type=float, default=0.5, help='maximum pause between actions, in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, help='server port (default: a free one)')
+    parser.add_argument('--preload', action='store_true', help='start the server through shared_data/serve.py')
+    parser.add_argument('--synthetic-survey', type=int, metavar='ROWS',
+                        help='run the vaccine map on this many generated survey rows instead of the real CSV')
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(main(args)) else 0)
@@ -0,0 +1,314 @@
+"""Benchmark the pantry and vaccine dashboards on synthetic data.
+
+    python benchmarks/run_benchmarks.py                      # 1k to 1M rows
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --output before.json
+    python benchmarks/compare.py before.json after.json
+
+Every step calls the dashboards' own modules (snapshot, ZIP layer, density
+grid, hexagon pyramid, rollup, cluster index, table indexes, survey cube, PNG export).  The figures are built the
+way `pantry_map.py` and `vaccine_heat_map.py` build them, and the size of
+their serialized JSON/HTML is recorded as the payload the browser gets.
+Timings are the best of `--repeat` runs (one-off builds run once), and the
+results are written as JSON with the commit and library versions.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+for path in (PROJECT_ROOT, os.path.join(PROJECT_ROOT, 'Pantry Map'), os.path.join(PROJECT_ROOT, 'Vaccine Heat Map')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import folium
+import plotly.express as px
+import plotly.graph_objects as go
+
+from generators import pantry_clients, survey_rows
+from client_table import client_table
+from cluster_index import cluster_index_from_snapshot
+from density_grid import density_from_snapshot
+from hexbin_grid import DEFAULT_HEX_SIZE_KM, hexbins_from_snapshot
+from ingest_pantry import bootstrap_from_json
+from map_export import render_choropleth
+from pantry_rollup import PantryRollup
+from pantry_snapshot import format_petpoint_link, open_snapshot
+from survey_cube import ALL, FILTER_COLUMNS, SurveyCube, ingest_survey
+from survey_table import TABLE_COLUMNS, filter_mask, survey_table
+from zip_map_component import color_bins
+from shared_data.geodata import zip_layer
+from shared_data.zip_topology import zip_geojson_for_zoom, zip_geojson_string_for_zoom
+
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+SUITES = ('pantry', 'vaccine')
+DATE_QUERIES = 100
+FILTER_QUERIES = 20
+MARKER_DETAIL = 12
+
+
+class Recorder:
+    """Times steps and collects one result entry per (suite, step, rows)."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, suite, step, rows, func, payload=None, once=False):
+        times = []
+        for _ in range(1 if once else self.repeat):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+        entry = {'suite': suite, 'step': step, 'rows': rows,
+                 'seconds': min(times), 'median_seconds': statistics.median(times)}
+        if payload is not None:
+            entry['bytes'] = int(payload(result))
+        self.results.append(entry)
+        size = f"{entry['bytes']:>12,} B" if 'bytes' in entry else ''
+        print(f"{suite:8} {step:26} {rows:>10,} {entry['seconds'] * 1000:>10.1f} ms {size}", flush=True)
+        return result
+
+
+def _figure_bytes(fig):
+    return len(fig.to_json())
+
+
+# Pantry: mirrors the choropleth, hexbin and markers branches of pantry_map.py
+
+def pantry_zip_counts(snapshot, stop):
+    zcta = snapshot['zcta'][:stop]
+    zip_codes, counts = np.unique(zcta[zcta != ''], return_counts=True)
+    return zip_layer().counts_frame(pd.Series(counts, index=zip_codes))
+
+
+def pantry_choropleth(zip_counts):
+    return px.choropleth_mapbox(
+        zip_counts, geojson=zip_geojson_for_zoom(7), locations='ZCTA5CE10',
+        featureidkey="properties.ZCTA5CE10", color='count', color_continuous_scale="YlOrRd",
+        mapbox_style="carto-positron", zoom=7, center={"lat": 42.8864, "lon": -78.8784}, opacity=0.7,
+    )
+
+
+def pantry_hexbin(hexbins, cutoff, size=DEFAULT_HEX_SIZE_KM):
+    counts = hexbins.as_of(size, cutoff)
+    cells = np.flatnonzero(counts)
+    fig = go.Figure(go.Choroplethmapbox(geojson=hexbins.geojson(size, cells), locations=cells, z=counts[cells],
+                                        colorscale="YlOrRd", marker_opacity=0.7))
+    fig.update_layout(mapbox_style="carto-positron", mapbox_zoom=9, mapbox_center={"lat": 42.8864, "lon": -78.8784})
+    return fig
+
+
+def pantry_markers(snapshot, index, stop):
+    clusters, leaves = index.query(MARKER_DETAIL, stop=stop)
+    leaves_df = snapshot.frame(['lat', 'lng', 'name', 'address_type', 'person_id'], rows=leaves)
+    leaves_df['petpoint_link'] = leaves_df['person_id'].map(format_petpoint_link)
+    fig = go.Figure()
+    fig.add_trace(go.Scattermapbox(
+        lat=clusters['lat'], lon=clusters['lng'], mode="markers",
+        marker=dict(size=np.clip(8 + 3 * np.sqrt(clusters['count']), 10, 40)),
+        customdata=clusters['count'], name="clusters"))
+    fig.add_trace(go.Scattermapbox(
+        lat=leaves_df['lat'], lon=leaves_df['lng'], mode="markers",
+        customdata=leaves_df[['name', 'address_type', 'petpoint_link']].astype(str).to_numpy(), name="clients"))
+    fig.update_layout(mapbox_style="carto-positron", mapbox_zoom=9)
+    return fig
+
+
+def pantry_suite(recorder, rows, seed, workdir):
+    records, export = pantry_clients(rows, seed)
+    json_path = os.path.join(workdir, 'processed_pantry_data.json')
+    csv_path = os.path.join(workdir, 'PantryMap.csv')
+    snapshot_dir = os.path.join(workdir, 'pantry_snapshot')
+    records.to_json(json_path, orient='records')
+    export.to_csv(csv_path, index=False)
+
+    def load_json():
+        with open(json_path, 'r') as f:
+            return json.load(f)
+
+    def build():
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        return bootstrap_from_json(json_path, csv_path, snapshot_dir)
+
+    recorder.run('pantry', 'load_legacy_json', rows, load_json)
+    recorder.run('pantry', 'snapshot_build', rows, build, once=True)
+    snapshot = recorder.run('pantry', 'snapshot_open', rows, lambda: open_snapshot(path=snapshot_dir))
+
+    rng = np.random.default_rng(seed)
+    first, last = snapshot.min_date, snapshot.max_date
+    cutoffs = first + rng.integers(0, int((last - first).astype(np.int64)) + 1, DATE_QUERIES).astype('timedelta64[D]')
+    recorder.run('pantry', f'date_filter_x{DATE_QUERIES}', rows,
+                 lambda: [snapshot.rows_as_of(cutoff) for cutoff in cutoffs])
+    # The rest runs "as of" the middle of the range, like a mid-history year
+    cutoff = first + (last - first) // 2
+    stop = snapshot.rows_as_of(cutoff)
+
+    recorder.run('pantry', 'statistics_scan', rows, lambda: (stop, len(np.unique(snapshot['name'][:stop]))))
+    rollup = recorder.run('pantry', 'rollup_build', rows, lambda: PantryRollup.from_snapshot(snapshot), once=True)
+    recorder.run('pantry', 'rollup_statistics', rows,
+                 lambda: (rollup.clients_as_of(cutoff), rollup.names_as_of(cutoff)))
+    recorder.run('pantry', 'rollup_trends', rows, lambda: (rollup.monthly_growth(cutoff), rollup.top_growing_zips(cutoff),
+                                                           rollup.address_type_mix(cutoff)))
+    zip_counts = recorder.run('pantry', 'zip_aggregation', rows, lambda: pantry_zip_counts(snapshot, stop))
+    recorder.run('pantry', 'choropleth_figure', rows, lambda: pantry_choropleth(zip_counts), _figure_bytes)
+    density = recorder.run('pantry', 'density_build', rows, lambda: density_from_snapshot(snapshot), once=True)
+    recorder.run('pantry', 'density_image', rows, lambda: density.image_url(cutoff), len)
+    hexbins = recorder.run('pantry', 'hexbin_build', rows, lambda: hexbins_from_snapshot(snapshot), once=True)
+    recorder.run('pantry', 'hexbin_figure', rows, lambda: pantry_hexbin(hexbins, cutoff), _figure_bytes)
+    index = recorder.run('pantry', 'cluster_build', rows, lambda: cluster_index_from_snapshot(snapshot), once=True)
+    recorder.run('pantry', 'markers_figure', rows, lambda: pantry_markers(snapshot, index, stop), _figure_bytes)
+    table = recorder.run('pantry', 'table_index_build', rows, lambda: client_table(snapshot), once=True)
+    recorder.run('pantry', 'data_table', rows, lambda: (table.count(stop=stop), table.page('date', True, stop=stop)),
+                 lambda result: result[1].memory_usage(deep=True).sum())
+
+
+# Vaccine: mirrors load_data, the sidebar filters and the map branches of vaccine_heat_map.py
+
+def random_filters(cube, rng):
+    def pick(options):
+        return options[rng.integers(len(options))]
+    year = pick(cube.years)
+    filters = {name: pick([ALL] + cube.options(name)) for name in FILTER_COLUMNS}
+    return year, pick([ALL] + cube.events(year)), filters
+
+
+def filter_rows(df, year, event, filters):
+    """The pandas filter chain behind "Show Raw Data"."""
+    filtered = df[df['Year'] == year]
+    if event != ALL:
+        filtered = filtered[filtered["Sheet Name"] == event]
+    for name, value in filters.items():
+        if value != ALL:
+            filtered = filtered[filtered[FILTER_COLUMNS[name]] == value]
+    return filtered
+
+
+def folium_choropleth(zip_counts):
+    m = folium.Map(location=[42.9, -78.8], zoom_start=10, tiles='CartoDB positron')
+    folium.Choropleth(
+        geo_data=zip_geojson_string_for_zoom(10), data=zip_layer().counts_frame(zip_counts),
+        columns=['ZCTA5CE10', 'count'], key_on='feature.properties.ZCTA5CE10', fill_color='YlOrRd',
+        fill_opacity=0.7, line_color='#333', line_weight=1, legend_name='Clients Served (Filtered)',
+    ).add_to(m)
+    return m.get_root().render()
+
+
+def component_payload(zip_counts):
+    """JSON of the arguments `zip_map` sends on a rerun."""
+    geo = zip_layer()
+    counts = {str(zip_code): int(count) for zip_code, count in zip_counts.items() if count}
+    heat = [[geo.interior_lat[geo.positions[zip_code]], geo.interior_lon[geo.positions[zip_code]], int(count)]
+            for zip_code, count in zip_counts.items() if zip_code in geo.positions]
+    return json.dumps({'counts': counts, 'heat': heat, 'bins': color_bins(max(counts.values(), default=0))})
+
+
+def vaccine_suite(recorder, rows, seed, workdir):
+    csv_path = os.path.join(workdir, 'combined_survey_results.csv')
+    survey_rows(rows, seed).to_csv(csv_path, index=False)
+
+    survey_path = os.path.join(workdir, 'combined_survey_results.parquet')
+    recorder.run('vaccine', 'ingest', rows, lambda: ingest_survey(csv_path, survey_path), once=True)
+    df = recorder.run('vaccine', 'load_survey', rows, lambda: pd.read_parquet(survey_path),
+                      payload=lambda df: df.memory_usage(deep=True).sum())
+    cube = recorder.run('vaccine', 'cube_build', rows, lambda: SurveyCube(df), once=True)
+    rng = np.random.default_rng(seed)
+    queries = [random_filters(cube, rng) for _ in range(FILTER_QUERIES)]
+    recorder.run('vaccine', f'cube_select_x{FILTER_QUERIES}', rows,
+                 lambda: [cube.select(year, event, **filters) for year, event, filters in queries])
+    recorder.run('vaccine', f'filter_chain_x{FILTER_QUERIES}', rows,
+                 lambda: [filter_rows(df, year, event, filters) for year, event, filters in queries])
+
+    table = recorder.run('vaccine', 'table_index_build', rows, lambda: survey_table(df), once=True)
+    recorder.run('vaccine', f'raw_data_page_x{FILTER_QUERIES}', rows,
+                 lambda: [table.page(mask=filter_mask(df, year, event, **filters), columns=TABLE_COLUMNS)
+                          for year, event, filters in queries])
+
+    zip_counts, _ = cube.select(cube.years[-1])
+    recorder.run('vaccine', 'zip_aggregation', rows, lambda: zip_layer().counts_frame(zip_counts))
+    recorder.run('vaccine', 'folium_choropleth', rows, lambda: folium_choropleth(zip_counts), len)
+    recorder.run('vaccine', 'component_payload', rows, lambda: component_payload(zip_counts), len)
+    recorder.run('vaccine', 'png_export', rows, lambda: render_choropleth(zip_counts), len)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import plotly
+    import shapely
+    return {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+        'shapely': shapely.__version__,
+        'folium': folium.__version__,
+    }
+
+
+def warm_up():
+    """Fill the caches the apps keep for the whole process.
+
+    The ZIP layer, simplified geometry, export pixel index and plotly
+    validators would otherwise be timed in whichever step runs first.
+    """
+    empty = pd.Series(dtype=np.int64)
+    _figure_bytes(pantry_choropleth(zip_layer().counts_frame(empty)))
+    folium_choropleth(empty)
+    render_choropleth(empty)
+
+
+def run(sizes=DEFAULT_SIZES, suites=SUITES, seed=0, repeat=3):
+    recorder = Recorder(repeat)
+    warm_up()
+    for rows in sizes:
+        for suite in suites:
+            workdir = tempfile.mkdtemp(prefix=f'bench-{suite}-')
+            try:
+                (pantry_suite if suite == 'pantry' else vaccine_suite)(recorder, rows, seed, workdir)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'environment': environment(),
+        'settings': {'sizes': list(sizes), 'suites': list(suites), 'seed': seed, 'repeat': repeat},
+        'results': recorder.results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='rows per dataset')
+    parser.add_argument('--suite', choices=SUITES, action='append', help='run only this suite (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per step; the best one is reported')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<commit>.json)')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.suite or SUITES, args.seed, args.repeat)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['environment']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
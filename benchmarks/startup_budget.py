@@ -0,0 +1,126 @@
+"""Measure the dashboards' cold start against a time budget.
+
+    python benchmarks/startup_budget.py                    # both apps
+    python benchmarks/startup_budget.py --apps pantry --synthetic-survey 20000
+
+Each measurement runs in a fresh interpreter, like a restarted container:
+
+* `first_session`: the first session runs the script cold, paying for the
+  imports and for building the geometry and data itself.
+* `preload`: how long the app's `startup.py` warm-up takes (what
+  `shared_data/serve.py` starts before the server accepts connections).
+* `first_session_preloaded`: the first session once that warm-up is done.
+* `next_session`: a second session in the same process.
+
+Sessions run through Streamlit's `AppTest`, so browser rendering is not
+included.  Exits with status 1 when any measurement is over its budget in
+`BUDGETS` (seconds).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+APPS = {
+    'pantry': os.path.join(PROJECT_ROOT, 'Pantry Map', 'pantry_map.py'),
+    'vaccine': os.path.join(PROJECT_ROOT, 'Vaccine Heat Map', 'vaccine_heat_map.py'),
+}
+BUDGETS = {
+    'pantry': {'first_session': 3.0, 'preload': 3.0, 'first_session_preloaded': 1.0, 'next_session': 0.3},
+    'vaccine': {'first_session': 2.0, 'preload': 4.5, 'first_session_preloaded': 0.5, 'next_session': 0.25},
+}
+MEASUREMENTS = ['first_session', 'preload', 'first_session_preloaded', 'next_session']
+
+
+def _session(app):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(app, default_timeout=600)
+    at.secrets['password'] = 'budget'
+    at.session_state['password_correct'] = True
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed
+
+
+def child(app, preloaded):
+    """Runs in its own interpreter; prints the measurements as JSON."""
+    sys.path.insert(0, os.path.dirname(app))
+    result = {}
+    if preloaded:
+        started = time.perf_counter()
+        import startup
+        startup.start().join()
+        result['preload'] = time.perf_counter() - started
+        result['first_session_preloaded'] = _session(app)
+    else:
+        result['first_session'] = _session(app)
+        result['next_session'] = _session(app)
+    print(json.dumps(result))
+
+
+def measure(app, env):
+    result = {}
+    for preloaded in (False, True):
+        args = [sys.executable, os.path.abspath(__file__), '--child', app] + (['--preloaded'] if preloaded else [])
+        completed = subprocess.run(args, capture_output=True, text=True, env=env, cwd=os.path.dirname(app))
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else 'failed')
+        result.update(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return result
+
+
+def _prepare_pantry():
+    # Bootstrapping the first snapshot is a one-off, not part of a start
+    sys.path.insert(0, os.path.dirname(APPS['pantry']))
+    from ingest_pantry import bootstrap_from_json
+    from pantry_snapshot import current_version
+    if current_version() is None:
+        bootstrap_from_json()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--apps', nargs='+', choices=sorted(APPS), default=sorted(APPS))
+    parser.add_argument('--synthetic-survey', type=int, metavar='ROWS',
+                        help='run the vaccine map on this many generated survey rows instead of the real CSV')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--preloaded', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.preloaded)
+        sys.exit(0)
+
+    env = dict(os.environ)
+    if args.synthetic_survey:
+        sys.path.insert(0, BENCHMARK_DIR)
+        from generators import survey_rows
+        survey_path = os.path.join(tempfile.mkdtemp(), 'combined_survey_results.csv')
+        survey_rows(args.synthetic_survey).to_csv(survey_path, index=False)
+        env['SURVEY_CSV'] = survey_path
+    if 'pantry' in args.apps:
+        _prepare_pantry()
+
+    over = 0
+    print(f"{'app':8} {'measurement':26} {'seconds':>8} {'budget':>8}")
+    for name in args.apps:
+        try:
+            result = measure(APPS[name], env)
+        except RuntimeError as e:
+            print(f"{name:8} failed: {e}")
+            over += 1
+            continue
+        for measurement in MEASUREMENTS:
+            seconds, budget = result[measurement], BUDGETS[name][measurement]
+            flag = '  OVER BUDGET' if seconds > budget else ''
+            over += seconds > budget
+            print(f"{name:8} {measurement:26} {seconds:>8.2f} {budget:>8.2f}{flag}")
+    sys.exit(1 if over else 0)
@@ -0,0 +1,85 @@
+"""Process-wide ZCTA layer shared by the pantry and vaccine apps.
+
+`zip_layer()` parses `erie_survey_zips.geojson` once per process and keeps
+everything the apps derive from it: the shapely geometries, an STRtree for
+point lookups and the census interior points.  Arrays are marked
+read-only and geometries are never exposed through a mutable frame, so
+every session can share the same object; per-session counts are joined
+with `counts_frame()`, which builds a small new frame instead of touching
+the layer.
+"""
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+SHARED_DATA_PATH = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(SHARED_DATA_PATH, 'erie_survey_zips.geojson')
+ZIP_PROPERTY = 'ZCTA5CE10'
+
+
+def _read_only(values):
+    values = np.asarray(values)
+    values.flags.writeable = False
+    return values
+
+
+class ZipLayer:
+    def __init__(self, path=SOURCE_PATH):
+        with open(path, 'rb') as f:
+            source = json.load(f)
+        features = source['features']
+        properties = [feature['properties'] for feature in features]
+
+        self.zip_codes = _read_only(np.array([p[ZIP_PROPERTY] for p in properties], dtype='<U5'))
+        self.positions = {zip_code: i for i, zip_code in enumerate(self.zip_codes)}
+        self.geometries = _read_only(np.array([shape(feature['geometry']) for feature in features], dtype=object))
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+        self.interior_lat = _read_only(np.array([float(p['INTPTLAT10']) for p in properties]))
+        self.interior_lon = _read_only(np.array([float(p['INTPTLON10']) for p in properties]))
+
+    def __len__(self):
+        return len(self.zip_codes)
+
+    def locate(self, lng, lat):
+        """ZCTA of every point ('' outside the layer).
+
+        The STRtree only yields bounding-box candidates; each polygon then
+        tests its candidates in one prepared `intersects_xy` call, which is
+        several times faster than a per-pair predicate query on large inputs.
+        """
+        lng = np.asarray(lng, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        point_index, zip_index = self.tree.query(shapely.points(lng, lat))
+        order = np.argsort(zip_index, kind='stable')
+        point_index, zip_index = point_index[order], zip_index[order]
+        starts = np.searchsorted(zip_index, np.arange(len(self.zip_codes) + 1))
+        result = np.full(len(lng), '', dtype='<U5')
+        # Last polygon first, so points on a shared border take the first match
+        for i in range(len(self.zip_codes) - 1, -1, -1):
+            candidates = point_index[starts[i]:starts[i + 1]]
+            if candidates.size:
+                inside = shapely.intersects_xy(self.geometries[i], lng[candidates], lat[candidates])
+                result[candidates[inside]] = self.zip_codes[i]
+        return result
+
+    def align(self, counts):
+        """Values of a `{zip: count}` mapping or Series in layer order (0 if absent)."""
+        counts = pd.Series(counts, dtype=np.float64) if not isinstance(counts, pd.Series) else counts
+        return counts.reindex(self.zip_codes).fillna(0).to_numpy()
+
+    def counts_frame(self, counts, column='count'):
+        """New two-column frame (ZCTA5CE10, `column`) for choropleth layers."""
+        return pd.DataFrame({ZIP_PROPERTY: self.zip_codes, column: self.align(counts)})
+
+
+@lru_cache(maxsize=None)
+def zip_layer(path=SOURCE_PATH):
+    """The shared `ZipLayer`; callers must treat it as read-only."""
+    return ZipLayer(path)
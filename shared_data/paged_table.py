@@ -0,0 +1,203 @@
+"""Paged, pre-sorted views of a large read-only table.
+
+A `TableIndex` is built once per dataset (in a preload `lru_cache` or
+`st.cache_resource`): a stable sort permutation for every sortable column
+and a token index over the searchable ones.  A view is then a filter (the
+first `stop` rows and/or a boolean row mask), a sort and a page, and only
+the rows on that page are materialized and sent to the browser, so opening
+the table costs about the same for a thousand rows or a million:
+
+    table = TableIndex({'name': names, 'date': dates}, fetch=lambda rows, columns: frame.iloc[rows][columns])
+    total = table.count(stop=client_count)
+    frame = table.page('date', descending=True, limit=100, stop=client_count)
+
+`paged_table()` draws the search box, sort, column and page controls
+around a table.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZE = 100
+_TOKEN = re.compile(r'[0-9a-z]+')
+# Sorts after every token, so [prefix, prefix + _LAST) spans the tokens starting with prefix
+_LAST = '\U0010ffff'
+
+
+def _sort_orders(values, identity):
+    """Stable ascending and descending row permutations of `values`, missing values last in both.
+
+    Both keep tied rows in table order.  The descending one is None when it
+    is just the ascending one reversed (no ties and no missing values).
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        values = pd.Categorical(values)
+        if not values.ordered:
+            values = values.reorder_categories(sorted(values.categories))
+    # Ranks instead of the values themselves: sorting small integers beats sorting strings
+    codes, uniques = pd.factorize(values, sort=True)
+    missing = codes < 0
+    codes = np.where(missing, len(uniques), codes)
+    order = np.argsort(codes, kind='stable').astype(identity.dtype)
+    # Columns stored in sort order (the pantry's dates) share one permutation
+    if np.array_equal(order, identity):
+        order = identity
+    if not missing.any() and len(uniques) == len(codes):
+        return order, None
+    reverse = np.argsort(np.where(missing, len(uniques), len(uniques) - 1 - codes), kind='stable')
+    return order, reverse.astype(identity.dtype)
+
+
+class _TokenIndex:
+    """Lower-case word prefixes -> distinct values of one column -> rows."""
+
+    def __init__(self, values):
+        # Distinct values are tokenized once; rows only keep a value code
+        codes, uniques = pd.factorize(values)
+        self.codes = codes
+        self.value_count = len(uniques)
+        text = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.lower()
+        # Values that are one word already (IDs, ZIP codes) skip the regex split
+        single = text.str.fullmatch(_TOKEN.pattern).to_numpy(dtype=bool)
+        words = text[~single].str.findall(_TOKEN).explode().dropna()
+        tokens = np.concatenate([text[single].to_numpy(dtype=str), words.to_numpy(dtype=str)])
+        value_ids = np.concatenate([np.flatnonzero(single), words.index.to_numpy(dtype=np.int64)])
+        order = np.argsort(tokens, kind='stable')
+        self.tokens = tokens[order]
+        self.values = value_ids[order]
+
+    def matches(self, prefix):
+        """Row mask of the values with a word starting with `prefix`."""
+        start = np.searchsorted(self.tokens, prefix, side='left')
+        end = np.searchsorted(self.tokens, prefix + _LAST, side='left')
+        hit = np.zeros(self.value_count + 1, dtype=bool)  # last slot: missing (code -1)
+        hit[self.values[start:end]] = True
+        return hit[self.codes]
+
+
+class TableIndex:
+    """Sort permutations and a search index over a read-only table.
+
+    `values` maps each sortable column to its values (array, Series or
+    Categorical, one per row); `fetch(rows, columns)` returns those rows of
+    the table as a DataFrame.  `columns` lists every column that can be
+    shown (default: the sortable ones), `searchable` the columns the search
+    box looks in and `labels` optional display names.
+    """
+
+    def __init__(self, values, fetch, columns=None, searchable=(), labels=None):
+        lengths = {len(column) for column in values.values()}
+        if len(lengths) != 1:
+            raise ValueError("Table columns differ in length")
+        self.length = lengths.pop()
+        self.fetch = fetch
+        self.sortable = list(values)
+        self.columns = list(columns or values)
+        self.labels = dict(labels or {})
+        self._identity = np.arange(self.length, dtype=np.int32 if self.length < 2 ** 31 else np.int64)
+        self._orders = {name: _sort_orders(column, self._identity) for name, column in values.items()}
+        self._search = {name: _TokenIndex(values[name]) for name in searchable}
+
+    def __len__(self):
+        return self.length
+
+    def label(self, column):
+        return self.labels.get(column, column)
+
+    def search(self, query):
+        """Row mask of rows where every word of `query` starts a word in a searchable column.
+
+        None for an empty query, which matches every row.
+        """
+        prefixes = _TOKEN.findall(str(query).lower())
+        if not prefixes or not self._search:
+            return None
+        found = np.ones(self.length, dtype=bool)
+        for prefix in prefixes:
+            anywhere = np.zeros(self.length, dtype=bool)
+            for index in self._search.values():
+                anywhere |= index.matches(prefix)
+            found &= anywhere
+        return found
+
+    def count(self, stop=None, mask=None):
+        """Rows passing the filter: the first `stop` rows and, if given, `mask`."""
+        stop = self.length if stop is None else min(stop, self.length)
+        return stop if mask is None else int(np.count_nonzero(mask[:stop]))
+
+    def rows(self, sort=None, descending=False, offset=0, limit=PAGE_SIZE, stop=None, mask=None):
+        """Row numbers of one page of the filtered table in `sort` order."""
+        order, reverse = (self._identity, None) if sort is None else self._orders[sort]
+        if descending and reverse is not None:
+            order = reverse
+        else:
+            if stop is not None and order is self._identity:
+                # Stored order: the first `stop` rows are a prefix of the permutation
+                order, stop = order[:stop], None
+            if descending:
+                order = order[::-1]
+        if stop is None and mask is None:
+            return order[offset:offset + limit]
+
+        # Filtered rows are picked out of the permutation in growing chunks, so a
+        # page near the top only looks at about as many rows as it shows
+        needed = offset + limit
+        found, have, position, chunk = [], 0, 0, max(4 * needed, 4096)
+        while have < needed and position < len(order):
+            part = order[position:position + chunk]
+            keep = np.ones(len(part), dtype=bool) if mask is None else mask[part]
+            if stop is not None:
+                keep &= part < stop
+            found.append(part[keep])
+            have += len(found[-1])
+            position += chunk
+            chunk *= 2
+        return np.concatenate(found)[offset:needed] if found else order[:0]
+
+    def page(self, sort=None, descending=False, offset=0, limit=PAGE_SIZE, stop=None, mask=None, columns=None):
+        """One page of the filtered table as a DataFrame with only `columns`."""
+        rows = self.rows(sort, descending, offset, limit, stop, mask)
+        return self.fetch(rows, list(columns or self.columns)).reset_index(drop=True)
+
+
+def paged_table(table, key, stop=None, mask=None, sort=None, descending=False, columns=None, page_size=PAGE_SIZE):
+    """Searchable, sortable, paged view of `table`; returns the page shown.
+
+    `stop` and `mask` filter the rows as in `TableIndex.count`; `sort`,
+    `descending` and `columns` are the initial sort and shown columns.
+    """
+    # Widgets offer the display names themselves, so their values are plain strings
+    by_label = {table.label(column): column for column in table.columns + table.sortable}
+    sort_labels = [table.label(column) for column in table.sortable]
+    column_labels = [table.label(column) for column in table.columns]
+    search_column, sort_column, order_column = st.columns([3, 2, 1])
+    query = search_column.text_input("Search", key=f'{key}_search', placeholder="Words or their beginnings")
+    sort = by_label[sort_column.selectbox("Sort by", sort_labels, index=table.sortable.index(sort) if sort else 0,
+                                          key=f'{key}_sort')]
+    descending = order_column.checkbox("Descending", value=descending, key=f'{key}_descending')
+    shown = st.multiselect("Columns", column_labels, default=[table.label(column) for column in columns or table.columns],
+                           key=f'{key}_columns')
+    shown = [by_label[label] for label in shown] or columns or table.columns
+
+    matches = table.search(query)
+    if matches is not None:
+        mask = matches if mask is None else mask & matches
+    total = table.count(stop=stop, mask=mask)
+    pages = max(math.ceil(total / page_size), 1)
+    page_key = f'{key}_page'
+    if st.session_state.get(page_key, 1) > pages:
+        # The filter shrank under the page being viewed
+        st.session_state[page_key] = pages
+
+    body = st.container()
+    page_column, info_column = st.columns([1, 4])
+    page = int(page_column.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key))
+    offset = (page - 1) * page_size
+    frame = table.page(sort, descending, offset, page_size, stop=stop, mask=mask, columns=shown)
+    body.dataframe(frame.rename(columns=table.labels), hide_index=True, use_container_width=True)
+    info_column.caption(f"Rows {offset + 1:,}–{offset + len(frame):,} of {total:,} (page {page:,} of {pages:,})"
+                        if total else "No matching rows")
+    return frame
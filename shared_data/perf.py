@@ -0,0 +1,209 @@
+"""Per-rerun timing, payload sizes and cache hit/miss counts for the Streamlit apps.
+
+A rerun is profiled when `SPCA_PERF=1` is set (every session, log only) or
+when a session ticks the sidebar "Performance" checkbox (panel and log).
+Otherwise no profile exists and every call below returns after one
+thread-local lookup, so the instrumentation can stay in the scripts:
+
+    perf.start_rerun('pantry')                  # right after set_page_config
+    perf.stage('load_data')                     # closes the previous stage
+    with perf.span('zip_counts'):               # nested timing inside a stage
+        ...
+    perf.record_bytes('figure', lambda: len(fig.to_json()))   # only called when profiling
+
+    @perf.cached(st.cache_data(max_entries=64)) # counts hits and misses
+    def load_data(): ...
+
+    perf.finish_rerun()                         # end of the script: log line + panel
+
+Profiled reruns are appended as JSON lines to `perf_logs/reruns.jsonl`
+(`SPCA_PERF_LOG` overrides it), rotated at `LOG_MAX_BYTES`.
+"""
+import contextlib
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import streamlit as st
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+LOG_PATH = os.environ.get('SPCA_PERF_LOG', os.path.join(PROJECT_ROOT, 'perf_logs', 'reruns.jsonl'))
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+ENABLED = os.environ.get('SPCA_PERF', '') not in ('', '0')
+PANEL_KEY = 'perf_panel'
+
+# Streamlit runs each session's script in its own thread
+_local = threading.local()
+_NO_SPAN = contextlib.nullcontext()
+_log_lock = threading.Lock()
+_logger = None
+
+
+class RerunProfile:
+    def __init__(self, app):
+        self.app = app
+        self.started = time.perf_counter()
+        # [name, depth, seconds] in start order; seconds is None while open
+        self.timings = []
+        self.bytes = {}
+        self.cache = {}
+        self._depth = 0
+        self._stage = None
+
+    @contextlib.contextmanager
+    def span(self, name):
+        entry = [name, self._depth, None]
+        self.timings.append(entry)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[2] = time.perf_counter() - start
+            self._depth -= 1
+
+    def stage(self, name):
+        self.end_stage()
+        self._stage = self.span(name)
+        self._stage.__enter__()
+
+    def end_stage(self):
+        if self._stage is not None:
+            self._stage.__exit__(None, None, None)
+            self._stage = None
+
+    def count(self, name, miss=False):
+        counts = self.cache.setdefault(name, {'hits': 0, 'misses': 0})
+        # A call is counted as a hit first and corrected if the function body runs
+        if miss:
+            counts['hits'] -= 1
+            counts['misses'] += 1
+        else:
+            counts['hits'] += 1
+
+    def record(self):
+        self.end_stage()
+        return {
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'app': self.app,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'timings': [{'name': name, 'depth': depth, 'ms': round((seconds or 0) * 1000, 2)}
+                        for name, depth, seconds in self.timings],
+            'bytes': self.bytes,
+            'cache': self.cache,
+        }
+
+
+def current():
+    """The profile of this thread's rerun, or None when profiling is off."""
+    return getattr(_local, 'profile', None)
+
+
+def start_rerun(app):
+    enabled = ENABLED or bool(st.session_state.get(PANEL_KEY, False))
+    _local.profile = RerunProfile(app) if enabled else None
+    return _local.profile
+
+
+def stage(name):
+    profile = current()
+    if profile is not None:
+        profile.stage(name)
+
+
+def span(name):
+    profile = current()
+    return _NO_SPAN if profile is None else profile.span(name)
+
+
+def record_bytes(name, size):
+    """Record a payload size; `size` may be a callable so it is only computed when profiling."""
+    profile = current()
+    if profile is None:
+        return
+    if callable(size):
+        # Timed on its own so serializing for the size does not inflate the stage
+        with profile.span(f'{name} size'):
+            size = size()
+    profile.bytes[name] = int(size)
+
+
+def cached(cache, name=None):
+    """Apply a Streamlit cache decorator and count its hits and misses."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            # Only runs on a cache miss
+            profile = current()
+            if profile is not None:
+                profile.count(label, miss=True)
+            return func(*args, **kwargs)
+
+        cached_func = cache(body)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            profile = current()
+            if profile is None:
+                return cached_func(*args, **kwargs)
+            profile.count(label)
+            with profile.span(label):
+                return cached_func(*args, **kwargs)
+
+        call.clear = cached_func.clear
+        return call
+    return decorate
+
+
+def _log(record):
+    global _logger
+    with _log_lock:
+        if _logger is None:
+            os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _logger = logging.getLogger('spca.perf')
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            _logger.addHandler(handler)
+    _logger.info(json.dumps(record, separators=(',', ':')))
+
+
+def _render_panel(record):
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(f"Last rerun: {record['total_ms']:,.0f} ms")
+        st.dataframe(pd.DataFrame({
+            'stage': [' ' * t['depth'] + t['name'] for t in record['timings']],
+            'ms': [t['ms'] for t in record['timings']],
+        }), hide_index=True, use_container_width=True)
+        if record['bytes']:
+            st.dataframe(pd.DataFrame({'payload': list(record['bytes']), 'bytes': list(record['bytes'].values())}),
+                         hide_index=True, use_container_width=True)
+        if record['cache']:
+            st.dataframe(pd.DataFrame([dict(loader=name, **counts) for name, counts in record['cache'].items()]),
+                         hide_index=True, use_container_width=True)
+        st.caption(f"Logged to {LOG_PATH}")
+
+
+def finish_rerun():
+    """Close the rerun: offer the panel checkbox, log the profile and show it."""
+    show = st.sidebar.checkbox("Performance", key=PANEL_KEY,
+                               help="Time each stage of a rerun and log it for offline analysis")
+    profile = current()
+    _local.profile = None
+    if profile is None:
+        return None
+    record = profile.record()
+    _log(record)
+    if show:
+        _render_panel(record)
+    return record
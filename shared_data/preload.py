@@ -0,0 +1,57 @@
+"""Warm an app's process-wide caches on a background thread.
+
+Each app lists its warm-up tasks (heavy imports, ZIP geometry, the current
+data) in its `startup.py`.  `start()` runs them once per process on a
+daemon thread: `shared_data/serve.py` calls it before the Streamlit server
+starts, and the app script calls it again on every run, which is a no-op
+after the first.  Tasks only fill plain `lru_cache`s and `sys.modules`, so
+they never touch a Streamlit session; a task that fails is logged and the
+app simply builds that piece on first use as before.
+"""
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+_lock = threading.Lock()
+_threads = {}
+_timings = {}
+
+
+def _run(name, tasks):
+    started = time.perf_counter()
+    for label, task in tasks:
+        task_started = time.perf_counter()
+        try:
+            task()
+        except Exception:
+            _LOGGER.exception("Preload task %s/%s failed", name, label)
+            continue
+        _timings[name][label] = time.perf_counter() - task_started
+    _LOGGER.info("Preloaded %s in %.2f s", name, time.perf_counter() - started)
+
+
+def start(name, tasks):
+    """Run `(label, callable)` tasks in the background once per process."""
+    with _lock:
+        thread = _threads.get(name)
+        if thread is None:
+            _timings[name] = {}
+            thread = threading.Thread(target=_run, args=(name, list(tasks)), name=f'preload-{name}', daemon=True)
+            _threads[name] = thread
+            thread.start()
+    return thread
+
+
+def wait(name, timeout=None):
+    """Block until the preload of `name` is done; False if it has not started or timed out."""
+    thread = _threads.get(name)
+    if thread is None:
+        return False
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def timings(name):
+    """Seconds taken by each finished task of `name`."""
+    return dict(_timings.get(name, {}))
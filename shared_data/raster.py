@@ -0,0 +1,298 @@
+"""Small NumPy rasterizer for rendering maps without a browser.
+
+Frames are `(height, width, 3)` uint8 arrays.  Everything is projected with
+Web Mercator (the projection of the interactive maps), polygons are filled
+with an even-odd scanline rule, and a tiny bitmap font covers the date and
+count labels, so the only external tool needed to make a video is ffmpeg.
+`encode_png` turns density grids into image overlays for the web maps.
+"""
+import base64
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from shared_data.vector_tiles import lnglat_to_world, world_to_lnglat
+
+# Leaflet.heat's default gradient (position -> RGB)
+HEAT_GRADIENT = [
+    (0.4, (0, 0, 255)),
+    (0.6, (0, 255, 255)),
+    (0.7, (0, 255, 0)),
+    (0.8, (255, 255, 0)),
+    (1.0, (255, 0, 0)),
+]
+
+# 3x5 bitmap glyphs, one string of 15 bits per character (rows top to bottom)
+_GLYPHS = {
+    '0': '111101101101111', '1': '010110010010111', '2': '111001111100111',
+    '3': '111001111001111', '4': '101101111001001', '5': '111100111001111',
+    '6': '111100111101111', '7': '111001001001001', '8': '111101111101111',
+    '9': '111101111001111', '-': '000000111000000', ',': '000000000010100',
+    ':': '000010000010000', '/': '001001010100100', '.': '000000000000010',
+    ' ': '000000000000000',
+}
+
+
+class Viewport:
+    """Maps lng/lat onto a `width` x `height` pixel frame.
+
+    `bounds` (west/south/east/north) is widened on one axis to match the
+    frame's aspect ratio, so the whole area stays visible without stretching.
+    """
+
+    def __init__(self, bounds, width, height):
+        self.width = width
+        self.height = height
+        x0, y0 = lnglat_to_world(bounds['west'], bounds['north'])
+        x1, y1 = lnglat_to_world(bounds['east'], bounds['south'])
+        scale = min(width / (x1 - x0), height / (y1 - y0))
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        self.scale = float(scale)
+        self.origin = (float(cx - width / 2 / scale), float(cy - height / 2 / scale))
+
+    @classmethod
+    def centered(cls, lat, lng, zoom, width, height):
+        """Viewport showing what a web map at `zoom` centered on lat/lng shows."""
+        x, y = lnglat_to_world(lng, lat)
+        half_w, half_h = width / 2 / (256 * 2 ** zoom), height / 2 / (256 * 2 ** zoom)
+        west, north = world_to_lnglat(x - half_w, y - half_h)
+        east, south = world_to_lnglat(x + half_w, y + half_h)
+        return cls({'west': float(west), 'east': float(east), 'south': float(south), 'north': float(north)},
+                   width, height)
+
+    @property
+    def zoom(self):
+        """Equivalent web map zoom level (256px tiles)."""
+        return math.log2(self.scale / 256)
+
+    def project(self, lng, lat):
+        """Pixel coordinates (floats, pixel centers at .5) for lng/lat arrays."""
+        x, y = lnglat_to_world(lng, lat)
+        return (x - self.origin[0]) * self.scale, (y - self.origin[1]) * self.scale
+
+
+def blank(width, height, color=(255, 255, 255)):
+    canvas = np.empty((height, width, 3), dtype=np.uint8)
+    canvas[:] = color
+    return canvas
+
+
+def polygon_mask(rings, width, height):
+    """Boolean mask of the pixels inside `rings` (even-odd rule).
+
+    `rings` is a list of (N, 2) pixel coordinate arrays; holes and
+    multipolygon parts can simply be listed together.
+    """
+    edges = []
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)
+        edges.append(np.hstack([ring, np.roll(ring, -1, axis=0)]))
+    if not edges:
+        return np.zeros((height, width), dtype=bool)
+    x0, y0, x1, y1 = np.vstack(edges).T
+
+    top = max(int(math.floor(min(y0.min(), y1.min()))), 0)
+    bottom = min(int(math.ceil(max(y0.max(), y1.max()))), height)
+    crossings = np.zeros((height, width + 1), dtype=np.int32)
+    if bottom <= top:
+        return crossings[:, :width].astype(bool)
+
+    # Every edge toggles "inside" at the first pixel center right of it
+    rows = np.arange(top, bottom) + 0.5
+    hit = (y0[None, :] <= rows[:, None]) != (y1[None, :] <= rows[:, None])
+    row_index, edge_index = np.nonzero(hit)
+    yc = rows[row_index]
+    xs = x0[edge_index] + (yc - y0[edge_index]) * (x1[edge_index] - x0[edge_index]) / (y1[edge_index] - y0[edge_index])
+    columns = np.clip(np.ceil(xs - 0.5).astype(np.int64), 0, width)
+    np.add.at(crossings, (row_index + top, columns), 1)
+    return (np.cumsum(crossings, axis=1)[:, :width] % 2).astype(bool)
+
+
+def fill_polygon(canvas, rings, color, alpha=1.0):
+    mask = polygon_mask(rings, canvas.shape[1], canvas.shape[0])
+    if alpha >= 1.0:
+        canvas[mask] = color
+    else:
+        canvas[mask] = (canvas[mask] * (1 - alpha) + np.asarray(color) * alpha).astype(np.uint8)
+
+
+def draw_polyline(canvas, points, color, closed=True):
+    """1px line through `points` (pixel coordinates), sampled per pixel step."""
+    points = np.asarray(points, dtype=np.float64)
+    if closed:
+        points = np.vstack([points, points[:1]])
+    if len(points) < 2:
+        return
+    start, delta = points[:-1], np.diff(points, axis=0)
+    steps = np.ceil(np.abs(delta).max(axis=1)).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(start)), steps)
+    offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = offsets / np.repeat(np.maximum(steps - 1, 1), steps)
+    xy = start[segment] + delta[segment] * t[:, None]
+    xs = np.floor(xy[:, 0]).astype(np.int64)
+    ys = np.floor(xy[:, 1]).astype(np.int64)
+    inside = (xs >= 0) & (xs < canvas.shape[1]) & (ys >= 0) & (ys < canvas.shape[0])
+    canvas[ys[inside], xs[inside]] = color
+
+
+def geojson_rings(geojson, viewport):
+    """Per-feature lists of projected rings for a Polygon/MultiPolygon layer."""
+    features = []
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        rings = []
+        for polygon in polygons:
+            for ring in polygon:
+                ring = np.asarray(ring, dtype=np.float64)
+                rings.append(np.column_stack(viewport.project(ring[:-1, 0], ring[:-1, 1])))
+        features.append(rings)
+    return features
+
+
+def gaussian_kernel(sigma):
+    """Normalized-to-peak 2D Gaussian, 3 sigma wide on each side."""
+    radius = max(int(math.ceil(3 * sigma)), 1)
+    axis = np.arange(-radius, radius + 1, dtype=np.float32)
+    profile = np.exp(-axis ** 2 / (2 * sigma ** 2))
+    return np.outer(profile, profile)
+
+
+def gaussian_blur(grid, sigma):
+    """Separable Gaussian blur over the last two axes (zero outside the grid).
+
+    Works on a single grid or a whole stack of them at once; the kernel sums
+    to 1, so the blur preserves the total count.
+    """
+    radius = max(int(math.ceil(3 * sigma)), 1)
+    weights = np.exp(-np.arange(-radius, radius + 1) ** 2 / (2 * sigma ** 2))
+    weights = (weights / weights.sum()).astype(np.float32)
+    grid = np.asarray(grid, dtype=np.float32)
+    for axis in (-2, -1):
+        padding = [(0, 0)] * grid.ndim
+        padding[axis] = (radius, radius)
+        padded = np.pad(grid, padding)
+        size = grid.shape[axis]
+        blurred = np.zeros_like(grid)
+        for offset, weight in enumerate(weights):
+            blurred += weight * padded.take(np.arange(offset, offset + size), axis=axis)
+        grid = blurred
+    return grid
+
+
+def point_histogram(xs, ys, width, height, cell=1):
+    """Count of points (pixel coordinates) per `cell` x `cell` pixel block.
+
+    The grid is `ceil(height / cell)` x `ceil(width / cell)`; points outside
+    the frame are dropped.
+    """
+    columns, rows = -(-width // cell), -(-height // cell)
+    x = np.floor(np.asarray(xs) / cell).astype(np.int64)
+    y = np.floor(np.asarray(ys) / cell).astype(np.int64)
+    inside = (x >= 0) & (x < columns) & (y >= 0) & (y < rows)
+    counts = np.bincount(y[inside] * columns + x[inside], minlength=rows * columns)
+    return counts.reshape(rows, columns).astype(np.float32)
+
+
+def upsample(grid, cell, width, height):
+    """Bilinear resize of a grid of `cell`-pixel blocks (last two axes) to `height` x `width` pixels."""
+    def taps(size, cells):
+        position = np.clip((np.arange(size) + 0.5) / cell - 0.5, 0, cells - 1)
+        low = np.floor(position).astype(np.int64)
+        return low, np.minimum(low + 1, cells - 1), (position - low).astype(np.float32)
+
+    y0, y1, fy = taps(height, grid.shape[-2])
+    x0, x1, fx = taps(width, grid.shape[-1])
+    rows = grid[..., y0, :] * (1 - fy[:, None]) + grid[..., y1, :] * fy[:, None]
+    return rows[..., x0] * (1 - fx) + rows[..., x1] * fx
+
+
+def add_stamps(grid, xs, ys, kernel, weights=None):
+    """Add `kernel` centered on every point (pixel coordinates) into `grid`."""
+    radius = kernel.shape[0] // 2
+    height, width = grid.shape
+    weights = np.ones(len(xs), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    for x, y, weight in zip(np.floor(xs).astype(np.int64), np.floor(ys).astype(np.int64), weights):
+        top, left = y - radius, x - radius
+        gy0, gx0 = max(top, 0), max(left, 0)
+        gy1, gx1 = min(top + kernel.shape[0], height), min(left + kernel.shape[1], width)
+        if gy0 >= gy1 or gx0 >= gx1:
+            continue
+        grid[gy0:gy1, gx0:gx1] += weight * kernel[gy0 - top:gy1 - top, gx0 - left:gx1 - left]
+
+
+def gradient_lut(gradient=HEAT_GRADIENT, size=256):
+    """`size` x 3 uint8 color lookup table interpolated from gradient stops."""
+    positions = np.linspace(0, 1, size)
+    stops = np.array([position for position, _ in gradient])
+    colors = np.array([color for _, color in gradient], dtype=np.float64)
+    lut = np.column_stack([np.interp(positions, stops, colors[:, channel]) for channel in range(3)])
+    return lut.astype(np.uint8)
+
+
+def _heat_colors(level, lut, max_opacity):
+    colors = lut[(level * (len(lut) - 1)).astype(np.int64)]
+    return colors, np.sqrt(level) * max_opacity
+
+
+def blend_heat(canvas, values, lut, max_opacity=0.85):
+    """Composite a density grid (already scaled to 0..1) over `canvas` in place."""
+    values = np.clip(values, 0.0, 1.0)
+    visible = values > 0.01
+    if not visible.any():
+        return canvas
+    colors, alpha = _heat_colors(values[visible], lut, max_opacity)
+    alpha = alpha[:, None]
+    canvas[visible] = (canvas[visible] * (1 - alpha) + colors * alpha).astype(np.uint8)
+    return canvas
+
+
+def heat_rgba(values, lut, max_opacity=0.85):
+    """RGBA image of a density grid (scaled to 0..1), transparent where empty."""
+    values = np.clip(values, 0.0, 1.0)
+    image = np.zeros(values.shape + (4,), dtype=np.uint8)
+    visible = values > 0.01
+    colors, alpha = _heat_colors(values[visible], lut, max_opacity)
+    image[visible, :3] = colors
+    image[visible, 3] = (alpha * 255).astype(np.uint8)
+    return image
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def encode_png(image, level=6):
+    """PNG bytes for an RGB or RGBA uint8 image."""
+    height, width, channels = image.shape
+    color_type = {3: 2, 4: 6}[channels]
+    # Every scanline starts with filter type 0 (none)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, -1)])
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+        _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), level)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def png_data_url(image):
+    return 'data:image/png;base64,' + base64.b64encode(encode_png(image)).decode('ascii')
+
+
+def draw_text(canvas, text, x, y, scale=4, color=(0, 0, 0)):
+    """Draw digits and date punctuation with the 3x5 bitmap font."""
+    for char in text:
+        glyph = _GLYPHS.get(char)
+        if glyph is None:
+            raise ValueError(f"No glyph for {char!r}")
+        bits = np.array([bit == '1' for bit in glyph]).reshape(5, 3)
+        block = np.kron(bits, np.ones((scale, scale), dtype=bool))
+        height = min(block.shape[0], canvas.shape[0] - y)
+        width = min(block.shape[1], canvas.shape[1] - x)
+        if height > 0 and width > 0:
+            canvas[y:y + height, x:x + width][block[:height, :width]] = color
+        x += 4 * scale
+    return canvas
@@ -0,0 +1,22 @@
+"""Start a dashboard with its warm-up already running.
+
+    python shared_data/serve.py "Pantry Map/pantry_map.py" --server.port 8501
+
+Imports the app's `startup.py`, starts its background preload and then runs
+`streamlit run` in the same process with the remaining arguments, so the
+geometry and data are warm by the time the first session connects.
+"""
+import importlib
+import os
+import sys
+
+from streamlit.web import cli as stcli
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    app = os.path.abspath(sys.argv[1])
+    sys.path.insert(0, os.path.dirname(app))
+    importlib.import_module('startup').start()
+    sys.argv = ['streamlit', 'run', app] + sys.argv[2:]
+    sys.exit(stcli.main())
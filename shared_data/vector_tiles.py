@@ -0,0 +1,288 @@
+"""Mapbox Vector Tile (MVT v2) cutting and encoding.
+
+Small, dependency-free encoder used by the pantry tile server: it projects
+lat/lng to tile coordinates, clips polygons to the tile (plus a buffer) and
+writes the protobuf by hand, so no `mapbox-vector-tile`/`protobuf` install is
+needed.  Spec: https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+import struct
+
+import numpy as np
+
+EXTENT = 4096
+BUFFER = 64
+
+# Erie County area covered by the maps (same bounds as the plotly maps)
+ERIE_BOUNDS = {"west": -80.0, "east": -77.8, "south": 42.0, "north": 43.6}
+
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+_POINT, _POLYGON = 1, 3
+
+
+def lnglat_to_world(lng, lat):
+    """Web Mercator position in [0, 1) world units (works on arrays too)."""
+    lng = np.asarray(lng, dtype=np.float64)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (lng + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / np.pi) / 2.0
+    return x, y
+
+
+def world_to_lnglat(x, y):
+    lng = np.asarray(x, dtype=np.float64) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y, dtype=np.float64)))))
+    return lng, lat
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of tile z/x/y in degrees."""
+    n = 2 ** z
+    west, north = world_to_lnglat(x / n, y / n)
+    east, south = world_to_lnglat((x + 1) / n, (y + 1) / n)
+    return float(west), float(south), float(east), float(north)
+
+
+def tiles_for_bounds(z, bounds=ERIE_BOUNDS):
+    """All (x, y) tiles at zoom `z` that intersect `bounds`."""
+    n = 2 ** z
+    x0, y0 = lnglat_to_world(bounds['west'], bounds['north'])
+    x1, y1 = lnglat_to_world(bounds['east'], bounds['south'])
+    for tx in range(int(x0 * n), min(int(x1 * n), n - 1) + 1):
+        for ty in range(int(y0 * n), min(int(y1 * n), n - 1) + 1):
+            yield tx, ty
+
+
+def to_tile_coords(z, x, y, world_x, world_y):
+    """World units -> integer tile coordinates (0..EXTENT inside the tile)."""
+    n = 2 ** z
+    px = np.rint((np.asarray(world_x) * n - x) * EXTENT).astype(np.int64)
+    py = np.rint((np.asarray(world_y) * n - y) * EXTENT).astype(np.int64)
+    return px, py
+
+
+# --- clipping ---------------------------------------------------------------
+
+def _clip_edge(points, inside, intersect):
+    if not points:
+        return points
+    clipped = []
+    previous = points[-1]
+    for point in points:
+        if inside(point):
+            if not inside(previous):
+                clipped.append(intersect(previous, point))
+            clipped.append(point)
+        elif inside(previous):
+            clipped.append(intersect(previous, point))
+        previous = point
+    return clipped
+
+
+def _x_cross(a, b, x):
+    t = (x - a[0]) / (b[0] - a[0])
+    return (x, a[1] + t * (b[1] - a[1]))
+
+
+def _y_cross(a, b, y):
+    t = (y - a[1]) / (b[1] - a[1])
+    return (a[0] + t * (b[0] - a[0]), y)
+
+
+def clip_ring(ring, low=-BUFFER, high=EXTENT + BUFFER):
+    """Sutherland-Hodgman clip of an (unclosed) ring to the buffered tile square."""
+    points = [(float(px), float(py)) for px, py in ring]
+    points = _clip_edge(points, lambda p: p[0] >= low, lambda a, b: _x_cross(a, b, low))
+    points = _clip_edge(points, lambda p: p[0] <= high, lambda a, b: _x_cross(a, b, high))
+    points = _clip_edge(points, lambda p: p[1] >= low, lambda a, b: _y_cross(a, b, low))
+    points = _clip_edge(points, lambda p: p[1] <= high, lambda a, b: _y_cross(a, b, high))
+    return points
+
+
+# --- protobuf encoding ------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _length_delimited(field, b''.join(_varint(v) for v in values))
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, (float, np.floating)):
+        return _key(3, 1) + struct.pack('<d', float(value))
+    return _length_delimited(1, str(value).encode('utf-8'))
+
+
+def _ring_area(ring):
+    area = 0
+    for i in range(len(ring)):
+        x0, y0 = ring[i - 1]
+        x1, y1 = ring[i]
+        area += x0 * y1 - x1 * y0
+    return area / 2
+
+
+def _dedupe(points):
+    out = []
+    for point in points:
+        point = (int(round(point[0])), int(round(point[1])))
+        if not out or point != out[-1]:
+            out.append(point)
+    while len(out) > 1 and out[0] == out[-1]:
+        out.pop()
+    return out
+
+
+class Layer:
+    """Accumulates features for one named MVT layer."""
+
+    def __init__(self, name, extent=EXTENT):
+        self.name = name
+        self.extent = extent
+        self._features = []
+        self._keys = {}
+        self._values = {}
+
+    def __len__(self):
+        return len(self._features)
+
+    def _tags(self, properties):
+        tags = []
+        for key, value in (properties or {}).items():
+            if value is None:
+                continue
+            if isinstance(value, np.generic):
+                value = value.item()
+            key_index = self._keys.setdefault(key, len(self._keys))
+            value_index = self._values.setdefault((type(value).__name__, value), len(self._values))
+            tags.extend((key_index, value_index))
+        return tags
+
+    def _add(self, geom_type, geometry, properties, feature_id):
+        feature = b''
+        if feature_id is not None:
+            feature += _key(1, 0) + _varint(int(feature_id))
+        tags = self._tags(properties)
+        if tags:
+            feature += _packed(2, tags)
+        feature += _key(3, 0) + _varint(geom_type)
+        feature += _packed(4, geometry)
+        self._features.append(feature)
+
+    def add_point(self, px, py, properties=None, feature_id=None):
+        geometry = [_command(_MOVE_TO, 1), _zigzag(int(px)), _zigzag(int(py))]
+        self._add(_POINT, geometry, properties, feature_id)
+
+    def add_polygon(self, rings, properties=None, feature_id=None):
+        """Add a polygon (or multipolygon) given as tile-coordinate rings.
+
+        `rings` is a list of polygons, each a list of rings with the exterior
+        first.  Rings are clipped to the buffered tile and re-wound to the
+        MVT convention (exterior clockwise in screen space).
+        """
+        geometry = []
+        cursor = (0, 0)
+        for polygon in rings:
+            for ring_index, ring in enumerate(polygon):
+                ring = _dedupe(clip_ring(ring))
+                if len(ring) < 3:
+                    if ring_index == 0:
+                        break
+                    continue
+                area = _ring_area(ring)
+                if area == 0:
+                    continue
+                exterior = ring_index == 0
+                if (area > 0) != exterior:
+                    ring = ring[::-1]
+                geometry.append(_command(_MOVE_TO, 1))
+                geometry.extend((_zigzag(ring[0][0] - cursor[0]), _zigzag(ring[0][1] - cursor[1])))
+                geometry.append(_command(_LINE_TO, len(ring) - 1))
+                previous = ring[0]
+                for point in ring[1:]:
+                    geometry.extend((_zigzag(point[0] - previous[0]), _zigzag(point[1] - previous[1])))
+                    previous = point
+                geometry.append(_command(_CLOSE_PATH, 1))
+                cursor = previous
+        if geometry:
+            self._add(_POLYGON, geometry, properties, feature_id)
+
+    def encode(self):
+        layer = _key(15, 0) + _varint(2)
+        layer += _length_delimited(1, self.name.encode('utf-8'))
+        for feature in self._features:
+            layer += _length_delimited(2, feature)
+        for key in self._keys:
+            layer += _length_delimited(3, key.encode('utf-8'))
+        for (_, value) in self._values:
+            layer += _length_delimited(4, _encode_value(value))
+        layer += _key(5, 0) + _varint(self.extent)
+        return layer
+
+
+def encode_tile(layers):
+    """Serialize layers into a single MVT tile (empty layers are skipped)."""
+    return b''.join(_length_delimited(3, layer.encode()) for layer in layers if len(layer))
+
+
+def polygon_layer(name, geojson, z, x, y, properties=None):
+    """Cut the GeoJSON polygons that overlap tile z/x/y into a layer.
+
+    `properties` limits which feature properties are copied into the tile.
+    """
+    layer = Layer(name)
+    west, south, east, north = tile_bounds(z, x, y)
+    pad = (east - west) * BUFFER / EXTENT
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        tile_polygons = []
+        for polygon in polygons:
+            exterior = np.asarray(polygon[0], dtype=np.float64)
+            if (exterior[:, 0].max() < west - pad or exterior[:, 0].min() > east + pad
+                    or exterior[:, 1].max() < south - pad or exterior[:, 1].min() > north + pad):
+                continue
+            tile_rings = []
+            for ring in polygon:
+                ring = np.asarray(ring, dtype=np.float64)
+                px, py = to_tile_coords(z, x, y, *lnglat_to_world(ring[:, 0], ring[:, 1]))
+                tile_rings.append(list(zip(px.tolist(), py.tolist()))[:-1])
+            tile_polygons.append(tile_rings)
+        if tile_polygons:
+            feature_properties = feature.get('properties') or {}
+            if properties is not None:
+                feature_properties = {key: feature_properties.get(key) for key in properties}
+            layer.add_polygon(tile_polygons, feature_properties)
+    return layer
@@ -0,0 +1,412 @@
+"""Multi-resolution, topology-preserving versions of the Erie ZIP polygons.
+
+`erie_survey_zips.geojson` stores every ZCTA ring with full precision, and
+neighbouring ZIPs each carry their own copy of the shared boundary.  This
+module converts the layer into TopoJSON-style shared arcs, simplifies every
+arc once per level of detail (so both neighbours get the *same* simplified
+edge and no gaps or overlaps appear), and quantizes the coordinates.
+
+Run `python shared_data/zip_topology.py` to regenerate the
+`erie_survey_zips.z<zoom>.topojson` files after the source layer changes.
+The apps call `zip_geojson_for_zoom()` with the zoom of their map view to
+get the GeoJSON for the matching level; the vaccine map's component swaps
+levels in the browser as it zooms.
+
+Against the 1.69 MB source GeoJSON, z7 to z11 are at least 10x smaller.
+z13 is only about 5.5x smaller (303 KB): a one-pixel tolerance at zoom 13
+keeps most of the surveyed boundary detail, and getting to 10x would take
+about five pixels, visibly cutting corners where that level is shown
+(zoom 12 and closer).
+"""
+import json
+import math
+import os
+from functools import lru_cache
+
+SHARED_DATA_PATH = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(SHARED_DATA_PATH, 'erie_survey_zips.geojson')
+OBJECT_NAME = 'zips'
+
+# Source coordinates have 6 decimals; topology is built on this exact grid
+SOURCE_SCALE = 10 ** 6
+
+# Web map zoom -> simplification tolerance of one screen pixel (in degrees of
+# longitude, 256px tiles) at that zoom
+LEVEL_ZOOMS = (7, 9, 11, 13)
+
+
+def tolerance_for_zoom(zoom):
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def level_path(zoom):
+    return os.path.join(SHARED_DATA_PATH, f'erie_survey_zips.z{zoom}.topojson')
+
+
+def level_for_zoom(zoom):
+    """Coarsest level that still looks exact at `zoom`."""
+    for level in LEVEL_ZOOMS:
+        if level >= zoom:
+            return level
+    return LEVEL_ZOOMS[-1]
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+
+def _ring_points(ring):
+    points = [(round(x * SOURCE_SCALE), round(y * SOURCE_SCALE)) for x, y in ring]
+    # Drop the closing point and any repeated vertices
+    deduped = [points[0]]
+    for point in points[1:]:
+        if point != deduped[-1]:
+            deduped.append(point)
+    if len(deduped) > 1 and deduped[0] == deduped[-1]:
+        deduped.pop()
+    return deduped
+
+
+def _edge(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+def _find_junctions(rings):
+    """Vertices where the set of rings sharing the boundary changes."""
+    edge_rings = {}
+    for ring_id, ring in enumerate(rings):
+        for i, point in enumerate(ring):
+            edge_rings.setdefault(_edge(point, ring[(i + 1) % len(ring)]), set()).add(ring_id)
+
+    junctions = set()
+    for ring in rings:
+        for i, point in enumerate(ring):
+            before = edge_rings[_edge(ring[i - 1], point)]
+            after = edge_rings[_edge(point, ring[(i + 1) % len(ring)])]
+            if before != after:
+                junctions.add(point)
+    return junctions
+
+
+def _canonical_closed(ring):
+    """Rotate a junction-free ring so identical rings produce identical arcs."""
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start + 1]
+
+
+class _ArcTable:
+    def __init__(self):
+        self.arcs = []
+        self._index = {}
+
+    def add(self, points):
+        """Return the TopoJSON arc reference for `points` (~i when reversed)."""
+        key = tuple(points)
+        if key in self._index:
+            return self._index[key]
+        reverse_key = key[::-1]
+        if reverse_key in self._index:
+            return ~self._index[reverse_key]
+        self.arcs.append(list(key))
+        self._index[key] = len(self.arcs) - 1
+        return len(self.arcs) - 1
+
+
+def _split_ring(ring, junctions, arc_table):
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        return [arc_table.add(_canonical_closed(ring))]
+    start = cuts[0]
+    rotated = ring[start:] + ring[:start]
+    cuts = [i - start for i in cuts]
+    refs = []
+    for begin, end in zip(cuts, cuts[1:] + [len(rotated)]):
+        refs.append(arc_table.add(rotated[begin:end + 1] if end < len(rotated) else rotated[begin:] + rotated[:1]))
+    return refs
+
+
+def build_topology(geojson):
+    """Convert a GeoJSON FeatureCollection of polygons into shared arcs.
+
+    Returns `(arcs, geometries)` where arcs are lists of integer points on the
+    source grid and geometries are TopoJSON geometry objects.
+    """
+    rings = []
+    shapes = []
+    for feature in geojson['features']:
+        polygons = []
+        for polygon in _polygons(feature['geometry']):
+            ring_ids = []
+            for ring in polygon:
+                points = _ring_points(ring)
+                if len(points) >= 3:
+                    ring_ids.append(len(rings))
+                    rings.append(points)
+            if ring_ids:
+                polygons.append(ring_ids)
+        shapes.append((feature, polygons))
+
+    junctions = _find_junctions(rings)
+    arc_table = _ArcTable()
+    ring_arcs = [_split_ring(ring, junctions, arc_table) for ring in rings]
+
+    geometries = []
+    for feature, polygons in shapes:
+        arcs = [[ring_arcs[ring_id] for ring_id in polygon] for polygon in polygons]
+        geometry = {'properties': feature.get('properties', {})}
+        if len(arcs) == 1:
+            geometry.update(type='Polygon', arcs=arcs[0])
+        else:
+            geometry.update(type='MultiPolygon', arcs=arcs)
+        geometries.append(geometry)
+    return arc_table.arcs, geometries
+
+
+def _segment_distance_sq(point, start, end):
+    px, py = point
+    ax, ay = start
+    bx, by = end
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+
+
+def _douglas_peucker(points, tolerance):
+    """Indices of `points` kept by Douglas-Peucker; endpoints always kept."""
+    keep = {0, len(points) - 1}
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        best, best_index = -1.0, None
+        for i in range(first + 1, last):
+            distance = _segment_distance_sq(points[i], points[first], points[last])
+            if distance > best:
+                best, best_index = distance, i
+        if best_index is not None and best > tolerance_sq:
+            keep.add(best_index)
+            stack.append((first, best_index))
+            stack.append((best_index, last))
+    return sorted(keep)
+
+
+def simplify_arc(points, tolerance):
+    if len(points) <= 2:
+        return list(points)
+    if points[0] == points[-1]:
+        # Closed arc: split at the vertex farthest from the start first
+        far = max(range(1, len(points) - 1),
+                  key=lambda i: (points[i][0] - points[0][0]) ** 2 + (points[i][1] - points[0][1]) ** 2)
+        head = [points[i] for i in _douglas_peucker(points[:far + 1], tolerance)]
+        tail = [points[far + i] for i in _douglas_peucker(points[far:], tolerance)]
+        return head + tail[1:]
+    return [points[i] for i in _douglas_peucker(points, tolerance)]
+
+
+def _ring_vertex_count(refs, arcs):
+    count = 0
+    for ref in refs:
+        count += len(arcs[ref if ref >= 0 else ~ref]) - 1
+    return count
+
+
+def _polygon_arcs(geometry):
+    """Rings (lists of arc references) of every polygon of a topology geometry."""
+    return geometry['arcs'] if geometry['type'] == 'MultiPolygon' else [geometry['arcs']]
+
+
+def _is_valid(polygons):
+    """Whether polygons given as lists of closed rings form a valid (Multi)Polygon."""
+    from shapely.geometry import MultiPolygon, Polygon
+
+    try:
+        return MultiPolygon([Polygon(rings[0], rings[1:]) for rings in polygons]).is_valid
+    except ValueError:  # a ring with fewer than 3 distinct points
+        return False
+
+
+def _invalid_arcs(arcs, geometries):
+    """Arcs of the geometries whose simplified polygons are invalid."""
+    invalid = set()
+    for geometry in geometries:
+        polygons = _polygon_arcs(geometry)
+        if not _is_valid([[_ring_coordinates(refs, arcs) for refs in polygon] for polygon in polygons]):
+            invalid.update(ref if ref >= 0 else ~ref for polygon in polygons for refs in polygon for ref in refs)
+    return invalid
+
+
+def simplify_topology(arcs, geometries, tolerance):
+    """Simplify every shared arc once so neighbouring ZIPs stay watertight.
+
+    Arcs of rings that would collapse below a triangle, and of polygons that
+    would self-intersect, are re-simplified with a smaller tolerance (down
+    to the source arc itself) until every polygon is valid.
+    """
+    tolerances = [tolerance * SOURCE_SCALE] * len(arcs)
+    simplified = [simplify_arc(arc, t) for arc, t in zip(arcs, tolerances)]
+    rings = [refs for geometry in geometries for polygon in _polygon_arcs(geometry) for refs in polygon]
+
+    while True:
+        degenerate = set()
+        for refs in rings:
+            if _ring_vertex_count(refs, simplified) < 3:
+                degenerate.update(ref if ref >= 0 else ~ref for ref in refs)
+        if not degenerate:
+            degenerate = _invalid_arcs(simplified, geometries)
+        degenerate = {i for i in degenerate if len(simplified[i]) < len(arcs[i])}
+        if not degenerate:
+            return simplified
+        for i in degenerate:
+            tolerances[i] /= 2
+            # Below the source grid nothing is left to drop, so fall back to the whole arc
+            simplified[i] = simplify_arc(arcs[i], tolerances[i]) if tolerances[i] >= 1 else list(arcs[i])
+
+
+def _bbox(arcs):
+    xs = [x for arc in arcs for x, _ in arc]
+    ys = [y for arc in arcs for _, y in arc]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _quantize(arcs, geometries, step):
+    x0, y0, x1, y1 = _bbox(arcs)
+    translate = [x0 / SOURCE_SCALE, y0 / SOURCE_SCALE]
+
+    encoded = []
+    for arc in arcs:
+        quantized = [(round((x / SOURCE_SCALE - translate[0]) / step),
+                      round((y / SOURCE_SCALE - translate[1]) / step)) for x, y in arc]
+        deltas = [list(quantized[0])]
+        previous = quantized[0]
+        for point in quantized[1:]:
+            if point == previous:
+                continue
+            deltas.append([point[0] - previous[0], point[1] - previous[1]])
+            previous = point
+        if len(deltas) == 1 and len(quantized) > 1:
+            # Keep at least a degenerate segment so arc endpoints still join
+            deltas.append([0, 0])
+        encoded.append(deltas)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [step, step], 'translate': translate},
+        'bbox': [x0 / SOURCE_SCALE, y0 / SOURCE_SCALE, x1 / SOURCE_SCALE, y1 / SOURCE_SCALE],
+        'objects': {OBJECT_NAME: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': encoded,
+    }
+
+
+def encode_topology(arcs, geometries, tolerance):
+    """Quantize arcs onto a grid of about a quarter of `tolerance` and delta-encode.
+
+    Snapping can fold narrow parts of a polygon onto themselves; the grid is
+    refined until every decoded polygon is valid.
+    """
+    step = max(tolerance / 4, 1.0 / SOURCE_SCALE)
+    while True:
+        topology = _quantize(arcs, geometries, step)
+        features = topology_to_geojson(topology)['features']
+        if step <= 1.0 / SOURCE_SCALE or all(_is_valid(_polygons(feature['geometry'])) for feature in features):
+            return topology
+        step = max(step / 2, 1.0 / SOURCE_SCALE)
+
+
+def _decode_arcs(topology):
+    scale = topology['transform']['scale']
+    translate = topology['transform']['translate']
+    decimals = max(0, math.ceil(-math.log10(min(scale))))
+    decoded = []
+    for arc in topology['arcs']:
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x += dx
+            y += dy
+            points.append([round(x * scale[0] + translate[0], decimals),
+                           round(y * scale[1] + translate[1], decimals)])
+        decoded.append(points)
+    return decoded
+
+
+def _ring_coordinates(refs, arcs):
+    ring = []
+    for ref in refs:
+        points = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        ring.extend(points if not ring else points[1:])
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return ring
+
+
+def topology_to_geojson(topology):
+    """Decode a TopoJSON topology back into a GeoJSON FeatureCollection."""
+    arcs = _decode_arcs(topology)
+    features = []
+    for geometry in topology['objects'][OBJECT_NAME]['geometries']:
+        if geometry['type'] == 'Polygon':
+            coordinates = [_ring_coordinates(refs, arcs) for refs in geometry['arcs']]
+        else:
+            coordinates = [[_ring_coordinates(refs, arcs) for refs in polygon]
+                           for polygon in geometry['arcs']]
+        features.append({
+            'type': 'Feature',
+            'properties': geometry.get('properties', {}),
+            'geometry': {'type': geometry['type'], 'coordinates': coordinates},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build_levels(source_path=SOURCE_PATH, zooms=LEVEL_ZOOMS):
+    """Write one TopoJSON file per level of detail next to the source layer."""
+    with open(source_path, 'r') as f:
+        geojson = json.load(f)
+    arcs, geometries = build_topology(geojson)
+    paths = []
+    for zoom in zooms:
+        tolerance = tolerance_for_zoom(zoom)
+        topology = encode_topology(simplify_topology(arcs, geometries, tolerance), geometries, tolerance)
+        path = level_path(zoom)
+        with open(path, 'w') as f:
+            json.dump(topology, f, separators=(',', ':'))
+        paths.append(path)
+    return paths
+
+
+@lru_cache(maxsize=None)
+def load_topology(zoom):
+    path = level_path(level_for_zoom(zoom))
+    if not os.path.exists(path):
+        build_levels()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def zip_geojson_for_zoom(zoom):
+    """GeoJSON FeatureCollection simplified for a map opened at `zoom`.
+
+    The result is cached per process and shared, so callers must not modify it.
+    """
+    return topology_to_geojson(load_topology(level_for_zoom(zoom)))
+
+
+@lru_cache(maxsize=None)
+def zip_geojson_string_for_zoom(zoom):
+    """Same as `zip_geojson_for_zoom`, serialized once for embedding in pages."""
+    return json.dumps(zip_geojson_for_zoom(zoom), separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    source_size = os.path.getsize(SOURCE_PATH)
+    for path in build_levels():
+        zoom = int(path.rsplit('.z', 1)[1].split('.')[0])
+        geojson_size = len(zip_geojson_string_for_zoom(zoom))
+        print(f"{os.path.basename(path)}: {os.path.getsize(path):,} bytes TopoJSON, "
+              f"{geojson_size:,} bytes GeoJSON (source {source_size:,} bytes)")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# The apps import their modules by name, as when run from their own folder
+for path in (PROJECT_ROOT, os.path.join(PROJECT_ROOT, 'Vaccine Heat Map'), os.path.join(PROJECT_ROOT, 'Pantry Map')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
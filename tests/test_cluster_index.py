@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cluster_index import CELL_LEVEL_OFFSET, MAX_ZOOM, ClusterIndex
+from shared_data.vector_tiles import lnglat_to_world, world_to_lnglat
+
+BBOX = (-78.95, 42.85, -78.80, 42.95)
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(3)
+    lng = rng.uniform(-79.1, -78.6, 600)
+    lat = rng.uniform(42.7, 43.1, 600)
+    # Clients sharing an address
+    lng[100:110], lat[100:110] = -78.87, 42.89
+    return lng, lat
+
+
+def brute_force(lng, lat, zoom, bbox, stop):
+    """Clusters (count > 1) and single rows of the cells that overlap `bbox`, by pandas groupby."""
+    cells_per_world = 2 ** (zoom + CELL_LEVEL_OFFSET)
+    x, y = lnglat_to_world(lng[:stop], lat[:stop])
+    frame = pd.DataFrame({'x': x, 'y': y,
+                          'cell_x': np.floor(x * cells_per_world), 'cell_y': np.floor(y * cells_per_world)})
+    west, south, east, north = bbox
+    x0, y0 = lnglat_to_world(west, north)
+    x1, y1 = lnglat_to_world(east, south)
+    frame = frame[frame['cell_x'].between(np.floor(x0 * cells_per_world), np.ceil(x1 * cells_per_world) - 1)
+                  & frame['cell_y'].between(np.floor(y0 * cells_per_world), np.ceil(y1 * cells_per_world) - 1)]
+    cells = frame.groupby(['cell_x', 'cell_y'])
+    sizes = cells.size()
+    means = cells[['x', 'y']].mean()[sizes > 1]
+    cluster_lng, cluster_lat = world_to_lnglat(means['x'].to_numpy(), means['y'].to_numpy())
+    clusters = sorted(zip(np.round(cluster_lng, 9), np.round(cluster_lat, 9), sizes[sizes > 1]))
+    singles = frame.index[cells['x'].transform('size') == 1]
+    return clusters, sorted(singles)
+
+
+@pytest.mark.parametrize('zoom', [7, 10, 13, 16, MAX_ZOOM - 1])
+@pytest.mark.parametrize('stop', [600, 250])
+def test_query_matches_grouping_the_points_in_the_box(points, zoom, stop):
+    lng, lat = points
+    clusters, leaves = ClusterIndex(lng, lat).query(zoom, BBOX, stop)
+    expected_clusters, expected_leaves = brute_force(lng, lat, zoom, BBOX, stop)
+    found = sorted(zip(np.round(clusters['lng'], 9), np.round(clusters['lat'], 9), clusters['count']))
+    assert found == expected_clusters
+    assert leaves.tolist() == expected_leaves
+
+
+def test_max_zoom_returns_every_client_in_the_box(points):
+    lng, lat = points
+    clusters, leaves = ClusterIndex(lng, lat).query(MAX_ZOOM, BBOX)
+    west, south, east, north = BBOX
+    inside = (lng >= west) & (lng <= east) & (lat >= south) & (lat <= north)
+    assert len(clusters['count']) == 0
+    assert set(np.flatnonzero(inside)) <= set(leaves.tolist())
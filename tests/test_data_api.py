@@ -0,0 +1,96 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import data_api
+from cluster_index import ClusterIndex
+from pantry_snapshot import open_snapshot, write_snapshot
+
+ADDRESS_TYPES = ['Home', 'Temporary']
+
+
+@pytest.fixture(scope='module')
+def clients():
+    rng = np.random.default_rng(9)
+    n = 200
+    return pd.DataFrame({
+        'lat': rng.uniform(42.7, 43.1, n).astype(np.float32),
+        'lng': rng.uniform(-79.1, -78.6, n).astype(np.float32),
+        # Two year partitions
+        'date': np.sort(np.datetime64('2021-09-01') + rng.integers(0, 240, n).astype('timedelta64[D]')),
+        'address_type': rng.integers(0, len(ADDRESS_TYPES), n).astype(np.int8),
+        'name': [f'CLIENT {i}' for i in range(n)],
+        'person_id': [str(1000 + i) for i in range(n)],
+    })
+
+
+@pytest.fixture
+def client(clients, tmp_path, monkeypatch):
+    """Flask test client of the data API over a scratch snapshot of `clients`."""
+    columns = {name: clients[name].to_numpy() for name in clients}
+    columns['name'] = columns['name'].astype(str)
+    columns['person_id'] = columns['person_id'].astype(str)
+    columns.update(postal_code=np.full(len(clients), '14201'), fingerprint=np.zeros(len(clients), dtype=np.uint64),
+                   zcta=np.full(len(clients), '14201'), zip_mismatch=np.zeros(len(clients), dtype=bool))
+    snapshot = open_snapshot(write_snapshot(columns, ADDRESS_TYPES, str(tmp_path)), str(tmp_path))
+    monkeypatch.setattr(data_api, 'load_snapshot', lambda: snapshot)
+    monkeypatch.setattr(data_api, 'snapshot_for_version', lambda version: snapshot)
+    monkeypatch.setattr(data_api, 'cluster_index_for_version', lambda version: ClusterIndex(snapshot['lng'],
+                                                                                            snapshot['lat']))
+    monkeypatch.setattr(data_api, 'bodies', data_api.BodyCache())
+    app = Flask(__name__)
+    app.register_blueprint(data_api.data_api)
+    return app.test_client()
+
+
+def get_json(client, url):
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    return json.loads(gzip.decompress(response.data))
+
+
+@pytest.mark.parametrize('query', ['until=2021-12-31', 'since=2021-10-15&until=2022-02-01',
+                                   'since=2022-01-01&bbox=-78.95,42.8,-78.75,43.0', ''])
+def test_data_matches_filtering_the_rows(client, clients, query):
+    payload = get_json(client, f'/data?{query}')
+    args = dict(part.split('=') for part in query.split('&') if part)
+    rows = clients
+    if 'since' in args:
+        rows = rows[rows['date'] > np.datetime64(args['since'])]
+    if 'until' in args:
+        rows = rows[rows['date'] <= np.datetime64(args['until'])]
+    if 'bbox' in args:
+        west, south, east, north = (float(value) for value in args['bbox'].split(','))
+        rows = rows[rows['lng'].astype(float).between(west, east) & rows['lat'].astype(float).between(south, north)]
+    assert payload['count'] == len(rows)
+    assert payload['row'] == rows.index.tolist()
+    assert payload['name'] == rows['name'].tolist()
+    assert payload['day'] == rows['date'].to_numpy().astype('datetime64[D]').astype(np.int64).tolist()
+    assert np.allclose(payload['lat'], rows['lat'], atol=1e-5)
+
+
+def test_fields_and_plain_bodies(client):
+    payload = get_json(client, '/data?until=2022-01-31&fields=lng,day,lat')
+    assert set(payload) == {'version', 'start', 'stop', 'count', 'day', 'lat', 'lng'}
+    plain = client.get('/data?until=2022-01-31&fields=lng,day,lat')
+    assert 'Content-Encoding' not in plain.headers and json.loads(plain.data) == payload
+    assert client.get('/data?fields=lat,ssn').status_code == 400
+
+
+def test_meta_matches_grouping_the_rows(client, clients):
+    meta = client.get('/meta').get_json()
+    months = clients['date'].dt.strftime('%Y-%m').value_counts().sort_index()
+    assert meta['month_counts'] == months.to_dict()
+    types = clients['address_type'].map(dict(enumerate(ADDRESS_TYPES))).value_counts()
+    assert meta['address_type_counts'] == types.reindex(ADDRESS_TYPES, fill_value=0).to_dict()
+    assert meta['rows'] == len(clients)
+
+
+def test_clusters_account_for_every_client_in_view(client, clients):
+    payload = get_json(client, '/clusters?z=11&until=2022-03-01')
+    total = sum(payload['clusters']['count']) + len(payload['points']['row'])
+    assert total == int((clients['date'] <= np.datetime64('2022-03-01')).sum())
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from density_grid import DensityGrid
+from shared_data import raster
+from shared_data.vector_tiles import ERIE_BOUNDS, lnglat_to_world
+
+WIDTH = 64
+
+
+@pytest.fixture(scope='module')
+def clients():
+    rng = np.random.default_rng(2)
+    n = 400
+    lng = rng.uniform(ERIE_BOUNDS['west'] - 0.05, ERIE_BOUNDS['east'] + 0.05, n)
+    lat = rng.uniform(ERIE_BOUNDS['south'] - 0.05, ERIE_BOUNDS['north'], n)
+    dates = np.sort(np.datetime64('2021-01-10') + rng.integers(0, 500, n).astype('timedelta64[D]'))
+    return lng, lat, dates
+
+
+def brute_force(grid, lng, lat, dates, cutoff):
+    """Blurred count of the clients as of `cutoff` per grid cell, binning each client on its own."""
+    x0, y0 = lnglat_to_world(ERIE_BOUNDS['west'], ERIE_BOUNDS['north'])
+    x1, y1 = lnglat_to_world(ERIE_BOUNDS['east'], ERIE_BOUNDS['south'])
+    x, y = lnglat_to_world(lng, lat)
+    frame = pd.DataFrame({'column': np.floor((x - x0) / (x1 - x0) * grid.width),
+                          'row': np.floor((y - y0) / (y1 - y0) * grid.height)})
+    frame = frame[(dates <= np.datetime64(cutoff)) & frame['column'].between(0, grid.width - 1)
+                  & frame['row'].between(0, grid.height - 1)]
+    counts = np.zeros((grid.height, grid.width), dtype=np.float32)
+    for (row, column), count in frame.groupby(['row', 'column']).size().items():
+        counts[int(row), int(column)] = count
+    return raster.gaussian_blur(counts, grid.sigma)
+
+
+@pytest.mark.parametrize('cutoff', ['2020-12-31', '2021-01-10', '2021-01-31', '2021-08-17', '2022-05-24',
+                                    '2023-01-01'])
+def test_as_of_matches_binning_the_clients(clients, cutoff):
+    lng, lat, dates = clients
+    grid = DensityGrid(lng, lat, dates, width=WIDTH)
+    assert np.allclose(grid.as_of(cutoff), brute_force(grid, lng, lat, dates, cutoff), atol=1e-4)
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from geocode_pantry import GeocodeCache, LookupBackend, address_frame, legacy_key, update_cache
+
+ADDRESSES = {
+    '80 GIERLACH STREET, BUFFALO, NY 14212, USA': (42.896623, -78.785219),
+    '21 UN ROAD, LAKE VIEW, NY 14085, USA': (42.717708, -78.830291),
+    '1 MAIN ST, BUFFALO, NY 14202, USA': (42.8803, -78.8787),
+}
+
+
+class RecordingBackend(LookupBackend):
+    """The offline stand-in, noting when each address was asked for."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        with self._lock:
+            self.calls.append((time.monotonic(), address))
+        return super().geocode(address)
+
+    @property
+    def asked(self):
+        return sorted(address for _, address in self.calls)
+
+
+def export(*streets):
+    """PetPoint export rows for 'street|city|zip' strings."""
+    rows = []
+    for street in streets:
+        street, city, postal_code = street.split('|')
+        rows.append({'Street Address': street, 'Unit Number': None, 'City': city, 'Province': 'New York',
+                     'Country': 'United States', 'Postal Code': postal_code})
+    return pd.DataFrame(rows)
+
+
+EXPORT = export('80 Gierlach Street|Buffalo|14212', '21 UN Road|Lake View|14085', '1 Main St.|Buffalo|14202')
+
+
+@pytest.fixture
+def lookup(tmp_path):
+    def make(addresses, backend_class=RecordingBackend):
+        path = tmp_path / f'stand_in_{len(list(tmp_path.iterdir()))}.json'
+        path.write_text(json.dumps({address: list(coords) for address, coords in addresses.items()}))
+        return backend_class(str(path))
+    return make
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with GeocodeCache(str(tmp_path / 'geocode_cache.sqlite')) as cache:
+        # Not empty, so update_cache does not import the repository's legacy JSON
+        cache.store({'SEED ROAD, NOWHERE, NY 00000, USA': None}, 'seed')
+        yield cache
+
+
+def test_normalized_addresses():
+    assert list(address_frame(EXPORT)['address']) == list(ADDRESSES)
+
+
+def test_cached_addresses_are_skipped(cache, lookup):
+    cache.store({'80 GIERLACH STREET, BUFFALO, NY 14212, USA': (42.9, -78.8)}, 'earlier')
+    backend = lookup(ADDRESSES)
+    assert update_cache(EXPORT, cache, backend, rate=0, progress=None) == 2
+    assert backend.asked == sorted(list(ADDRESSES)[1:])
+
+    # A second run has nothing left to ask
+    backend = lookup(ADDRESSES)
+    assert update_cache(EXPORT, cache, backend, rate=0, progress=None) == 0
+    assert backend.calls == []
+    # ...and the earlier result was not overwritten
+    assert cache.lookup(ADDRESSES)['80 GIERLACH STREET, BUFFALO, NY 14212, USA'] == (42.9, -78.8)
+
+
+def test_failed_lookups_are_recorded_and_retried(cache, lookup):
+    missing = '1 MAIN ST, BUFFALO, NY 14202, USA'
+    partial = {address: coords for address, coords in ADDRESSES.items() if address != missing}
+    assert update_cache(EXPORT, cache, lookup(partial), rate=0, progress=None) == 2
+    assert missing not in cache.lookup([missing])
+    assert cache.lookup([missing], include_failures=True) == {missing: None}
+
+    # Known failures are not asked again...
+    backend = lookup(ADDRESSES)
+    assert update_cache(EXPORT, cache, backend, rate=0, progress=None) == 0
+    assert backend.calls == []
+
+    # ...unless retry_failed is set
+    backend = lookup(ADDRESSES)
+    assert update_cache(EXPORT, cache, backend, rate=0, retry_failed=True, progress=None) == 1
+    assert backend.asked == [missing]
+    assert cache.lookup([missing]) == {missing: ADDRESSES[missing]}
+
+
+def test_backend_errors_are_retried_next_run(cache, lookup):
+    class FlakyBackend(RecordingBackend):
+        def geocode(self, address):
+            super().geocode(address)
+            raise TimeoutError("service unavailable")
+
+    messages = []
+    flaky = lookup(ADDRESSES, FlakyBackend)
+    assert update_cache(EXPORT, cache, flaky, rate=0, progress=messages.append) == 0
+    assert len(flaky.calls) == 3
+    assert sum('Error geocoding' in message for message in messages) == 3
+    # Errors are not stored as failures
+    assert cache.lookup(ADDRESSES, include_failures=True) == {}
+
+    backend = lookup(ADDRESSES)
+    assert update_cache(EXPORT, cache, backend, rate=0, progress=None) == 3
+
+
+def test_rate_limit_is_honoured(cache, lookup):
+    rate = 20.0
+    backend = lookup(ADDRESSES)
+    update_cache(EXPORT, cache, backend, workers=4, rate=rate, progress=None)
+    times = sorted(when for when, _ in backend.calls)
+    assert len(times) == 3
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    # Concurrent workers still wait for their turn (small allowance for timer resolution)
+    assert min(gaps) >= 1 / rate - 0.005
+
+
+def test_legacy_json_import(tmp_path, lookup):
+    legacy = {legacy_key(row): {'lat': 42.5 + i, 'lng': -78.5} for i, (_, row) in enumerate(EXPORT.iloc[:2].iterrows())}
+    legacy_path = tmp_path / 'geocoded_pantry_data.json'
+    legacy_path.write_text(json.dumps(legacy))
+    assert '80 Gierlach Street Buffalo New York United States 14212.0' in legacy
+
+    with GeocodeCache(str(tmp_path / 'geocode_cache.sqlite')) as cache:
+        assert cache.import_legacy_json(EXPORT, json_path=str(legacy_path)) == 2
+        assert cache.lookup(ADDRESSES) == {
+            '80 GIERLACH STREET, BUFFALO, NY 14212, USA': (42.5, -78.5),
+            '21 UN ROAD, LAKE VIEW, NY 14085, USA': (43.5, -78.5),
+        }
+        # Only the address the legacy file did not have goes to the backend
+        backend = lookup(ADDRESSES)
+        assert update_cache(EXPORT, cache, backend, rate=0, progress=None) == 1
+        assert backend.asked == ['1 MAIN ST, BUFFALO, NY 14202, USA']
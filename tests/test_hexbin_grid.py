@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hexbin_grid import EARTH_CIRCUMFERENCE_KM, SQRT3, HexbinPyramid
+from shared_data.vector_tiles import ERIE_BOUNDS, lnglat_to_world
+
+SIZES = (4.0, 1.0)
+
+
+@pytest.fixture(scope='module')
+def clients():
+    rng = np.random.default_rng(11)
+    n = 500
+    # A few clients fall outside the county box and are never binned
+    lng = rng.uniform(ERIE_BOUNDS['west'] - 0.05, ERIE_BOUNDS['east'], n)
+    lat = rng.uniform(ERIE_BOUNDS['south'], ERIE_BOUNDS['north'] + 0.05, n)
+    dates = np.sort(np.datetime64('2021-01-01') + rng.integers(0, 730, n).astype('timedelta64[D]'))
+    return lng, lat, dates
+
+
+def brute_force(pyramid, size, lng, lat, dates, cutoff):
+    """Clients as of `cutoff` per hexagon, assigning each client to the nearest hexagon center."""
+    level = pyramid.levels[size]
+    km_per_world = EARTH_CIRCUMFERENCE_KM * np.cos(np.radians((ERIE_BOUNDS['south'] + ERIE_BOUNDS['north']) / 2))
+    keep = ((dates <= np.datetime64(cutoff)) & (lng >= ERIE_BOUNDS['west']) & (lng <= ERIE_BOUNDS['east'])
+            & (lat >= ERIE_BOUNDS['south']) & (lat <= ERIE_BOUNDS['north']))
+    x, y = lnglat_to_world(lng[keep], lat[keep])
+    center_x = size * (SQRT3 * level.q + SQRT3 / 2 * level.r)
+    center_y = size * 1.5 * level.r
+    distance = np.hypot(x[:, None] * km_per_world - center_x, y[:, None] * km_per_world - center_y)
+    counts = pd.Series(distance.argmin(axis=1)).value_counts()
+    return counts.reindex(range(len(level)), fill_value=0).to_numpy()
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('cutoff', ['2020-06-01', '2021-01-01', '2021-07-15', '2022-02-28', '2022-12-31',
+                                    '2024-01-01'])
+def test_as_of_matches_counting_the_clients(clients, size, cutoff):
+    lng, lat, dates = clients
+    pyramid = HexbinPyramid(lng, lat, dates, sizes=SIZES)
+    assert pyramid.as_of(size, cutoff).tolist() == brute_force(pyramid, size, lng, lat, dates, cutoff).tolist()
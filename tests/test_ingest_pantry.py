@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geocode_pantry import LookupBackend
+from ingest_pantry import ingest
+from pantry_snapshot import current_version, open_snapshot
+
+COLUMNS = ['Person ID', 'Name Last', 'Name First', 'Association Creation Date', 'Address Type',
+           'Street Address', 'Unit Number', 'City', 'City Alias', 'Province', 'Country', 'Postal Code']
+CLIENTS = [
+    ['P0000000101', 'DOE', 'JANE', '3/14/21', 'Home', '80 Gierlach Street', '', 'Buffalo', '', 'New York',
+     'United States', '14212'],
+    ['P0000000102', 'ROE', 'RICHARD', '7/2/22', 'Temporary', '21 UN Road', '', 'Lake View', '', 'New York',
+     'United States', '14085'],
+    ['P0000000103', 'POE', 'EDGAR', '1/9/23', 'Home', '1 Main St.', '', 'Buffalo', '', 'New York',
+     'United States', '14202'],
+    ['P0000000104', 'ROE', 'RUTH', '11/30/22', 'Home', '21 UN Road', '', 'Lake View', '', 'New York',
+     'United States', '14085'],
+]
+GEOCODES = {
+    '80 GIERLACH STREET, BUFFALO, NY 14212, USA': [42.896623, -78.785219],
+    '21 UN ROAD, LAKE VIEW, NY 14085, USA': [42.717708, -78.830291],
+    '1 MAIN ST, BUFFALO, NY 14202, USA': [42.8803, -78.8787],
+}
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Ingest an export of `clients` into a scratch snapshot; returns `(version, summary)`."""
+    def ingest_clients(clients, **kwargs):
+        # The stand-in geocoder knows whatever is in `ingest_clients.geocodes` at the time
+        lookup_path = tmp_path / 'stand_in.json'
+        lookup_path.write_text(json.dumps(ingest_clients.geocodes))
+        csv_path = tmp_path / 'export.csv'
+        pd.DataFrame(clients, columns=COLUMNS).to_csv(csv_path, index=False)
+        return ingest(str(csv_path), path=str(tmp_path / 'snapshot'), cache_path=str(tmp_path / 'cache.sqlite'),
+                      backend=LookupBackend(str(lookup_path)), rate=0, progress=None, **kwargs)
+
+    ingest_clients.path = str(tmp_path / 'snapshot')
+    ingest_clients.geocodes = dict(GEOCODES)
+    return ingest_clients
+
+
+def clients(snapshot):
+    return dict(zip(np.asarray(snapshot['person_id']).tolist(), np.asarray(snapshot['name']).tolist()))
+
+
+def test_insert(run):
+    version, summary = run(CLIENTS)
+    assert version == 'v0001' == current_version(run.path)
+    assert summary['inserted_or_changed'] == 4
+    assert summary['not_geocoded'] == summary['removed'] == 0
+    snapshot = open_snapshot(version, run.path)
+    assert clients(snapshot) == {'101': 'DOE, JANE', '102': 'ROE, RICHARD', '103': 'POE, EDGAR', '104': 'ROE, RUTH'}
+    assert list(np.asarray(snapshot['date']).astype(str)) == ['2021-03-14', '2022-07-02', '2022-11-30', '2023-01-09']
+    assert snapshot['zcta'][0] == '14212'
+
+
+def test_reingest_is_a_no_op(run):
+    version, _ = run(CLIENTS)
+    again, summary = run(CLIENTS)
+    assert again == version == current_version(run.path)
+    assert summary['unchanged'] == 4
+    assert summary['inserted_or_changed'] == summary['removed'] == summary['partitions_written'] == 0
+
+
+def test_deleted_row(run):
+    run(CLIENTS)
+    version, summary = run(CLIENTS[:1] + CLIENTS[2:])  # drops 102, 2022 keeps 104
+    assert version == 'v0002'
+    assert summary['removed'] == 1
+    assert summary['inserted_or_changed'] == 0
+    # Only the 2022 partition changed
+    assert summary['partitions_written'] == 1 and summary['partitions_reused'] == 2
+    assert clients(open_snapshot(version, run.path)) == {'101': 'DOE, JANE', '103': 'POE, EDGAR', '104': 'ROE, RUTH'}
+
+
+def test_changed_name(run):
+    run(CLIENTS)
+    renamed = [list(row) for row in CLIENTS]
+    renamed[0][2] = 'JANET'
+    version, summary = run(renamed)
+    assert version == 'v0002'
+    assert summary['inserted_or_changed'] == 1
+    assert summary['unchanged'] == 3
+    snapshot = open_snapshot(version, run.path)
+    assert len(snapshot) == 4
+    assert clients(snapshot)['101'] == 'DOE, JANET'
+
+
+def test_deleting_the_last_client_of_a_year(run):
+    run(CLIENTS)
+    version, summary = run(CLIENTS[1:])
+    assert summary['removed'] == 1
+    assert summary['partitions_written'] == 1 and summary['partitions_reused'] == 2
+    snapshot = open_snapshot(version, run.path)
+    assert [p['key'] for p in snapshot.manifest['partitions']] == ['2022', '2023']
+    assert sorted(clients(snapshot)) == ['102', '103', '104']
+
+
+def test_changed_address_waits_for_its_geocode(run):
+    version, _ = run(CLIENTS)
+    moved = [list(row) for row in CLIENTS]
+    moved[0][5:8] = ['1 Main St.', '', 'Buffalo']
+    moved[0][11] = '14202'
+    moved[2][5] = '500 Nowhere Lane'  # not known to the geocoder
+
+    again, summary = run(moved)
+    assert summary['inserted_or_changed'] == 1
+    assert summary['not_geocoded'] == 1
+    snapshot = open_snapshot(again, run.path)
+    # The pending client keeps its previous row
+    assert clients(snapshot) == clients(open_snapshot(version, run.path))
+    row = list(np.asarray(snapshot['person_id'])).index('103')
+    assert float(snapshot['lat'][row]) == pytest.approx(42.8803, abs=1e-4)
+
+    # Still pending: nothing to write and nothing counted as changed
+    same, summary = run(moved)
+    assert same == again
+    assert summary['inserted_or_changed'] == 0 and summary['not_geocoded'] == 1
+
+    # The geocoder's earlier "not found" is only asked again on request
+    run.geocodes['500 NOWHERE LANE, BUFFALO, NY 14202, USA'] = [42.95, -78.82]
+    assert run(moved)[1]['not_geocoded'] == 1
+    latest, summary = run(moved, retry_failed=True)
+    assert summary['inserted_or_changed'] == 1 and summary['not_geocoded'] == 0
+    snapshot = open_snapshot(latest, run.path)
+    row = list(np.asarray(snapshot['person_id'])).index('103')
+    assert float(snapshot['lat'][row]) == pytest.approx(42.95, abs=1e-4)
+    assert len(snapshot) == 4
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from shared_data.paged_table import TableIndex
+
+
+def table(values):
+    return TableIndex({'value': values}, fetch=None)
+
+
+def test_ties_keep_table_order_both_ways():
+    index = table(pd.Series(['b', 'a', None, 'b', 'a', 'c', None]))
+    assert index.rows('value').tolist() == [1, 4, 0, 3, 5, 2, 6]
+    assert index.rows('value', descending=True).tolist() == [5, 0, 3, 1, 4, 2, 6]
+
+
+def test_descending_within_stop():
+    index = table(np.array(['2021-01-01', '2021-01-01', '2022-01-01', '2023-01-01'], dtype='datetime64[D]'))
+    assert index.rows('value', descending=True).tolist() == [3, 2, 0, 1]
+    assert index.rows('value', descending=True, stop=2).tolist() == [0, 1]
+
+
+def test_distinct_values_reverse_the_ascending_order():
+    index = table(np.array([3, 1, 2]))
+    assert index.rows('value', descending=True).tolist() == [0, 2, 1]
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pantry_rollup import GROWTH_MONTHS, PantryRollup
+
+ADDRESS_TYPES = ['Home', 'Temporary', 'Unknown']
+ZCTAS = ['14201', '14215', '14086', '']
+CUTOFFS = ['2019-12-31', '2020-03-01', '2020-03-31', '2021-02-14', '2022-06-30', '2030-01-01']
+
+
+@pytest.fixture(scope='module')
+def clients():
+    rng = np.random.default_rng(5)
+    n = 300
+    return pd.DataFrame({
+        # Gaps of several months, so some months have no clients at all
+        'date': np.sort(np.datetime64('2020-03-01') + rng.choice(np.r_[0:120, 300:420, 700:800], n)
+                        .astype('timedelta64[D]')),
+        'zcta': rng.choice(ZCTAS, n),
+        'address_type': rng.integers(0, len(ADDRESS_TYPES), n).astype(np.int8),
+        # Repeated names count once, on the day they first appear
+        'name': rng.choice([f'CLIENT {i}' for i in range(120)], n),
+    })
+
+
+class Snapshot:
+    """The snapshot columns the rollup reads."""
+
+    categories = {'address_type': ADDRESS_TYPES}
+
+    def __init__(self, clients):
+        self.clients = clients
+
+    def __getitem__(self, name):
+        return self.clients[name].to_numpy()
+
+
+@pytest.fixture(scope='module')
+def rollup(clients):
+    return PantryRollup.from_snapshot(Snapshot(clients))
+
+
+def through(clients, cutoff):
+    return clients[clients['date'] <= np.datetime64(cutoff)]
+
+
+def months_through(clients, cutoff):
+    """Months from the first client's through the month of `cutoff` (no later than the last client's)."""
+    end = min(pd.Timestamp(cutoff), clients['date'].max())
+    return pd.period_range(clients['date'].min().to_period('M'), end.to_period('M'), freq='M')
+
+
+@pytest.mark.parametrize('cutoff', CUTOFFS)
+def test_daily_totals(clients, rollup, cutoff):
+    rows = through(clients, cutoff)
+    assert rollup.clients_as_of(cutoff) == len(rows)
+    assert rollup.names_as_of(cutoff) == rows['name'].nunique()
+
+
+@pytest.mark.parametrize('cutoff', CUTOFFS)
+def test_monthly_growth(clients, rollup, cutoff):
+    months = months_through(clients, cutoff)
+    new = clients['date'].dt.to_period('M').value_counts().reindex(months, fill_value=0)
+    growth = rollup.monthly_growth(cutoff)
+    assert growth['new'].tolist() == new.tolist()
+    assert growth['cumulative'].tolist() == new.cumsum().tolist()
+    assert growth['month'].dt.to_period('M').tolist() == list(months)
+
+
+@pytest.mark.parametrize('cutoff', CUTOFFS)
+def test_top_growing_zips(clients, rollup, cutoff):
+    months = months_through(clients, cutoff)
+    top = rollup.top_growing_zips(cutoff, limit=len(ZCTAS))
+    if len(months) == 0:
+        assert top.empty
+        return
+    month = clients['date'].dt.to_period('M')
+    window = month.isin(months[-GROWTH_MONTHS:])
+    before = month < months[-GROWTH_MONTHS:][0]
+    expected = pd.DataFrame({'new': clients[window].groupby('zcta').size(),
+                             'before': clients[before].groupby('zcta').size()}).fillna(0).astype(int)
+    expected = expected[(expected.index != '') & (expected['new'] > 0)]
+    expected = expected.reset_index(names='zcta').sort_values(['new', 'zcta'], ascending=[False, True])
+    assert top[['zcta', 'new', 'before']].values.tolist() == expected[['zcta', 'new', 'before']].values.tolist()
+    assert np.allclose(top['growth'], expected['new'] / expected['before'].where(expected['before'] > 0),
+                       equal_nan=True)
+
+
+@pytest.mark.parametrize('cutoff', CUTOFFS)
+def test_address_type_mix_is_a_trailing_sum(clients, rollup, cutoff):
+    months = months_through(clients, cutoff)
+    month = clients['date'].dt.to_period('M')
+    mix = rollup.address_type_mix(cutoff)
+    assert len(mix) == len(months)
+    for row, end in zip(mix.itertuples(index=False), months):
+        window = clients[(month > end - GROWTH_MONTHS) & (month <= end)]
+        counts = np.bincount(window['address_type'], minlength=len(ADDRESS_TYPES))
+        assert list(row) == counts.tolist()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from pantry_snapshot import PartitionedColumn
+
+
+def column():
+    return PartitionedColumn([np.arange(0, 5), np.arange(5, 12), np.arange(12, 20)]), np.arange(20)
+
+
+@pytest.mark.parametrize('key', [slice(None), slice(3, 9), slice(6, 9), slice(5, 12), slice(0, 0), slice(-4, None),
+                                 slice(None, None, 3), slice(25, 30)])
+def test_slices_match_the_concatenated_column(key):
+    partitioned, values = column()
+    assert np.array_equal(np.asarray(partitioned[key]), values[key])
+
+
+def test_slice_within_a_partition_is_a_view():
+    partitioned, _ = column()
+    assert np.shares_memory(partitioned[6:9], partitioned.parts[1])
+
+
+@pytest.mark.parametrize('key', [0, 4, 5, 19, -1, -20, [19, 0, 5, 5, 12], [-1, -2], []])
+def test_rows_match_the_concatenated_column(key):
+    partitioned, values = column()
+    key = np.array(key, dtype=np.int64) if isinstance(key, list) else key
+    assert np.array_equal(partitioned[key], values[key])
+
+
+def test_masks_ufuncs_and_searchsorted():
+    partitioned, values = column()
+    assert np.array_equal(partitioned[values % 3 == 0], values[values % 3 == 0])
+    assert np.array_equal(partitioned * 2, values * 2)
+    assert partitioned.searchsorted(12, side='right') == 13
+    with pytest.raises(IndexError):
+        partitioned[20]
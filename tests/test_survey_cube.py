@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from survey_cube import (
+    ALL,
+    EVENT_COLUMN,
+    FILTER_COLUMNS,
+    RAW_ZIP_COLUMN,
+    YEAR_COLUMN,
+    ZIP_COLUMN,
+    SurveyCube,
+    normalize_survey,
+)
+
+ANSWERS = {
+    'employment': ['Employed', 'Unemployed', 'Retired'],
+    'gov': ['Yes', 'No'],
+    'income': ['0-$30,000', '$31,000-$60,000', '120,000 +'],
+    'microchip': ['Yes', 'No', 'Not sure'],
+}
+
+
+@pytest.fixture(scope='module')
+def survey():
+    """A small typed survey with unanswered questions, missing ZIPs and years without an event."""
+    rng = np.random.default_rng(7)
+    n = 400
+    raw = pd.DataFrame({
+        YEAR_COLUMN: rng.choice([2022, 2023, 2024], n),
+        EVENT_COLUMN: rng.choice(['Spring Clinic', 'Fall Clinic', None], n),
+        RAW_ZIP_COLUMN: rng.choice(['14201', '14215.0', '14086', '9999999', None], n),
+    })
+    for name, answers in ANSWERS.items():
+        raw[FILTER_COLUMNS[name]] = rng.choice(answers + [None], n).astype(object)
+    return normalize_survey(raw)
+
+
+def brute_force(survey, year, event, filters):
+    rows = survey[survey[YEAR_COLUMN] == year]
+    if event != ALL:
+        rows = rows[rows[EVENT_COLUMN] == event]
+    for name, value in filters.items():
+        if value != ALL:
+            rows = rows[rows[FILTER_COLUMNS[name]] == value]
+    counts = rows.groupby(ZIP_COLUMN, observed=True).size()
+    return counts[counts > 0], int(rows[ZIP_COLUMN].isna().sum())
+
+
+def test_select_matches_filtering_the_rows(survey):
+    cube = SurveyCube(survey)
+    for year in cube.years:
+        for event in [ALL] + cube.events(year):
+            for employment, income in itertools.product([ALL] + ANSWERS['employment'], [ALL, '$0-$30,000']):
+                filters = {'employment': employment, 'income': income, 'gov': 'No' if year == 2023 else ALL}
+                zip_counts, missing = cube.select(year, event, **filters)
+                expected, expected_missing = brute_force(survey, year, event, filters)
+                assert zip_counts.sort_index().to_dict() == expected.sort_index().to_dict()
+                assert missing == expected_missing
+
+
+def test_answer_not_given_that_year_selects_nothing(survey):
+    cube = SurveyCube(survey)
+    zip_counts, missing = cube.select(2022, microchip='Maybe')
+    assert zip_counts.empty and missing == 0
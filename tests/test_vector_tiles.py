@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import tile_server
+from cluster_index import ClusterIndex
+from shared_data import vector_tiles
+from shared_data.vector_tiles import ERIE_BOUNDS, lnglat_to_world, tile_bounds, tiles_for_bounds
+
+
+class RecordingLayer(vector_tiles.Layer):
+    """Layer that also keeps the points added to it."""
+
+    def __init__(self, name, extent=vector_tiles.EXTENT):
+        super().__init__(name, extent)
+        self.points = []
+
+    def add_point(self, px, py, properties=None, feature_id=None):
+        self.points.append((int(px), int(py), properties['day'], properties['count']))
+        super().add_point(px, py, properties, feature_id)
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    rng = np.random.default_rng(4)
+    n = 300
+    lng = rng.uniform(-78.95, -78.75, n)
+    lat = rng.uniform(42.82, 42.98, n)
+    # Clients sharing an address
+    lng[50:60], lat[50:60] = -78.87, 42.89
+    dates = np.sort(np.datetime64('2022-01-01') + rng.integers(0, 365, n).astype('timedelta64[D]'))
+    snapshot = {'lng': lng, 'lat': lat, 'date': dates}
+    monkeypatch.setattr(tile_server, 'snapshot_for_version', lambda version: snapshot)
+    monkeypatch.setattr(tile_server, 'cluster_index_for_version', lambda version: ClusterIndex(lng, lat))
+    monkeypatch.setattr(vector_tiles, 'Layer', RecordingLayer)
+    return snapshot
+
+
+def brute_force(snapshot, z, stop):
+    """Cells of the first `stop` clients at zoom `z`: {tile: {(px, py, earliest day, count)}}."""
+    cells_per_world = 2 ** (min(z, tile_server.POINT_CELL_ZOOM) + tile_server.CELL_LEVEL_OFFSET)
+    x, y = lnglat_to_world(snapshot['lng'][:stop], snapshot['lat'][:stop])
+    frame = pd.DataFrame({'cell_x': np.floor(x * cells_per_world), 'cell_y': np.floor(y * cells_per_world),
+                          'day': snapshot['date'][:stop].astype(np.int64)})
+    tiles = {}
+    for (cell_x, cell_y), group in frame.groupby(['cell_x', 'cell_y']):
+        center_x, center_y = (cell_x + 0.5) / cells_per_world, (cell_y + 0.5) / cells_per_world
+        tile = int(center_x * 2 ** z), int(center_y * 2 ** z)
+        px, py = vector_tiles.to_tile_coords(z, *tile, center_x, center_y)
+        tiles.setdefault(tile, set()).add((int(px), int(py), int(group['day'].min()), len(group)))
+    return tiles
+
+
+@pytest.mark.parametrize('z', [9, 12, 13, 15, 18])
+@pytest.mark.parametrize('stop', [300, 120])
+def test_client_tiles_match_binning_every_client(clients, z, stop):
+    expected = brute_force(clients, z, stop)
+    for tile in set(expected) | {(x + 1, y) for x, y in expected}:
+        layer = tile_server.client_layer('v0001', z, *tile, stop)
+        assert set(layer.points) == expected.get(tile, set())
+        assert len(layer.points) == len(expected.get(tile, ()))
+    assert sum(count for cells in expected.values() for *_, count in cells) == stop
+
+
+@pytest.mark.parametrize('z', [4, 6, 7])
+def test_tiles_for_bounds_are_the_tiles_touching_the_county(z):
+    tiles = set(tiles_for_bounds(z))
+    expected = set()
+    for x in range(2 ** z):
+        for y in range(2 ** z):
+            west, south, east, north = tile_bounds(z, x, y)
+            if (west <= ERIE_BOUNDS['east'] and east > ERIE_BOUNDS['west']
+                    and south <= ERIE_BOUNDS['north'] and north > ERIE_BOUNDS['south']):
+                expected.add((x, y))
+    assert tiles == expected
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from shapely.geometry import shape
+
+from shared_data.zip_topology import (
+    LEVEL_ZOOMS,
+    SOURCE_PATH,
+    build_topology,
+    encode_topology,
+    level_path,
+    simplify_topology,
+    tolerance_for_zoom,
+    topology_to_geojson,
+)
+
+
+def invalid_zips(topology):
+    return [feature['properties']['ZCTA5CE10'] for feature in topology_to_geojson(topology)['features']
+            if not shape(feature['geometry']).is_valid]
+
+
+@pytest.fixture(scope='module')
+def source_topology():
+    with open(SOURCE_PATH, 'r') as f:
+        return build_topology(json.load(f))
+
+
+@pytest.mark.parametrize('zoom', LEVEL_ZOOMS)
+def test_shipped_level_is_valid(zoom):
+    with open(level_path(zoom), 'r') as f:
+        assert invalid_zips(json.load(f)) == []
+
+
+@pytest.mark.parametrize('zoom', LEVEL_ZOOMS)
+def test_simplified_level_is_valid(source_topology, zoom):
+    arcs, geometries = source_topology
+    tolerance = tolerance_for_zoom(zoom)
+    topology = encode_topology(simplify_topology(arcs, geometries, tolerance), geometries, tolerance)
+    assert invalid_zips(topology) == []
+    assert len(topology['objects']['zips']['geometries']) == len(geometries)